@@ -0,0 +1,33 @@
+"""Add fixed-width url_hash key to cars
+
+Revision ID: 002
+Revises: 001
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "002"
+down_revision: Union[str, None] = "001"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("cars", sa.Column("url_hash", sa.BINARY(32), nullable=True))
+
+    # Same digest as app.models.hash_url: SHA-256 over the utf8 bytes of the url.
+    op.execute("UPDATE cars SET url_hash = UNHEX(SHA2(url, 256))")
+
+    op.alter_column("cars", "url_hash", existing_type=sa.BINARY(32), nullable=False)
+    op.drop_index("uq_cars_url", table_name="cars")
+    op.create_index("uq_cars_url_hash", "cars", ["url_hash"], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index("uq_cars_url_hash", table_name="cars")
+    op.execute("CREATE UNIQUE INDEX uq_cars_url ON cars (url(500))")
+    op.drop_column("cars", "url_hash")
@@ -0,0 +1,25 @@
+"""Add scraped content fingerprint to cars
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "003"
+down_revision: Union[str, None] = "002"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Left NULL for existing rows; the next scrape that sees a listing fills it in.
+    op.add_column("cars", sa.Column("fingerprint", sa.BINARY(16), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("cars", "fingerprint")
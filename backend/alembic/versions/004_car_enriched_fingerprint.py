@@ -0,0 +1,24 @@
+"""Track which listing content detail-page enrichment has already seen
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "004"
+down_revision: Union[str, None] = "003"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("cars", sa.Column("enriched_fingerprint", sa.BINARY(16), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("cars", "enriched_fingerprint")
@@ -0,0 +1,47 @@
+"""Persistent scrape job store
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "005"
+down_revision: Union[str, None] = "004"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "scrape_jobs",
+        sa.Column("job_id", sa.String(36), nullable=False),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("signature", sa.String(500), nullable=False),
+        sa.Column("running_signature", sa.String(500), nullable=True),
+        sa.Column("correlation_id", sa.String(100), nullable=False),
+        sa.Column("filters", sa.JSON(), nullable=False),
+        sa.Column("result", sa.JSON(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("owner", sa.String(100), nullable=False),
+        sa.Column("heartbeat_at", sa.DateTime(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("started_at", sa.DateTime(), nullable=True),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("job_id"),
+        sa.UniqueConstraint("running_signature"),
+    )
+    op.create_index(op.f("ix_scrape_jobs_signature"), "scrape_jobs", ["signature"], unique=False)
+    op.create_index(op.f("ix_scrape_jobs_correlation_id"), "scrape_jobs", ["correlation_id"], unique=False)
+    op.create_index("ix_scrape_jobs_status_finished_at", "scrape_jobs", ["status", "finished_at"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_scrape_jobs_status_finished_at", table_name="scrape_jobs")
+    op.drop_index(op.f("ix_scrape_jobs_correlation_id"), table_name="scrape_jobs")
+    op.drop_index(op.f("ix_scrape_jobs_signature"), table_name="scrape_jobs")
+    op.drop_table("scrape_jobs")
@@ -0,0 +1,31 @@
+"""Record the crawl scope of scrape jobs for coalescing
+
+Revision ID: 006
+Revises: 005
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "006"
+down_revision: Union[str, None] = "005"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "scrape_jobs",
+        sa.Column("source", sa.String(100), nullable=False, server_default="usedcar:global"),
+    )
+    op.add_column("scrape_jobs", sa.Column("max_pages", sa.Integer(), nullable=False, server_default="0"))
+    op.create_index("ix_scrape_jobs_source_status", "scrape_jobs", ["source", "status"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_scrape_jobs_source_status", table_name="scrape_jobs")
+    op.drop_column("scrape_jobs", "max_pages")
+    op.drop_column("scrape_jobs", "source")
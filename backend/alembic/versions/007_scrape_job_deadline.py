@@ -0,0 +1,26 @@
+"""Add deadlines and cancel requests to scrape jobs
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "007"
+down_revision: Union[str, None] = "006"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("scrape_jobs", sa.Column("deadline_at", sa.DateTime(), nullable=True))
+    op.add_column("scrape_jobs", sa.Column("cancel_requested_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("scrape_jobs", "cancel_requested_at")
+    op.drop_column("scrape_jobs", "deadline_at")
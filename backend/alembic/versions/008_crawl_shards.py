@@ -0,0 +1,48 @@
+"""Add crawl_shards table for leased page-range crawling
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "008"
+down_revision: Union[str, None] = "007"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "crawl_shards",
+        sa.Column("id", sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column("crawl_id", sa.String(36), nullable=False),
+        sa.Column("source", sa.String(100), nullable=False),
+        sa.Column("base_url", sa.String(500), nullable=False),
+        sa.Column("start_page", sa.Integer(), nullable=False),
+        sa.Column("end_page", sa.Integer(), nullable=False),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("lease_owner", sa.String(100), nullable=True),
+        sa.Column("lease_expires_at", sa.DateTime(), nullable=True),
+        sa.Column("lease_version", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("attempts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("result", sa.JSON(), nullable=True),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("finished_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_crawl_shards_crawl_id_status", "crawl_shards", ["crawl_id", "status"], unique=False)
+    op.create_index(
+        "ix_crawl_shards_status_lease_expires_at", "crawl_shards", ["status", "lease_expires_at"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_crawl_shards_status_lease_expires_at", table_name="crawl_shards")
+    op.drop_index("ix_crawl_shards_crawl_id_status", table_name="crawl_shards")
+    op.drop_table("crawl_shards")
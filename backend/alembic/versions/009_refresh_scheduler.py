@@ -0,0 +1,45 @@
+"""Add churn and budget tables for the adaptive refresh scheduler
+
+Revision ID: 009
+Revises: 008
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "009"
+down_revision: Union[str, None] = "008"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "refresh_bands",
+        sa.Column("source", sa.String(100), nullable=False),
+        sa.Column("start_page", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("end_page", sa.Integer(), nullable=False),
+        sa.Column("base_url", sa.String(500), nullable=False),
+        sa.Column("churn_rate", sa.Float(), nullable=True),
+        sa.Column("observations", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("snapshot", sa.JSON(), nullable=True),
+        sa.Column("observed_at", sa.DateTime(), nullable=True),
+        sa.Column("scheduled_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("source", "start_page"),
+    )
+    op.create_table(
+        "refresh_budget",
+        sa.Column("id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("tokens", sa.Float(), nullable=False),
+        sa.Column("refilled_at", sa.DateTime(), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False, server_default="0"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("refresh_budget")
+    op.drop_table("refresh_bands")
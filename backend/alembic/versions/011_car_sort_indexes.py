@@ -0,0 +1,27 @@
+"""Add composite indexes for keyset pagination of cars
+
+Revision ID: 011
+Revises: 010
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "011"
+down_revision: Union[str, None] = "010"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_cars_updated_at_id", "cars", ["updated_at", "id"])
+    op.create_index("ix_cars_price_id", "cars", ["price", "id"])
+    op.create_index("ix_cars_year_id", "cars", ["year", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_cars_year_id", table_name="cars")
+    op.drop_index("ix_cars_price_id", table_name="cars")
+    op.drop_index("ix_cars_updated_at_id", table_name="cars")
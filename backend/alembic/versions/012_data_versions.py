@@ -0,0 +1,32 @@
+"""Add data version counters
+
+Revision ID: 012
+Revises: 011
+Create Date: 2026-10-17
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "012"
+down_revision: Union[str, None] = "011"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    data_versions = op.create_table(
+        "data_versions",
+        sa.Column("name", sa.String(64), nullable=False),
+        sa.Column("version", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("name"),
+    )
+    op.bulk_insert(data_versions, [{"name": "cars", "version": 0, "updated_at": datetime.utcnow()}])
+
+
+def downgrade() -> None:
+    op.drop_table("data_versions")
@@ -0,0 +1,24 @@
+"""Add a retry time to crawl shards
+
+Revision ID: 013
+Revises: 012
+Create Date: 2026-10-17
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "013"
+down_revision: Union[str, None] = "012"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("crawl_shards", sa.Column("retry_at", sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("crawl_shards", "retry_at")
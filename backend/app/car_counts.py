@@ -0,0 +1,101 @@
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Query, Session
+
+from app.config import settings
+from app.data_versions import CARS, read_version
+from app.models import Car
+
+FilterKey = tuple[tuple[str, Any], ...]
+
+
+def normalize_filters(filters: dict[str, Any]) -> dict[str, Any]:
+    """Listing filters as they are applied: text trimmed and lower-cased (matching ignores case), empty ones dropped."""
+    normalized = {}
+    for name, value in filters.items():
+        if isinstance(value, str):
+            value = value.strip().lower()
+        if value is None or value == "":
+            continue
+        normalized[name] = value
+    return normalized
+
+
+class CarCountCache:
+    """Exact totals of filtered listings per normalized filter set, each valid for one ``cars`` data version.
+
+    The upsert and enrichment paths bump the version in the transaction that
+    changes listings, so an entry is only served while nothing has changed
+    since it was counted. Holds up to ``CARS_COUNT_CACHE_SIZE`` filter sets
+    (least recently used dropped first), per process.
+    """
+
+    def __init__(self) -> None:
+        self._entries: "OrderedDict[FilterKey, tuple[int, int]]" = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: FilterKey, version: int) -> Optional[int]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key: FilterKey, version: int, total: int) -> None:
+        with self._lock:
+            self._entries[key] = (version, total)
+            self._entries.move_to_end(key)
+            while len(self._entries) > max(0, settings.CARS_COUNT_CACHE_SIZE):
+                self._entries.popitem(last=False)
+
+
+car_count_cache = CarCountCache()
+
+
+def count_cars(db: Session, query: Query, filters: dict[str, Any], estimate: bool = False) -> tuple[int, bool]:
+    """Total of ``query``, the listings matching normalized ``filters``, and whether it is an estimate.
+
+    Cached totals are returned as long as the listings have not changed. With
+    ``estimate``, a missing total is counted only up to
+    ``CARS_COUNT_ESTIMATE_CAP`` rows; past that, the planner's row estimate (on
+    MySQL) or the cap itself is returned as an estimate.
+    """
+    key: FilterKey = tuple(sorted(filters.items()))
+    version = read_version(db, CARS)
+    if version is not None:
+        cached = car_count_cache.get(key, version)
+        if cached is not None:
+            return cached, False
+
+    if estimate:
+        cap = max(0, settings.CARS_COUNT_ESTIMATE_CAP)
+        capped = db.scalar(select(func.count()).select_from(query.with_entities(Car.id).limit(cap + 1).subquery()))
+        if capped > cap:
+            return max(cap + 1, _planner_estimate(db, query) or 0), True
+        total = capped
+    else:
+        total = query.count()
+
+    if version is not None:
+        car_count_cache.put(key, version, total)
+    return total, False
+
+
+def _planner_estimate(db: Session, query: Query) -> Optional[int]:
+    """Rows MySQL's planner expects ``query`` to return (EXPLAIN rows x filtered); None elsewhere or on error."""
+    dialect = db.get_bind().dialect
+    if dialect.name != "mysql":
+        return None
+    compiled = query.with_entities(Car.id).statement.compile(dialect=dialect)
+    try:
+        plan = db.connection().exec_driver_sql(f"EXPLAIN {compiled}", compiled.params).mappings().first()
+    except Exception as e:
+        print(f"[app] Failed to estimate the listing count: {e}")
+        return None
+    if plan is None or plan.get("rows") is None:
+        return None
+    return int(plan["rows"] * float(plan.get("filtered") or 100) / 100)
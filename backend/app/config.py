@@ -8,11 +8,50 @@ class Settings(BaseSettings):
     JWT_EXPIRATION_HOURS: int = 24
     ADMIN_USERNAME: str = "admin"
     ADMIN_PASSWORD: str = "admin123"
+    CARS_COUNT_CACHE_SIZE: int = 1024
+    CARS_COUNT_ESTIMATE_CAP: int = 10000
+    SCRAPE_SITE_ROOT: str = "https://www.carsensor.net"
     SCRAPE_INTERVAL_MINUTES: int = 60
     SCRAPE_MAX_PAGES: int = 20
     SCRAPE_TARGET_MAX_PAGES: int = 6
     SCRAPE_FALLBACK_MAX_PAGES: int = 20
     MAX_CONCURRENT_SCRAPES: int = 1
+    SCRAPE_CONCURRENCY: int = 4
+    SCRAPE_PER_HOST_CONCURRENCY: int = 4
+    SCRAPE_PARSE_WORKERS: int = 2
+    SCRAPE_PARSE_QUEUE_SIZE: int = 8
+    SCRAPE_UPSERT_BATCH_SIZE: int = 500
+    SCRAPE_INCREMENTAL_STOP_PAGES: int = 2
+    SCRAPE_FULL_SWEEP_INTERVAL_MINUTES: int = 360
+    SCRAPE_PW_CONCURRENCY: int = 3
+    SCRAPE_PW_SELECTOR_TIMEOUT_MS: int = 10000
+    SCRAPE_BROWSER_CONTEXTS: int = 4
+    SCRAPE_BROWSER_HEALTHCHECK_SECONDS: int = 30
+    SCRAPE_PARSER_ENGINE: str = "bs4"
+    SCRAPE_ENRICH_ENABLED: bool = False
+    SCRAPE_ENRICH_BUDGET: int = 50
+    SCRAPE_ENRICH_CONCURRENCY: int = 2
+    SCRAPE_RESULT_FRESHNESS_SECONDS: int = 300
+    SCRAPE_JOB_TTL_SECONDS: int = 86400
+    SCRAPE_JOB_STALE_SECONDS: int = 120
+    SCRAPE_JOB_HEARTBEAT_SECONDS: int = 15
+    SCRAPE_JOB_DEADLINE_SECONDS: int = 600
+    SCRAPE_SHARD_PAGES: int = 10
+    SCRAPE_SHARD_LEASE_SECONDS: int = 120
+    SCRAPE_SHARD_MAX_ATTEMPTS: int = 3
+    SCRAPE_SHARD_RETRY_SECONDS: int = 30
+    SCRAPE_REFRESH_TICK_SECONDS: int = 60
+    SCRAPE_REFRESH_BAND_PAGES: int = 5
+    SCRAPE_REFRESH_PAGES_PER_HOUR: int = 0
+    SCRAPE_REFRESH_TARGET_CHANGE: float = 0.2
+    SCRAPE_REFRESH_MIN_INTERVAL_MINUTES: int = 10
+    SCRAPE_HOST_RATE_PER_SECOND: float = 4.0
+    SCRAPE_HOST_MIN_RATE_PER_SECOND: float = 0.25
+    SCRAPE_SLOW_RESPONSE_SECONDS: float = 5.0
+    SCRAPE_CIRCUIT_FAILURE_RATIO: float = 0.5
+    SCRAPE_CIRCUIT_MIN_REQUESTS: int = 10
+    SCRAPE_CIRCUIT_COOLDOWN_SECONDS: int = 60
+    SCRAPE_VALIDATOR_STORE_PATH: str = ".cache/http_validators.json"
 
     class Config:
         env_file = ".env"
@@ -0,0 +1,41 @@
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import DataVersion
+
+# Listings in the cars table: inserts and changes of the filterable fields.
+CARS = "cars"
+
+TRACKED = (CARS,)
+
+
+def seed_versions(db: Session) -> None:
+    """Create the rows of tracked data sets missing from a database not built by migrations."""
+    existing = set(db.scalars(select(DataVersion.name)).all())
+    missing = [name for name in TRACKED if name not in existing]
+    if not missing:
+        return
+    db.add_all(DataVersion(name=name, version=0, updated_at=datetime.utcnow()) for name in missing)
+    try:
+        db.commit()
+    except IntegrityError:
+        # Another process created them first.
+        db.rollback()
+
+
+def bump_version(db: Session, name: str) -> None:
+    """Mark ``name`` as changed; call in the transaction that changes it, right before its commit."""
+    db.execute(
+        update(DataVersion)
+        .where(DataVersion.name == name)
+        .values(version=DataVersion.version + 1, updated_at=datetime.utcnow())
+    )
+
+
+def read_version(db: Session, name: str) -> Optional[int]:
+    """Current version of ``name``; None if it is not tracked (its row is missing), so nothing may be cached."""
+    return db.scalar(select(DataVersion.version).where(DataVersion.name == name))
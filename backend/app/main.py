@@ -1,21 +1,33 @@
 from contextlib import asynccontextmanager
+from datetime import datetime
 
 from apscheduler.schedulers.background import BackgroundScheduler
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.config import settings
+from app.data_versions import seed_versions
 from app.database import SessionLocal, engine
 from app.models import Base
 from app.routers.auth_router import router as auth_router
 from app.routers.cars_router import router as cars_router
 from app.routers.scrape_router import router as scrape_router
-from app.scraper.scraper import run_scraper
+from app.scraper.browser_service import browser_service
+from app.scraper.job_manager import scrape_job_manager
+from app.scraper.job_store import scrape_job_store
+from app.scraper.parser_bs import shutdown_parse_pool
+from app.scraper.refresh import refresh_scheduler
 from app.seed import seed_admin
 
 scheduler = BackgroundScheduler()
 
 
+def _clean_up_scrape_jobs() -> None:
+    scrape_job_store.fail_stale()
+    scrape_job_store.expire_overdue()
+    scrape_job_store.evict_expired()
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
@@ -24,26 +36,37 @@ async def lifespan(app: FastAPI):
     db = SessionLocal()
     try:
         seed_admin(db)
+        seed_versions(db)
     finally:
         db.close()
 
     scheduler.add_job(
-        run_scraper,
+        refresh_scheduler.tick,
         "interval",
-        minutes=settings.SCRAPE_INTERVAL_MINUTES,
-        id="scraper_job",
+        seconds=max(5, settings.SCRAPE_REFRESH_TICK_SECONDS),
+        id="scrape_refresh_tick",
+        replace_existing=True,
+        next_run_time=datetime.now(),
+        coalesce=True,
+        max_instances=1,
+    )
+    scheduler.add_job(
+        _clean_up_scrape_jobs,
+        "interval",
+        seconds=max(30, settings.SCRAPE_JOB_STALE_SECONDS),
+        id="scrape_job_cleanup",
         replace_existing=True,
     )
     scheduler.start()
-    print(f"[app] Scraper scheduled every {settings.SCRAPE_INTERVAL_MINUTES} minutes")
-
-    # Run scraper once on startup
-    scheduler.add_job(run_scraper, id="scraper_initial", replace_existing=True)
+    print(f"[app] Adaptive scrape refresh with a budget of {refresh_scheduler.pages_per_hour():.0f} pages/hour")
 
     yield
 
     # Shutdown
     scheduler.shutdown(wait=False)
+    scrape_job_manager.stop()
+    shutdown_parse_pool()
+    browser_service.stop()
 
 
 app = FastAPI(title="CarSensor Listings API", lifespan=lifespan)
@@ -63,4 +86,4 @@ app.include_router(scrape_router)
 
 @app.get("/api/health")
 def health():
-    return {"status": "ok"}
+    return {"status": "ok", "browser": browser_service.health()}
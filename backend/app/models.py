@@ -1,10 +1,20 @@
+import hashlib
 from datetime import datetime
 
-from sqlalchemy import Column, Integer, String, DateTime, Text
+from sqlalchemy import BINARY, JSON, Column, Float, Index, Integer, String, DateTime, Text
 
 from app.database import Base
 
 
+def hash_url(url: str) -> bytes:
+    """Fixed-width lookup key for a listing URL (SHA-256 digest)."""
+    return hashlib.sha256(url.encode("utf-8")).digest()
+
+
+def _default_url_hash(context) -> bytes:
+    return hash_url(context.get_current_parameters()["url"])
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -16,6 +26,12 @@ class User(Base):
 
 class Car(Base):
     __tablename__ = "cars"
+    # Keyset pagination of GET /api/cars: one (sort key, id) index per sort key.
+    __table_args__ = (
+        Index("ix_cars_updated_at_id", "updated_at", "id"),
+        Index("ix_cars_price_id", "price", "id"),
+        Index("ix_cars_year_id", "year", "id"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     brand = Column(String(100), nullable=False, index=True)
@@ -23,6 +39,122 @@ class Car(Base):
     year = Column(Integer, nullable=True)
     price = Column(Integer, nullable=True)
     color = Column(String(100), nullable=True)
-    url = Column(Text, unique=True, nullable=False)
+    url = Column(Text, nullable=False)
+    # Uniqueness and lookups go through the hash instead of a prefix index on the TEXT url.
+    url_hash = Column(BINARY(32), unique=True, nullable=False, default=_default_url_hash)
+    # Digest of the last scraped content (app.scraper.fingerprints), lets unchanged rows skip the write path.
+    fingerprint = Column(BINARY(16), nullable=True)
+    # Fingerprint the detail page was last fetched for (app.scraper.enrich); equal means nothing to refetch.
+    enriched_fingerprint = Column(BINARY(16), nullable=True)
+    # Last failed detail page fetch; enrichment tries such rows after all the others.
+    enrich_failed_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ScrapeJob(Base):
+    __tablename__ = "scrape_jobs"
+    __table_args__ = (
+        Index("ix_scrape_jobs_status_finished_at", "status", "finished_at"),
+        Index("ix_scrape_jobs_source_status", "source", "status"),
+    )
+
+    job_id = Column(String(36), primary_key=True)
+    status = Column(String(20), nullable=False)
+    signature = Column(String(500), nullable=False, index=True)
+    # Equal to signature while the job is pending or running, NULL afterwards; the
+    # unique index makes "one live job per signature" hold across processes.
+    running_signature = Column(String(500), nullable=True, unique=True)
+    correlation_id = Column(String(100), nullable=False, index=True)
+    filters = Column(JSON, nullable=False)
+    # What the job crawls (app.scraper.scraper.resolve_source label and page limit), for coalescing.
+    source = Column(String(100), nullable=False, default="usedcar:global")
+    max_pages = Column(Integer, nullable=False, default=0)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    # Process executing the job ("host:pid") and its last sign of life.
+    owner = Column(String(100), nullable=False)
+    heartbeat_at = Column(DateTime, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
+    # The job stops between pages once deadline_at passes or a cancel is requested; the
+    # owning process picks both up on its heartbeat.
+    deadline_at = Column(DateTime, nullable=True)
+    cancel_requested_at = Column(DateTime, nullable=True)
+    # Bumped by every change of status, progress or controls, for clients waiting on changes.
+    revision = Column(Integer, nullable=False, default=0)
+
+
+class CrawlShard(Base):
+    """A page window of one listing source, leased to one crawl worker at a time."""
+
+    __tablename__ = "crawl_shards"
+    __table_args__ = (
+        Index("ix_crawl_shards_crawl_id_status", "crawl_id", "status"),
+        Index("ix_crawl_shards_status_lease_expires_at", "status", "lease_expires_at"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    crawl_id = Column(String(36), nullable=False)
+    source = Column(String(100), nullable=False)
+    base_url = Column(String(500), nullable=False)
+    start_page = Column(Integer, nullable=False)
+    end_page = Column(Integer, nullable=False)
+    status = Column(String(20), nullable=False)
+    # Worker holding the lease ("host:pid") until lease_expires_at. Every claim bumps
+    # lease_version, so a claim only succeeds against the version it read.
+    lease_owner = Column(String(100), nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    lease_version = Column(Integer, nullable=False, default=0)
+    attempts = Column(Integer, nullable=False, default=0)
+    # A shard given back after an error is not claimed again before this time.
+    retry_at = Column(DateTime, nullable=True)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class RefreshBand(Base):
+    """Observed churn of a page window of one listing source, for the adaptive refresh scheduler."""
+
+    __tablename__ = "refresh_bands"
+
+    source = Column(String(100), primary_key=True)
+    start_page = Column(Integer, primary_key=True, autoincrement=False)
+    end_page = Column(Integer, nullable=False)
+    base_url = Column(String(500), nullable=False)
+    # EWMA of the estimated change rate, as the fraction of listings changing per hour.
+    churn_rate = Column(Float, nullable=True)
+    observations = Column(Integer, nullable=False, default=0)
+    # Per page, short digests of the listings (URL + content) seen at observed_at.
+    snapshot = Column(JSON, nullable=True)
+    observed_at = Column(DateTime, nullable=True)
+    scheduled_at = Column(DateTime, nullable=True)
+
+
+class RefreshBudget(Base):
+    """Shared page-request token bucket of the refresh scheduler (a single row)."""
+
+    __tablename__ = "refresh_budget"
+
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    tokens = Column(Float, nullable=False)
+    refilled_at = Column(DateTime, nullable=False)
+    # Bumped by every tick that spends tokens, so only one process plans each tick.
+    version = Column(Integer, nullable=False, default=0)
+
+
+class DataVersion(Base):
+    """Change counter of a data set, bumped in the transactions that change it.
+
+    Lets readers cache values derived from the data (listing counts) and tell
+    when they went stale without recomputing them.
+    """
+
+    __tablename__ = "data_versions"
+
+    name = Column(String(64), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -1,15 +1,71 @@
-from typing import Optional
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Literal, Optional
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
 
 from app.auth import verify_token
+from app.car_counts import count_cars, normalize_filters
 from app.database import get_db
 from app.models import Car
 from app.schemas import CarsListResponse, CarResponse
 
 router = APIRouter(prefix="/api", tags=["cars"])
 
+# Sort keys, each backed by a composite (column, id) index; id breaks ties so the order is total.
+_SORT_COLUMNS = {
+    "id": Car.id,
+    "updated_at": Car.updated_at,
+    "price": Car.price,
+    "year": Car.year,
+}
+SortKey = Literal["id", "updated_at", "price", "year"]
+
+
+def _encode_cursor(sort: str, order: str, car: Car) -> str:
+    value = getattr(car, sort)
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps({"s": sort, "o": order, "v": value, "id": car.id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str, sort: str, order: str) -> tuple[Any, int]:
+    """The sort value and id of the row a cursor points after; 400 if it is malformed or for another sort."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        value, last_id = data["v"], int(data["id"])
+        if (data["s"], data["o"]) != (sort, order):
+            raise HTTPException(status_code=400, detail="Cursor was issued for a different sort order")
+        if value is not None:
+            value = datetime.fromisoformat(value) if sort == "updated_at" else int(value)
+    except HTTPException:
+        raise
+    except (binascii.Error, ValueError, TypeError, KeyError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return value, last_id
+
+
+def _after(column, order: str, value: Any, last_id: int):
+    """Rows that come after ``(value, last_id)`` in ``ORDER BY column <order>, id <order>``.
+
+    Follows MySQL's NULL ordering: NULLs sort first ascending and last descending.
+    """
+    if column is Car.id:
+        return Car.id > last_id if order == "asc" else Car.id < last_id
+    if order == "asc":
+        if value is None:
+            return or_(and_(column.is_(None), Car.id > last_id), column.is_not(None))
+        return or_(column > value, and_(column == value, Car.id > last_id))
+    if value is None:
+        return and_(column.is_(None), Car.id < last_id)
+    return or_(column < value, and_(column == value, Car.id < last_id), column.is_(None))
+
 
 @router.get("/cars", response_model=CarsListResponse)
 def get_cars(
@@ -22,32 +78,61 @@ def get_cars(
     max_year: Optional[int] = Query(None),
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=100),
+    sort: SortKey = Query("id"),
+    order: Literal["asc", "desc"] = Query("asc"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page; replaces page"),
+    total: Literal["exact", "estimate"] = Query("exact", description="estimate: capped count for large results"),
     db: Session = Depends(get_db),
     _user_id: int = Depends(verify_token),
 ):
+    filters = normalize_filters(
+        {
+            "brand": brand,
+            "model": model,
+            "color": color,
+            "min_price": min_price,
+            "max_price": max_price,
+            "min_year": min_year,
+            "max_year": max_year,
+        }
+    )
     query = db.query(Car)
 
-    if brand:
-        query = query.filter(Car.brand.ilike(f"%{brand}%"))
-    if model:
-        query = query.filter(Car.model.ilike(f"%{model}%"))
-    if color:
-        query = query.filter(Car.color.ilike(f"%{color}%"))
-    if min_price is not None:
-        query = query.filter(Car.price >= min_price)
-    if max_price is not None:
-        query = query.filter(Car.price <= max_price)
-    if min_year is not None:
-        query = query.filter(Car.year >= min_year)
-    if max_year is not None:
-        query = query.filter(Car.year <= max_year)
-
-    total = query.count()
-    items = query.offset((page - 1) * per_page).limit(per_page).all()
+    if "brand" in filters:
+        query = query.filter(Car.brand.ilike(f"%{filters['brand']}%"))
+    if "model" in filters:
+        query = query.filter(Car.model.ilike(f"%{filters['model']}%"))
+    if "color" in filters:
+        query = query.filter(Car.color.ilike(f"%{filters['color']}%"))
+    if "min_price" in filters:
+        query = query.filter(Car.price >= filters["min_price"])
+    if "max_price" in filters:
+        query = query.filter(Car.price <= filters["max_price"])
+    if "min_year" in filters:
+        query = query.filter(Car.year >= filters["min_year"])
+    if "max_year" in filters:
+        query = query.filter(Car.year <= filters["max_year"])
+
+    count, is_estimate = count_cars(db, query, filters, estimate=total == "estimate")
+
+    column = _SORT_COLUMNS[sort]
+    keys = [column] if column is Car.id else [column, Car.id]
+    ordered = query.order_by(*[key.asc() if order == "asc" else key.desc() for key in keys])
+    if cursor:
+        # Keyset mode: seek past the last row instead of scanning and discarding earlier pages.
+        value, last_id = _decode_cursor(cursor, sort, order)
+        rows = ordered.filter(_after(column, order, value, last_id)).limit(per_page + 1).all()
+    else:
+        rows = ordered.offset((page - 1) * per_page).limit(per_page + 1).all()
+
+    items = rows[:per_page]
+    next_cursor = _encode_cursor(sort, order, items[-1]) if len(rows) > per_page else None
 
     return CarsListResponse(
         items=[CarResponse.model_validate(item) for item in items],
-        total=total,
-        page=page,
+        total=count,
+        is_estimate=is_estimate,
+        page=None if cursor else page,
         per_page=per_page,
+        next_cursor=next_cursor,
     )
@@ -1,19 +1,36 @@
 from __future__ import annotations
 
+import asyncio
 from datetime import datetime
-from typing import Any, Optional
+from typing import Any, AsyncIterator, Literal, Optional
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
-from app.scraper.job_manager import scrape_job_manager
+from app.auth import verify_token
+from app.scraper.job_manager import INTERACTIVE, scrape_job_manager
+from app.scraper.job_store import LIVE_STATUSES, scrape_job_store
+from app.scraper.refresh import refresh_scheduler
+from app.scraper.throttle import host_throttle
 
 router = APIRouter(prefix="/api/scrape", tags=["scrape"])
 
+# Waiting requests look for changes made in this process every _WAIT_LOCAL_POLL_SECONDS
+# and re-read the job (which another process may be running) every _WAIT_DB_POLL_SECONDS.
+_WAIT_LOCAL_POLL_SECONDS = 0.1
+_WAIT_DB_POLL_SECONDS = 1.0
+_MAX_WAIT_SECONDS = 60
+_STREAM_KEEPALIVE_SECONDS = 15
+
 
 class ScrapeTriggerRequest(BaseModel):
     correlation_id: Optional[str] = None
     filters: dict[str, Any] = Field(default_factory=dict)
+    priority: Literal["interactive", "scheduled"] = INTERACTIVE
+    # How long the caller will wait for the job; defaults to SCRAPE_JOB_DEADLINE_SECONDS, 0 means no deadline.
+    deadline_seconds: Optional[int] = Field(default=None, ge=0)
 
 
 class ScrapeTriggerResponse(BaseModel):
@@ -21,6 +38,12 @@ class ScrapeTriggerResponse(BaseModel):
     status: str
     signature: str
     reused: bool
+    # Seconds since a reused job finished; set when a recent result is served instead of a new scrape.
+    age_seconds: Optional[int] = None
+    # 1-based place in the work queue while the job waits for a worker in this process.
+    queue_position: Optional[int] = None
+    # Revision of the job as returned; pass it to the status long-poll to wait for the next change.
+    revision: int = 0
 
 
 class ScrapeStatusResponse(BaseModel):
@@ -31,9 +54,66 @@ class ScrapeStatusResponse(BaseModel):
     created_at: str
     started_at: Optional[str] = None
     finished_at: Optional[str] = None
+    deadline_at: Optional[str] = None
+    cancel_requested_at: Optional[str] = None
     error: Optional[str] = None
     result: dict[str, int]
     age_seconds: int
+    queue_position: Optional[int] = None
+    # Grows with every change of the job; pass it back as ?revision= to wait for the next one.
+    revision: int = 0
+
+
+class QueueClassStats(BaseModel):
+    depth: int
+    oldest_wait_seconds: Optional[float] = None
+    recent_dispatches: int
+    avg_wait_seconds: Optional[float] = None
+    max_wait_seconds: Optional[float] = None
+
+
+class ScrapeQueueResponse(BaseModel):
+    workers: int
+    busy_workers: int
+    depth: int
+    classes: dict[str, QueueClassStats]
+
+
+class RefreshBandStatus(BaseModel):
+    source: str
+    start_page: int
+    end_page: int
+    # Estimated share of the band's listings changing per hour.
+    churn_rate: Optional[float] = None
+    observations: int
+    observed_at: Optional[str] = None
+    refresh_interval_minutes: float
+    next_refresh_at: Optional[str] = None
+
+
+class RefreshStatusResponse(BaseModel):
+    pages_per_hour: float
+    budget_tokens: float
+    bands: list[RefreshBandStatus]
+
+
+class HostThrottleStatus(BaseModel):
+    host: str
+    circuit: Literal["closed", "open", "half_open"]
+    rate_per_second: Optional[float] = None
+    tokens: Optional[float] = None
+    paused_for_seconds: float
+    circuit_retry_in_seconds: Optional[float] = None
+    recent_failure_ratio: Optional[float] = None
+    avg_latency_ms: Optional[int] = None
+    requests: int
+    failures: int
+    throttled: int
+
+
+class ThrottleStatusResponse(BaseModel):
+    max_rate_per_second: float
+    hosts: list[HostThrottleStatus]
 
 
 @router.post("/trigger", response_model=ScrapeTriggerResponse)
@@ -42,16 +122,135 @@ def trigger_scrape(payload: ScrapeTriggerRequest):
     result = scrape_job_manager.submit_job(
         filters=payload.filters,
         correlation_id=correlation_id,
+        priority=payload.priority,
+        deadline_seconds=payload.deadline_seconds,
     )
     return ScrapeTriggerResponse(**result)
 
 
 @router.get("/status/{job_id}", response_model=ScrapeStatusResponse)
-def get_scrape_status(job_id: str):
-    job = scrape_job_manager.get_job(job_id)
+async def get_scrape_status(
+    job_id: str,
+    wait: int = Query(default=0, ge=0, le=_MAX_WAIT_SECONDS),
+    revision: Optional[int] = None,
+):
+    """Current state of a job.
+
+    With ``wait``, the request is held for up to that many seconds until the job
+    finishes or, if ``revision`` (as last seen by the caller) is given, until the
+    job changes at all.
+    """
+    if wait:
+        job = await _next_change(job_id, revision, wait)
+    else:
+        job = await run_in_threadpool(scrape_job_manager.get_job, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Scrape job not found")
+    return _status_response(job)
+
+
+@router.get("/status/{job_id}/events")
+async def stream_scrape_status(job_id: str, request: Request):
+    """Server-Sent Events for a job until it finishes.
+
+    A ``status`` event carries the job whenever its status changes (the first
+    event is always one), a ``progress`` event whenever its totals or controls
+    change in between, e.g. after every scraped page. Event ids are job
+    revisions, so a reconnecting client sending ``Last-Event-ID`` only gets newer
+    states.
+    """
+    job = await run_in_threadpool(scrape_job_manager.get_job, job_id)
     if not job:
         raise HTTPException(status_code=404, detail="Scrape job not found")
+    last_event_id = request.headers.get("last-event-id", "")
+    seen = int(last_event_id) if last_event_id.isdigit() else None
+
+    async def events() -> AsyncIterator[str]:
+        current = job
+        if seen is None or current["revision"] > seen:
+            yield _sse_event("status", current)
+        while current["status"] in LIVE_STATUSES:
+            if await request.is_disconnected():
+                return
+            latest = await _next_change(job_id, current["revision"], _STREAM_KEEPALIVE_SECONDS)
+            if latest is None:
+                return
+            if latest["revision"] == current["revision"] and latest["status"] == current["status"]:
+                yield ": keep-alive\n\n"
+                continue
+            yield _sse_event("status" if latest["status"] != current["status"] else "progress", latest)
+            current = latest
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/jobs", response_model=list[ScrapeStatusResponse])
+def find_scrape_jobs(correlation_id: str):
+    """Jobs submitted under ``correlation_id``, newest first."""
+    return [_status_response(job) for job in scrape_job_store.find_by_correlation_id(correlation_id)]
+
+
+@router.delete("/jobs/{job_id}", response_model=ScrapeStatusResponse)
+def cancel_scrape_job(job_id: str):
+    """Cancel a pending or running job; a running scrape stops before its next page and keeps what it stored."""
+    job = scrape_job_manager.cancel_job(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Scrape job not found")
+    if not job.get("cancel_requested_at"):
+        raise HTTPException(status_code=409, detail=f"Scrape job already {job['status']}")
+    return _status_response(job)
+
+
+@router.get("/queue", response_model=ScrapeQueueResponse)
+def get_scrape_queue():
+    """Work queue depth, worker usage and recent queue waits of this backend process."""
+    return ScrapeQueueResponse(**scrape_job_manager.queue_stats())
+
+
+@router.get("/refresh", response_model=RefreshStatusResponse)
+def get_refresh_status():
+    """Churn, cadence and page budget of the adaptive refresh scheduler."""
+    return RefreshStatusResponse(**refresh_scheduler.status())
+
+
+@router.get("/throttle", response_model=ThrottleStatusResponse)
+def get_throttle_status(_user_id: int = Depends(verify_token)):
+    """Request rate and circuit state per scraped host, as seen by this backend process."""
+    return ThrottleStatusResponse(max_rate_per_second=host_throttle.max_rate(), hosts=host_throttle.status())
+
+
+async def _next_change(job_id: str, seen_revision: Optional[int], timeout: float) -> Optional[dict[str, Any]]:
+    """The job once it is finished or past ``seen_revision``, or as it is after ``timeout`` seconds."""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    local_changes = scrape_job_store.local_changes(job_id)
+    job = await run_in_threadpool(scrape_job_manager.get_job, job_id)
+    read_at = loop.time()
+    while job is not None and not _has_news(job, seen_revision) and loop.time() < deadline:
+        await asyncio.sleep(min(_WAIT_LOCAL_POLL_SECONDS, max(0.0, deadline - loop.time())))
+        changes = scrape_job_store.local_changes(job_id)
+        if changes != local_changes or loop.time() - read_at >= _WAIT_DB_POLL_SECONDS:
+            local_changes = changes
+            job = await run_in_threadpool(scrape_job_manager.get_job, job_id)
+            read_at = loop.time()
+    return job
+
+
+def _has_news(job: dict[str, Any], seen_revision: Optional[int]) -> bool:
+    if job["status"] not in LIVE_STATUSES:
+        return True
+    return seen_revision is not None and job["revision"] > seen_revision
+
+
+def _sse_event(event: str, job: dict[str, Any]) -> str:
+    return f"id: {job['revision']}\nevent: {event}\ndata: {_status_response(job).model_dump_json()}\n\n"
+
 
+def _status_response(job: dict[str, Any]) -> ScrapeStatusResponse:
     created_at = datetime.fromisoformat(job["created_at"])
     age_seconds = int((datetime.utcnow() - created_at).total_seconds())
 
@@ -63,7 +262,11 @@ def get_scrape_status(job_id: str):
         created_at=job["created_at"],
         started_at=job.get("started_at"),
         finished_at=job.get("finished_at"),
+        deadline_at=job.get("deadline_at"),
+        cancel_requested_at=job.get("cancel_requested_at"),
         error=job.get("error"),
         result=job.get("result") or {},
         age_seconds=max(age_seconds, 0),
+        queue_position=job.get("queue_position"),
+        revision=job.get("revision", 0),
     )
@@ -28,5 +28,10 @@ class CarResponse(BaseModel):
 class CarsListResponse(BaseModel):
     items: list[CarResponse]
     total: int
-    page: int
+    # True when total is an approximation (total=estimate on a large result).
+    is_estimate: bool = False
+    # None when the page was requested by cursor.
+    page: Optional[int] = None
     per_page: int
+    # Pass as ?cursor= for the next page (same filters and sort); None on the last page.
+    next_cursor: Optional[str] = None
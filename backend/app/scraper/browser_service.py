@@ -0,0 +1,188 @@
+import asyncio
+from concurrent.futures import Future
+from contextlib import asynccontextmanager
+from datetime import datetime
+from threading import Lock, Thread
+from typing import Any, AsyncIterator, Coroutine, Iterator, Optional, TypeVar
+
+from app.config import settings
+
+T = TypeVar("T")
+
+# Listing data lives in the DOM; none of these are needed to extract it.
+BLOCKED_RESOURCE_TYPES = frozenset({"image", "media", "font", "stylesheet"})
+
+
+async def _block_non_essential(route) -> None:
+    if route.request.resource_type in BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+async def _next_item(iterator: AsyncIterator[T]) -> T:
+    return await iterator.__anext__()
+
+
+class BrowserService:
+    """Process-wide Playwright browser shared by all scrape jobs.
+
+    One daemon thread runs an event loop that owns a warm Chromium and a pool of
+    browser contexts (one page each). Jobs from any thread submit coroutines to
+    that loop; a watchdog relaunches the browser if it disconnects.
+    """
+
+    def __init__(self, pool_size: int) -> None:
+        self._pool_size = max(1, pool_size)
+        self._lock = Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[Thread] = None
+        self._launch_lock = asyncio.Lock()
+        self._playwright = None
+        self._browser = None
+        # Pool of (launch generation, page). The queue outlives relaunches so that
+        # jobs waiting for a page are woken by the fresh pool.
+        self._tabs: asyncio.Queue = asyncio.Queue()
+        self._launches = 0
+        self._last_launch_at: Optional[str] = None
+        self._last_error: Optional[str] = None
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = Thread(target=loop.run_forever, name="browser-service", daemon=True)
+                thread.start()
+                asyncio.run_coroutine_threadsafe(self._watchdog(), loop)
+                self._loop = loop
+                self._thread = thread
+            return self._loop
+
+    def submit(self, coro: Coroutine[Any, Any, T]) -> "Future[T]":
+        """Schedule ``coro`` on the service loop and return a thread-safe future."""
+        return asyncio.run_coroutine_threadsafe(coro, self._ensure_loop())
+
+    def iterate(self, iterator: AsyncIterator[T]) -> Iterator[T]:
+        """Drive an async iterator on the service loop from a synchronous caller."""
+        try:
+            while True:
+                try:
+                    yield self.submit(_next_item(iterator)).result()
+                except StopAsyncIteration:
+                    return
+        finally:
+            aclose = getattr(iterator, "aclose", None)
+            if aclose is not None:
+                self.submit(aclose()).result()
+
+    @asynccontextmanager
+    async def tab(self):
+        """Borrow a warm page from the context pool (must run on the service loop)."""
+        while True:
+            await self._ensure_browser()
+            generation, tab = await self._tabs.get()
+            if generation == self._launches:
+                break
+            # Left over from a browser that has since been relaunched.
+        try:
+            yield tab
+        finally:
+            # Pages from an older launch were already replaced when the pool was refilled.
+            if generation == self._launches:
+                if not tab.is_closed():
+                    self._tabs.put_nowait((generation, tab))
+                else:
+                    # Replace a crashed page so the pool keeps its size.
+                    try:
+                        self._tabs.put_nowait((generation, await self._new_tab()))
+                    except Exception as e:
+                        self._last_error = str(e)
+                        print(f"[scraper:browser] Failed to replace closed page: {e}")
+
+    async def _new_tab(self):
+        context = await self._browser.new_context()
+        await context.route("**/*", _block_non_essential)
+        tab = await context.new_page()
+        tab.set_default_timeout(30000)
+        return tab
+
+    async def _ensure_browser(self) -> None:
+        async with self._launch_lock:
+            if self._browser is not None and self._browser.is_connected():
+                return
+            await self._teardown()
+
+            from playwright.async_api import async_playwright
+
+            try:
+                self._playwright = await async_playwright().start()
+                self._browser = await self._playwright.chromium.launch(headless=True)
+                tabs = [await self._new_tab() for _ in range(self._pool_size)]
+            except Exception as e:
+                self._last_error = str(e)
+                await self._teardown()
+                raise
+            while not self._tabs.empty():
+                self._tabs.get_nowait()
+            self._launches += 1
+            for tab in tabs:
+                self._tabs.put_nowait((self._launches, tab))
+            self._last_launch_at = datetime.utcnow().isoformat()
+            print(f"[scraper:browser] Chromium launched with {self._pool_size} contexts (launch #{self._launches})")
+
+    async def _teardown(self) -> None:
+        browser, playwright = self._browser, self._playwright
+        self._browser = None
+        self._playwright = None
+        if browser is not None:
+            try:
+                await browser.close()
+            except Exception:
+                pass
+        if playwright is not None:
+            try:
+                await playwright.stop()
+            except Exception:
+                pass
+
+    async def _watchdog(self) -> None:
+        """Relaunch a browser that crashed, so the next job does not pay for it."""
+        while True:
+            await asyncio.sleep(max(1, settings.SCRAPE_BROWSER_HEALTHCHECK_SECONDS))
+            if self._browser is None or self._browser.is_connected():
+                continue
+            print("[scraper:browser] Browser disconnected; relaunching")
+            try:
+                await self._ensure_browser()
+            except Exception as e:
+                print(f"[scraper:browser] Relaunch failed: {e}")
+
+    def health(self) -> dict[str, Any]:
+        browser = self._browser
+        return {
+            "started": self._loop is not None,
+            "connected": bool(browser is not None and browser.is_connected()),
+            "pool_size": self._pool_size,
+            "idle_pages": self._tabs.qsize() if browser is not None else 0,
+            "launches": self._launches,
+            "last_launch_at": self._last_launch_at,
+            "last_error": self._last_error,
+        }
+
+    def stop(self) -> None:
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = None
+            self._thread = None
+        if loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._teardown(), loop).result(timeout=10)
+        except Exception as e:
+            print(f"[scraper:browser] Shutdown error: {e}")
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout=5)
+
+
+browser_service = BrowserService(settings.SCRAPE_BROWSER_CONTEXTS)
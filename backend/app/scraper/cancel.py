@@ -0,0 +1,49 @@
+from datetime import datetime
+from threading import Lock
+from typing import Optional
+
+# Why a token fired; they double as the statuses of jobs stopped this way.
+CANCELLED = "cancelled"
+EXPIRED = "expired"
+
+
+class CancelToken:
+    """Cooperative stop signal for a scrape run, checked between pages.
+
+    Fires when ``cancel()`` is called or once ``deadline`` (naive UTC) passes;
+    ``reason`` tells which. Scrape loops stop scheduling new pages when it fires
+    and keep what they already committed.
+    """
+
+    def __init__(self, deadline: Optional[datetime] = None) -> None:
+        self._lock = Lock()
+        self._deadline = deadline
+        self._reason: Optional[str] = None
+
+    @property
+    def deadline(self) -> Optional[datetime]:
+        return self._deadline
+
+    @property
+    def reason(self) -> Optional[str]:
+        with self._lock:
+            if self._reason is None and self._deadline is not None and datetime.utcnow() >= self._deadline:
+                self._reason = EXPIRED
+            return self._reason
+
+    @property
+    def cancelled(self) -> bool:
+        return self.reason is not None
+
+    def cancel(self, reason: str = CANCELLED) -> None:
+        with self._lock:
+            if self._reason is None:
+                self._reason = reason
+
+    def extend(self, deadline: Optional[datetime]) -> None:
+        """Push the deadline back to ``deadline``; None removes it. Never brings it forward."""
+        with self._lock:
+            if self._reason is not None or self._deadline is None:
+                return
+            if deadline is None or deadline > self._deadline:
+                self._deadline = deadline
@@ -0,0 +1,170 @@
+"""Sharded crawl: listing sources split into page-range shards that any number of workers lease from the database.
+
+Usage:
+    python -m app.scraper.crawl plan [--pages N] [--shard-pages N] [--catalog SLUG ...] [--no-catalog]
+    python -m app.scraper.crawl worker [--crawl CRAWL_ID] [--exit-when-idle]
+    python -m app.scraper.crawl status [CRAWL_ID]
+
+``plan`` records a crawl of the global listing and the brand catalogs,
+``--pages`` deep each, as shards of ``--shard-pages`` pages. Run ``worker`` in
+as many processes or containers as wanted against the same database; each one
+leases a shard, scrapes and upserts its pages, and moves on to the next.
+Shards whose worker died are picked up again once their lease expires; shards
+that failed are retried after a pause.
+"""
+import argparse
+import sys
+from threading import Event, Thread
+from typing import Any, Optional
+
+from app.config import settings
+from app.scraper.cancel import CancelToken
+from app.scraper.crawl_store import crawl_shard_store
+from app.scraper.job_store import PROCESS_ID
+from app.scraper.parser_bs import shutdown_parse_pool
+from app.scraper.scraper import crawl_sources, run_page_range
+from app.scraper.throttle import CircuitOpenError
+
+# How long an idle worker waits before looking for shards again.
+_IDLE_POLL_SECONDS = 5
+
+
+def plan_crawl(
+    max_pages: Optional[int] = None,
+    shard_pages: Optional[int] = None,
+    catalog_slugs: Optional[list[str]] = None,
+) -> str:
+    """Record a crawl of ``max_pages`` pages per source as pending shards; returns the crawl id.
+
+    ``catalog_slugs`` limits which brand catalogs are crawled besides the global
+    listing (all of them if None, none if empty).
+    """
+    pages = max_pages or settings.SCRAPE_MAX_PAGES
+    size = max(1, shard_pages or settings.SCRAPE_SHARD_PAGES)
+    sources = crawl_sources(catalog_slugs)
+    shards = [
+        (base_url, source, start, min(start + size - 1, pages))
+        for base_url, source in sources
+        for start in range(1, pages + 1, size)
+    ]
+    crawl_id = crawl_shard_store.create_crawl(shards)
+    print(
+        f"[crawl] Planned crawl {crawl_id}: {len(shards)} shards of up to {size} pages "
+        f"over {len(sources)} sources, {pages} pages deep"
+    )
+    return crawl_id
+
+
+def run_shard(shard: dict[str, Any]) -> bool:
+    """Scrape one leased shard while renewing its lease. Returns whether the shard was completed.
+
+    Raises ``CircuitOpenError`` if the shard's host is suspended; the shard is
+    then given back without counting the attempt.
+    """
+    token = CancelToken()
+    stop = Event()
+
+    def keep_lease() -> None:
+        interval = max(1, settings.SCRAPE_SHARD_LEASE_SECONDS // 3)
+        while not stop.wait(interval):
+            try:
+                if not crawl_shard_store.renew(shard["id"], shard["lease_version"]):
+                    print(f"[crawl] Lost the lease on shard {shard['id']}; stopping it")
+                    token.cancel()
+                    return
+            except Exception as e:
+                print(f"[crawl] Failed to renew the lease on shard {shard['id']}: {e}")
+
+    label = f"shard {shard['id']} ({shard['source']} pages {shard['start_page']}-{shard['end_page']})"
+    print(f"[crawl] Starting {label}, attempt {shard['attempts']}")
+    Thread(target=keep_lease, name=f"crawl-lease-{shard['id']}", daemon=True).start()
+    try:
+        result = run_page_range(shard["base_url"], shard["start_page"], shard["end_page"], cancel=token)
+    except CircuitOpenError as e:
+        print(f"[crawl] {label} postponed: {e}")
+        crawl_shard_store.release(shard, str(e), retry_in=e.retry_in)
+        raise
+    except Exception as e:
+        print(f"[crawl] {label} failed: {e}")
+        crawl_shard_store.release(shard, str(e))
+        return False
+    finally:
+        stop.set()
+
+    if token.cancelled:
+        # Another worker holds the shard now; its rows are upserted again there.
+        return False
+    if not crawl_shard_store.complete(shard["id"], shard["lease_version"], result):
+        print(f"[crawl] {label} finished after its lease was taken over")
+        return False
+    print(
+        f"[crawl] Finished {label}: {result['pages']} pages, "
+        f"{result['inserted']} inserted, {result['updated']} updated"
+    )
+    return True
+
+
+def run_worker(crawl_id: Optional[str] = None, exit_when_idle: bool = False, stop: Optional[Event] = None) -> int:
+    """Claim and run shards until ``stop`` is set. Returns the number of shards completed.
+
+    With ``exit_when_idle`` the worker returns once no shard is pending or
+    leased anymore; otherwise it keeps polling for new crawls.
+    """
+    stop = stop or Event()
+    completed = 0
+    print(f"[crawl] Worker {PROCESS_ID} started" + (f" on crawl {crawl_id}" if crawl_id else ""))
+    while not stop.is_set():
+        shard = crawl_shard_store.claim(PROCESS_ID, crawl_id)
+        if shard is not None:
+            try:
+                completed += int(run_shard(shard))
+            except CircuitOpenError as e:
+                # Every shard of the host would be postponed the same way; wait for the circuit instead.
+                stop.wait(e.retry_in)
+            continue
+        if exit_when_idle and not crawl_shard_store.has_open_shards(crawl_id):
+            break
+        # Nothing claimable: wait for new shards or for leases held elsewhere to run out.
+        stop.wait(_IDLE_POLL_SECONDS)
+    print(f"[crawl] Worker {PROCESS_ID} stopping after {completed} shards")
+    return completed
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.scraper.crawl", description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    plan = commands.add_parser("plan", help="split a crawl into shards")
+    plan.add_argument("--pages", type=int, help="pages per source (default SCRAPE_MAX_PAGES)")
+    plan.add_argument("--shard-pages", type=int, help="pages per shard (default SCRAPE_SHARD_PAGES)")
+    plan.add_argument("--catalog", nargs="+", metavar="SLUG", help="only these brand catalogs")
+    plan.add_argument("--no-catalog", action="store_true", help="only the global listing")
+
+    worker = commands.add_parser("worker", help="claim and run shards")
+    worker.add_argument("--crawl", help="only shards of this crawl")
+    worker.add_argument("--exit-when-idle", action="store_true", help="stop once no shard is left")
+
+    status = commands.add_parser("status", help="show the progress of a crawl")
+    status.add_argument("crawl_id", nargs="?", help="default: the latest crawl")
+
+    args = parser.parse_args(argv)
+    try:
+        if args.command == "plan":
+            print(plan_crawl(args.pages, args.shard_pages, [] if args.no_catalog else args.catalog))
+        elif args.command == "worker":
+            run_worker(args.crawl, args.exit_when_idle)
+        else:
+            crawl_id = args.crawl_id or crawl_shard_store.latest_crawl_id()
+            if crawl_id is None:
+                print("[crawl] No crawls recorded")
+                return 1
+            progress = crawl_shard_store.progress(crawl_id)
+            print(f"[crawl] {crawl_id}: shards {progress['shards']}")
+            print(f"[crawl] totals: {progress['result']}")
+    finally:
+        shutdown_parse_pool()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,228 @@
+from datetime import datetime, timedelta
+from typing import Any, Optional
+from uuid import uuid4
+
+from sqlalchemy import and_, func, insert, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import CrawlShard
+from app.scraper.job_store import DONE, FAILED, PENDING, _isoformat
+
+LEASED = "leased"
+
+# Candidate shards read per claim attempt; losers of a race move on to the next one.
+_CLAIM_CANDIDATES = 10
+
+
+def shard_to_dict(shard: CrawlShard) -> dict[str, Any]:
+    return {
+        "id": shard.id,
+        "crawl_id": shard.crawl_id,
+        "source": shard.source,
+        "base_url": shard.base_url,
+        "start_page": shard.start_page,
+        "end_page": shard.end_page,
+        "status": shard.status,
+        "lease_owner": shard.lease_owner,
+        "lease_expires_at": _isoformat(shard.lease_expires_at),
+        "lease_version": shard.lease_version,
+        "attempts": shard.attempts,
+        "retry_at": _isoformat(shard.retry_at),
+        "result": shard.result or {},
+        "error": shard.error,
+    }
+
+
+class CrawlShardStore:
+    """Crawl shards in the ``crawl_shards`` table, leased to workers in any process or host.
+
+    A worker claims a shard with an UPDATE conditioned on the ``lease_version``
+    it read and bumps it, so of two workers racing for a shard exactly one wins
+    and no row locks are held. The lease lasts ``SCRAPE_SHARD_LEASE_SECONDS`` and
+    is renewed while the worker scrapes; a shard whose lease ran out (worker
+    crashed or stalled) can be claimed again. A shard given back after an error
+    waits ``SCRAPE_SHARD_RETRY_SECONDS`` times its attempts so far before it can
+    be claimed again, so a brief outage does not use up its attempts. After
+    ``SCRAPE_SHARD_MAX_ATTEMPTS`` claims a shard is failed instead.
+    """
+
+    def create_crawl(self, shards: list[tuple[str, str, int, int]]) -> str:
+        """Insert ``(base_url, source, start_page, end_page)`` shards as one pending crawl; returns its id."""
+        crawl_id = str(uuid4())
+        now = datetime.utcnow()
+        rows = [
+            {
+                "crawl_id": crawl_id,
+                "base_url": base_url,
+                "source": source,
+                "start_page": start_page,
+                "end_page": end_page,
+                "status": PENDING,
+                "lease_version": 0,
+                "attempts": 0,
+                "created_at": now,
+            }
+            for base_url, source, start_page, end_page in shards
+        ]
+        with SessionLocal() as db:
+            if rows:
+                db.execute(insert(CrawlShard), rows)
+            db.commit()
+        return crawl_id
+
+    def claim(self, owner: str, crawl_id: Optional[str] = None) -> Optional[dict[str, Any]]:
+        """Lease the oldest claimable shard to ``owner``; None if there is nothing to claim."""
+        while True:
+            now = datetime.utcnow()
+            claimable = or_(
+                and_(CrawlShard.status == PENDING, or_(CrawlShard.retry_at.is_(None), CrawlShard.retry_at <= now)),
+                and_(CrawlShard.status == LEASED, CrawlShard.lease_expires_at < now),
+            )
+            query = select(CrawlShard.id, CrawlShard.lease_version, CrawlShard.attempts).where(claimable)
+            if crawl_id is not None:
+                query = query.where(CrawlShard.crawl_id == crawl_id)
+            with SessionLocal() as db:
+                candidates = db.execute(query.order_by(CrawlShard.id).limit(_CLAIM_CANDIDATES)).all()
+                if not candidates:
+                    return None
+                for candidate in candidates:
+                    won = self._take(db, candidate, owner, now)
+                    if won:
+                        return shard_to_dict(db.get(CrawlShard, candidate.id))
+            # Every candidate went to another worker (or was failed); read a fresh batch.
+
+    def renew(self, shard_id: int, lease_version: int) -> bool:
+        """Extend a lease; False if the shard was reclaimed by another worker since."""
+        return self._update(
+            shard_id,
+            lease_version,
+            {"lease_expires_at": datetime.utcnow() + timedelta(seconds=settings.SCRAPE_SHARD_LEASE_SECONDS)},
+        )
+
+    def complete(self, shard_id: int, lease_version: int, result: dict[str, int]) -> bool:
+        return self._update(
+            shard_id,
+            lease_version,
+            {
+                "status": DONE,
+                "result": result,
+                "error": None,
+                "lease_expires_at": None,
+                "finished_at": datetime.utcnow(),
+            },
+        )
+
+    def release(
+        self,
+        shard: dict[str, Any],
+        error: str,
+        result: Optional[dict[str, int]] = None,
+        retry_in: Optional[float] = None,
+    ) -> bool:
+        """Give a shard back after an error: pending for a later attempt, or failed once out of attempts.
+
+        With ``retry_in`` the shard was never tried (its host is suspended): its
+        attempt is given back and it becomes claimable after ``retry_in`` seconds.
+        """
+        values: dict[str, Any] = {"error": error, "lease_expires_at": None}
+        if result is not None:
+            values["result"] = result
+        now = datetime.utcnow()
+        if retry_in is not None:
+            values.update(
+                status=PENDING,
+                attempts=max(0, shard["attempts"] - 1),
+                retry_at=now + timedelta(seconds=max(0.0, retry_in)),
+            )
+        elif shard["attempts"] >= settings.SCRAPE_SHARD_MAX_ATTEMPTS:
+            values.update(status=FAILED, finished_at=now)
+        else:
+            backoff = settings.SCRAPE_SHARD_RETRY_SECONDS * shard["attempts"]
+            values.update(status=PENDING, retry_at=now + timedelta(seconds=backoff))
+        return self._update(shard["id"], shard["lease_version"], values)
+
+    def has_open_shards(self, crawl_id: Optional[str] = None) -> bool:
+        """Whether any shard (of ``crawl_id``) is still pending or leased."""
+        query = select(CrawlShard.id).where(CrawlShard.status.in_((PENDING, LEASED)))
+        if crawl_id is not None:
+            query = query.where(CrawlShard.crawl_id == crawl_id)
+        with SessionLocal() as db:
+            return db.scalar(query.limit(1)) is not None
+
+    def latest_crawl_id(self) -> Optional[str]:
+        with SessionLocal() as db:
+            return db.scalar(select(CrawlShard.crawl_id).order_by(CrawlShard.id.desc()).limit(1))
+
+    def progress(self, crawl_id: str) -> dict[str, Any]:
+        """Shard counts per status and the summed results of a crawl."""
+        with SessionLocal() as db:
+            counts = dict(
+                db.execute(
+                    select(CrawlShard.status, func.count())
+                    .where(CrawlShard.crawl_id == crawl_id)
+                    .group_by(CrawlShard.status)
+                ).all()
+            )
+            results = db.scalars(select(CrawlShard.result).where(CrawlShard.crawl_id == crawl_id)).all()
+        totals: dict[str, int] = {}
+        for result in results:
+            for key, value in (result or {}).items():
+                totals[key] = totals.get(key, 0) + value
+        return {"crawl_id": crawl_id, "shards": counts, "result": totals}
+
+    @staticmethod
+    def _take(db: Session, candidate, owner: str, now: datetime) -> bool:
+        guard = and_(
+            CrawlShard.id == candidate.id,
+            CrawlShard.lease_version == candidate.lease_version,
+            # A lease renewed since it was read is no longer up for grabs.
+            or_(CrawlShard.status == PENDING, CrawlShard.lease_expires_at < now),
+        )
+        if candidate.attempts >= settings.SCRAPE_SHARD_MAX_ATTEMPTS:
+            # Its last lease ran out too: give up on it rather than retry forever.
+            db.execute(
+                update(CrawlShard)
+                .where(guard)
+                .values(
+                    status=FAILED,
+                    error=f"Lease expired on all {candidate.attempts} attempts",
+                    lease_expires_at=None,
+                    finished_at=now,
+                )
+            )
+            db.commit()
+            return False
+        count = db.execute(
+            update(CrawlShard)
+            .where(guard)
+            .values(
+                status=LEASED,
+                lease_owner=owner,
+                lease_expires_at=now + timedelta(seconds=settings.SCRAPE_SHARD_LEASE_SECONDS),
+                lease_version=candidate.lease_version + 1,
+                attempts=candidate.attempts + 1,
+            )
+        ).rowcount
+        db.commit()
+        return bool(count)
+
+    @staticmethod
+    def _update(shard_id: int, lease_version: int, values: dict[str, Any]) -> bool:
+        # Only the current lease holder may change a leased shard.
+        with SessionLocal() as db:
+            count = db.execute(
+                update(CrawlShard)
+                .where(
+                    CrawlShard.id == shard_id,
+                    CrawlShard.lease_version == lease_version,
+                    CrawlShard.status == LEASED,
+                )
+                .values(**values)
+            ).rowcount
+            db.commit()
+            return bool(count)
+
+
+crawl_shard_store = CrawlShardStore()
@@ -0,0 +1,148 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Optional
+
+import requests
+from bs4 import BeautifulSoup
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.data_versions import CARS, bump_version
+from app.models import Car
+from app.scraper.fingerprints import fingerprint
+from app.scraper.parser_bs import _host_slot, get_session, normalize_text, parse_price, parse_year
+from app.scraper.throttle import host_throttle
+
+_ENRICHABLE_FIELDS = ("color", "year", "price")
+
+# Labels of the spec table rows on a detail page, per field.
+_DETAIL_LABELS = {
+    "color": ("色", "ボディカラー", "カラー", "外装色"),
+    "year": ("年式", "初度登録年月"),
+    "price": ("支払総額", "車両本体価格", "本体価格"),
+}
+# Placeholders the site shows instead of a value.
+_EMPTY_VALUES = {"", "-", "－", "―", "不明"}
+
+
+def parse_detail_html(html: str | bytes) -> dict[str, Any]:
+    """Extract the enrichable fields from a listing detail page; missing ones are left out."""
+    if isinstance(html, bytes):
+        html = html.decode("utf-8", errors="replace")
+    soup = BeautifulSoup(html, "lxml")
+    found: dict[str, Any] = {}
+    for label_el in soup.select("th, dt"):
+        label = normalize_text(label_el.get_text(strip=True))
+        value_el = label_el.find_next_sibling(["td", "dd"])
+        if value_el is None:
+            continue
+        for field, labels in _DETAIL_LABELS.items():
+            if field in found or label not in labels:
+                continue
+            text = normalize_text(value_el.get_text(" ", strip=True), max_len=100)
+            if text in _EMPTY_VALUES:
+                continue
+            if field == "color":
+                found[field] = text
+            elif field == "year":
+                value = parse_year(text)
+                if value is not None:
+                    found[field] = value
+            else:
+                value = parse_price(text)
+                if value is not None:
+                    found[field] = value
+    return found
+
+
+def _fetch_detail(url: str) -> tuple[str, Optional[dict[str, Any]]]:
+    """Fetch and parse one detail page. Returns ("ok", fields), ("gone", None) or ("error", None)."""
+    try:
+        with host_throttle.request(url) as call:
+            with _host_slot(url):
+                response = get_session().get(url, timeout=30)
+            call.respond(response.status_code, response.elapsed.total_seconds(), response.headers.get("Retry-After"))
+        if response.status_code in (404, 410):
+            return "gone", None
+        response.raise_for_status()
+        return "ok", parse_detail_html(response.content)
+    except requests.RequestException as e:
+        print(f"[scraper:enrich] Failed to fetch {url}: {e}")
+        return "error", None
+
+
+def enrich_missing(db: Session, budget: Optional[int] = None) -> dict[str, int]:
+    """Fill missing color/year/price of stored listings from their detail pages.
+
+    Picks up to ``budget`` (``SCRAPE_ENRICH_BUDGET``) of the most recently
+    updated listings with a missing field whose current content has not been
+    enriched yet, and fetches their detail pages ``SCRAPE_ENRICH_CONCURRENCY``
+    at a time. Only missing fields are filled. A listing is marked with the
+    fingerprint it was enriched for, so its detail page is fetched again only
+    after the listing itself changes. A fetch error leaves it unmarked but
+    records the failure time, and failed listings come after all others
+    (oldest failure first), so a page that keeps failing cannot take up the
+    budget of every run.
+    """
+    limit = settings.SCRAPE_ENRICH_BUDGET if budget is None else budget
+    stats = {"checked": 0, "enriched": 0, "failed": 0}
+    if limit <= 0:
+        return stats
+
+    rows = db.execute(
+        select(
+            Car.id,
+            Car.url,
+            Car.fingerprint,
+            Car.updated_at,
+            Car.brand,
+            Car.model,
+            *(getattr(Car, f) for f in _ENRICHABLE_FIELDS),
+        )
+        .where(or_(*(getattr(Car, field).is_(None) for field in _ENRICHABLE_FIELDS)))
+        .where(or_(Car.enriched_fingerprint.is_(None), Car.enriched_fingerprint != Car.fingerprint))
+        .order_by(Car.enrich_failed_at.is_not(None), Car.enrich_failed_at, Car.updated_at.desc())
+        .limit(limit)
+    ).all()
+    if not rows:
+        return stats
+
+    workers = max(1, min(settings.SCRAPE_ENRICH_CONCURRENCY, len(rows)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scraper-enrich") as pool:
+        outcomes = list(pool.map(_fetch_detail, [row.url for row in rows]))
+
+    now = datetime.utcnow()
+    updates = []
+    for row, (status, fields) in zip(rows, outcomes):
+        stats["checked"] += 1
+        if status == "error":
+            stats["failed"] += 1
+            # The listing itself did not change: keep updated_at, which the ORM would otherwise bump.
+            updates.append({"id": row.id, "enrich_failed_at": now, "updated_at": row.updated_at})
+            continue
+        values: dict[str, Any] = {
+            "id": row.id,
+            # Rows scraped before fingerprints existed are marked with what they would hash to.
+            "enriched_fingerprint": row.fingerprint or fingerprint(row._asdict()),
+            "enrich_failed_at": None,
+        }
+        filled = {field: value for field, value in (fields or {}).items() if getattr(row, field) is None}
+        if filled:
+            values.update(filled, updated_at=now)
+            stats["enriched"] += 1
+        updates.append(values)
+
+    if updates:
+        # Grouped by key set: rows that got new values also carry updated_at.
+        for keys in {frozenset(values) for values in updates}:
+            db.execute(update(Car), [values for values in updates if frozenset(values) == keys])
+        if stats["enriched"]:
+            bump_version(db, CARS)
+        db.commit()
+
+    print(
+        f"[scraper:enrich] Checked {stats['checked']} detail pages: "
+        f"{stats['enriched']} enriched, {stats['failed']} failed"
+    )
+    return stats
@@ -0,0 +1,14 @@
+import hashlib
+
+_FINGERPRINT_FIELDS = ("brand", "model", "year", "price", "color")
+
+
+def fingerprint(data: dict) -> bytes:
+    """Digest of the scraped content of a listing, used to detect unchanged rows."""
+    digest = hashlib.blake2b(digest_size=16)
+    for field in _FINGERPRINT_FIELDS:
+        value = data.get(field)
+        # \x00 marks a missing value so None and "" hash differently.
+        digest.update(b"\x00" if value is None else str(value).encode("utf-8"))
+        digest.update(b"\x1f")
+    return digest.digest()
@@ -0,0 +1,83 @@
+import json
+import os
+from threading import Lock
+from typing import Optional
+
+import requests
+
+from app.config import settings
+
+
+class ValidatorStore:
+    """On-disk map of URL -> ETag / Last-Modified used for conditional GETs."""
+
+    def __init__(self, path: str) -> None:
+        self._path = path
+        self._lock = Lock()
+        self._entries: Optional[dict[str, dict[str, str]]] = None
+
+    def _load(self) -> dict[str, dict[str, str]]:
+        if self._entries is None:
+            entries: dict[str, dict[str, str]] = {}
+            if self._path and os.path.exists(self._path):
+                try:
+                    with open(self._path, encoding="utf-8") as fh:
+                        entries = json.load(fh)
+                except (OSError, ValueError) as e:
+                    print(f"[scraper:http] Ignoring unreadable validator store {self._path}: {e}")
+            self._entries = entries
+        return self._entries
+
+    def _save(self) -> None:
+        if not self._path:
+            return
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self._path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump(self._entries, fh)
+        os.replace(tmp_path, self._path)
+
+    def conditional_headers(self, url: str) -> dict[str, str]:
+        if not self._path:
+            return {}
+        with self._lock:
+            entry = self._load().get(url) or {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def remember(self, url: str, response: requests.Response) -> None:
+        if not self._path:
+            return
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        with self._lock:
+            entries = self._load()
+            if etag or last_modified:
+                entry = {"etag": etag, "last_modified": last_modified}
+                if entries.get(url) == entry:
+                    return
+                entries[url] = entry
+            elif entries.pop(url, None) is None:
+                return
+            try:
+                self._save()
+            except OSError as e:
+                print(f"[scraper:http] Failed to persist validator store: {e}")
+
+    def clear(self) -> None:
+        """Forget all validators so the next run downloads every page in full."""
+        with self._lock:
+            self._entries = {}
+            try:
+                self._save()
+            except OSError as e:
+                print(f"[scraper:http] Failed to persist validator store: {e}")
+
+
+validator_store = ValidatorStore(settings.SCRAPE_VALIDATOR_STORE_PATH)
@@ -1,12 +1,19 @@
 from __future__ import annotations
 
-from datetime import datetime
-from threading import Lock, Semaphore, Thread
-from typing import Any
+import heapq
+import itertools
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from functools import partial
+from threading import Condition, Event, Lock, Thread
+from typing import Any, Callable, NamedTuple
 from uuid import uuid4
 
 from app.config import settings
-from app.scraper.scraper import run_scraper
+from app.scraper.cancel import CancelToken
+from app.scraper.job_store import DONE, FAILED, LIVE_STATUSES, PENDING, scrape_job_store
+from app.scraper.scraper import ProgressCallback, filters_cover, resolve_source, run_scraper
 
 _ALLOWED_SIGNATURE_KEYS = (
     "brand",
@@ -18,13 +25,63 @@ _ALLOWED_SIGNATURE_KEYS = (
     "max_year",
 )
 
+# Priority classes, most urgent first: a user waiting in the bot vs. the periodic crawl.
+INTERACTIVE = "interactive"
+SCHEDULED = "scheduled"
+PRIORITIES = (INTERACTIVE, SCHEDULED)
+
+# Recent queue waits kept per priority class for the stats.
+_WAIT_SAMPLES = 200
+
+# Work queued with submit_task: gets the job's cancel token and progress callback, returns its result.
+Task = Callable[[CancelToken, ProgressCallback], dict[str, int]]
+
+
+class _QueuedJob(NamedTuple):
+    priority: str
+    seq: int
+    queued_at: float
+    filters: dict[str, Any]
+    page_limit: int
+    # Run instead of run_scraper for jobs queued with submit_task.
+    task: Task | None = None
+
 
 class ScrapeJobManager:
+    """Queues scrape jobs for a fixed pool of worker threads and records them in the shared job store.
+
+    ``MAX_CONCURRENT_SCRAPES`` workers take jobs interactive-first, FIFO within
+    a priority class. Jobs, their progress and results live in
+    ``scrape_job_store``, so any backend process can report on them. A request
+    is attached to an existing job whose crawl covers it: same source (brand
+    catalog or global listing), at least as many pages, and brand/model terms
+    no narrower than the request's. Jobs that finished successfully within
+    ``SCRAPE_RESULT_FRESHNESS_SECONDS`` are preferred over live ones in any
+    process; otherwise a new job starts. An interactive request that attaches to
+    a scheduled job still queued in this process promotes it.
+
+    Every job has a deadline (``deadline_seconds``, default
+    ``SCRAPE_JOB_DEADLINE_SECONDS``) that each request attaching to it can push
+    back. A job past its deadline or cancelled through ``cancel_job`` stops
+    between pages and keeps its partial results; requests made through another
+    process reach the running scrape on the next heartbeat.
+    """
+
     def __init__(self) -> None:
         self._lock = Lock()
-        self._semaphore = Semaphore(max(1, settings.MAX_CONCURRENT_SCRAPES))
-        self._jobs: dict[str, dict[str, Any]] = {}
-        self._running_by_signature: dict[str, str] = {}
+        self._ready = Condition(self._lock)
+        # Heap of (priority rank, seq, job_id); promoted jobs leave a stale entry behind
+        # that workers skip, since only _queued decides what is still waiting.
+        self._heap: list[tuple[int, int, str]] = []
+        self._queued: dict[str, _QueuedJob] = {}
+        # Cancel tokens of the jobs queued or running in this process.
+        self._tokens: dict[str, CancelToken] = {}
+        self._seq = itertools.count()
+        self._workers: list[Thread] = []
+        self._busy = 0
+        self._waits: dict[str, deque] = {priority: deque(maxlen=_WAIT_SAMPLES) for priority in PRIORITIES}
+        self._heartbeat_started = False
+        self._stopped = Event()
 
     def _build_signature(self, filters: dict[str, Any]) -> str:
         parts = []
@@ -43,100 +100,306 @@ class ScrapeJobManager:
         *,
         filters: dict[str, Any],
         correlation_id: str,
+        priority: str = INTERACTIVE,
+        deadline_seconds: int | None = None,
     ) -> dict[str, Any]:
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority {priority!r}")
+        deadline_at = self._deadline_at(deadline_seconds)
         signature = self._build_signature(filters)
+        page_limit = settings.SCRAPE_TARGET_MAX_PAGES if filters else settings.SCRAPE_MAX_PAGES
+        _, source, scrape_filters = resolve_source(filters)
 
-        with self._lock:
-            existing_job_id = self._running_by_signature.get(signature)
-            if existing_job_id and existing_job_id in self._jobs:
-                existing = self._jobs[existing_job_id]
-                return {
-                    "job_id": existing["job_id"],
-                    "status": existing["status"],
-                    "signature": existing["signature"],
-                    "reused": True,
-                }
+        covering = self._find_covering_job(source, page_limit, scrape_filters)
+        if covering is not None:
+            return self._reused(covering, priority, deadline_at)
 
-            job_id = str(uuid4())
-            now = datetime.utcnow().isoformat()
-            job = {
-                "job_id": job_id,
-                "status": "pending",
-                "signature": signature,
-                "filters": filters,
-                "correlation_id": correlation_id,
-                "created_at": now,
-                "started_at": None,
-                "finished_at": None,
-                "error": None,
-                "result": {
-                    "fetched": 0,
-                    "inserted": 0,
-                    "updated": 0,
-                    "skipped": 0,
-                    "failed": 0,
-                    "expanded": 0,
-                },
-            }
-            self._jobs[job_id] = job
-            self._running_by_signature[signature] = job_id
+        job, created = scrape_job_store.create(
+            job_id=str(uuid4()),
+            signature=signature,
+            filters=filters,
+            correlation_id=correlation_id,
+            source=source,
+            max_pages=page_limit,
+            deadline_at=deadline_at,
+        )
+        if not created:
+            return self._reused(job, priority, deadline_at)
 
-        worker = Thread(target=self._run_job, args=(job_id,), daemon=True)
-        worker.start()
+        self._ensure_workers()
+        with self._lock:
+            self._tokens[job["job_id"]] = CancelToken(deadline_at)
+        self._enqueue(job["job_id"], _QueuedJob(priority, 0, time.monotonic(), dict(filters), page_limit))
 
         return {
-            "job_id": job_id,
-            "status": "pending",
+            "job_id": job["job_id"],
+            "status": job["status"],
             "signature": signature,
             "reused": False,
+            "queue_position": self.queue_position(job["job_id"]),
+            "revision": job["revision"],
         }
 
-    def _run_job(self, job_id: str) -> None:
-        with self._semaphore:
+    def submit_task(
+        self,
+        *,
+        signature: str,
+        source: str,
+        correlation_id: str,
+        task: Task,
+        priority: str = SCHEDULED,
+    ) -> dict[str, Any] | None:
+        """Queue background work that is not a filter set (a page band refresh, enrichment) as a job.
+
+        The job goes through the same queue, workers and job store as scrape
+        requests, but requests never attach to it (its ``max_pages`` is 0).
+        Returns None if a job with ``signature`` is still live.
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority {priority!r}")
+        deadline_at = self._deadline_at(None)
+        job, created = scrape_job_store.create(
+            job_id=str(uuid4()),
+            signature=signature,
+            filters={},
+            correlation_id=correlation_id,
+            source=source,
+            max_pages=0,
+            deadline_at=deadline_at,
+        )
+        if not created:
+            return None
+        self._ensure_workers()
+        with self._lock:
+            self._tokens[job["job_id"]] = CancelToken(deadline_at)
+        self._enqueue(job["job_id"], _QueuedJob(priority, 0, time.monotonic(), {}, 0, task))
+        return job
+
+    def _find_covering_job(self, source: str, pages: int, scrape_filters: dict[str, Any]) -> dict[str, Any] | None:
+        candidates = scrape_job_store.find_reusable(source, pages, settings.SCRAPE_RESULT_FRESHNESS_SECONDS)
+        for job in candidates:
+            if filters_cover(resolve_source(job["filters"])[2], scrape_filters):
+                return job
+        return None
+
+    @staticmethod
+    def _deadline_at(deadline_seconds: int | None) -> datetime | None:
+        seconds = settings.SCRAPE_JOB_DEADLINE_SECONDS if deadline_seconds is None else deadline_seconds
+        return datetime.utcnow() + timedelta(seconds=seconds) if seconds > 0 else None
+
+    def _reused(self, job: dict[str, Any], priority: str, deadline_at: datetime | None) -> dict[str, Any]:
+        if job["status"] in LIVE_STATUSES:
+            # The job now also serves this request, so it may run as long as this request waits.
+            scrape_job_store.extend_deadline(job["job_id"], deadline_at)
             with self._lock:
-                job = self._jobs.get(job_id)
-                if not job:
-                    return
-                job["status"] = "running"
-                job["started_at"] = datetime.utcnow().isoformat()
-                filters = dict(job.get("filters") or {})
+                token = self._tokens.get(job["job_id"])
+            if token is not None:
+                token.extend(deadline_at)
+        if job["status"] == PENDING and priority == INTERACTIVE:
+            self._promote(job["job_id"])
+        response = {
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "signature": job["signature"],
+            "reused": True,
+            "queue_position": self.queue_position(job["job_id"]),
+            "revision": job["revision"],
+        }
+        if job["status"] == DONE and job.get("finished_at"):
+            finished_at = datetime.fromisoformat(job["finished_at"])
+            response["age_seconds"] = max(0, int((datetime.utcnow() - finished_at).total_seconds()))
+        return response
 
+    # Queue
+
+    def _enqueue(self, job_id: str, queued: _QueuedJob) -> None:
+        with self._ready:
+            queued = queued._replace(seq=next(self._seq))
+            self._queued[job_id] = queued
+            heapq.heappush(self._heap, (PRIORITIES.index(queued.priority), queued.seq, job_id))
+            self._ready.notify()
+
+    def _promote(self, job_id: str) -> None:
+        """Move a job still queued in this process into the interactive class."""
+        with self._ready:
+            queued = self._queued.get(job_id)
+            if queued is None or queued.priority == INTERACTIVE:
+                return
+            # Keeps its original wait clock; the old heap entry is skipped when popped.
+            queued = queued._replace(priority=INTERACTIVE, seq=next(self._seq))
+            self._queued[job_id] = queued
+            heapq.heappush(self._heap, (0, queued.seq, job_id))
+            self._ready.notify()
+        print(f"[jobs] Promoted queued job {job_id} to {INTERACTIVE}")
+
+    def _next_job(self) -> tuple[str, _QueuedJob] | None:
+        with self._ready:
+            while True:
+                if self._stopped.is_set():
+                    return None
+                while self._heap:
+                    _, seq, job_id = heapq.heappop(self._heap)
+                    queued = self._queued.get(job_id)
+                    if queued is None or queued.seq != seq:
+                        continue
+                    del self._queued[job_id]
+                    self._waits[queued.priority].append(time.monotonic() - queued.queued_at)
+                    self._busy += 1
+                    return job_id, queued
+                self._ready.wait()
+
+    def _worker_loop(self) -> None:
+        while True:
+            item = self._next_job()
+            if item is None:
+                return
+            job_id, queued = item
             try:
-                page_limit = settings.SCRAPE_TARGET_MAX_PAGES if filters else settings.SCRAPE_MAX_PAGES
-                result = run_scraper(
-                    max_pages=page_limit,
-                    target_filters=filters or None,
-                    allow_fallback_expansion=True,
-                )
-                with self._lock:
-                    job = self._jobs.get(job_id)
-                    if not job:
-                        return
-                    job["status"] = "done"
-                    job["result"] = result
-                    job["finished_at"] = datetime.utcnow().isoformat()
-            except Exception as exc:
-                with self._lock:
-                    job = self._jobs.get(job_id)
-                    if not job:
-                        return
-                    job["status"] = "failed"
-                    job["error"] = str(exc)
-                    job["finished_at"] = datetime.utcnow().isoformat()
+                self._run_job(job_id, queued)
+            except Exception as e:
+                print(f"[jobs] Worker error on job {job_id}: {e}")
             finally:
                 with self._lock:
-                    job = self._jobs.get(job_id)
-                    if job:
-                        signature = job.get("signature")
-                        if signature and self._running_by_signature.get(signature) == job_id:
-                            self._running_by_signature.pop(signature, None)
+                    self._busy -= 1
 
-    def get_job(self, job_id: str) -> dict[str, Any] | None:
+    def _ensure_workers(self) -> None:
+        with self._lock:
+            if self._workers:
+                return
+            for index in range(max(1, settings.MAX_CONCURRENT_SCRAPES)):
+                worker = Thread(target=self._worker_loop, name=f"scrape-worker-{index}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+        self._ensure_heartbeat()
+
+    def queue_position(self, job_id: str) -> int | None:
+        """1-based position of a job queued in this process, in dispatch order."""
         with self._lock:
-            job = self._jobs.get(job_id)
-            if not job:
+            queued = self._queued.get(job_id)
+            if queued is None:
                 return None
-            return dict(job)
+            key = (PRIORITIES.index(queued.priority), queued.seq)
+            return 1 + sum(
+                1 for other in self._queued.values() if (PRIORITIES.index(other.priority), other.seq) < key
+            )
+
+    def queue_stats(self) -> dict[str, Any]:
+        """Queue depth, worker usage and recent queue waits of this process, per priority class."""
+        now = time.monotonic()
+        with self._lock:
+            classes = {}
+            for priority in PRIORITIES:
+                waiting = [now - queued.queued_at for queued in self._queued.values() if queued.priority == priority]
+                waits = list(self._waits[priority])
+                classes[priority] = {
+                    "depth": len(waiting),
+                    "oldest_wait_seconds": round(max(waiting), 3) if waiting else None,
+                    "recent_dispatches": len(waits),
+                    "avg_wait_seconds": round(sum(waits) / len(waits), 3) if waits else None,
+                    "max_wait_seconds": round(max(waits), 3) if waits else None,
+                }
+            return {
+                "workers": max(1, settings.MAX_CONCURRENT_SCRAPES),
+                "busy_workers": self._busy,
+                "depth": len(self._queued),
+                "classes": classes,
+            }
+
+    def cancel_job(self, job_id: str) -> dict[str, Any] | None:
+        """Cancel a pending or running job; running scrapes stop before their next page."""
+        with self._lock:
+            token = self._tokens.get(job_id)
+            dropped = self._queued.pop(job_id, None)
+            if dropped is not None:
+                self._tokens.pop(job_id, None)
+        if token is not None:
+            token.cancel()
+        job = scrape_job_store.request_cancel(job_id)
+        if job is not None and job["cancel_requested_at"]:
+            print(f"[jobs] Cancel requested for job {job_id} ({'queued' if dropped else job['status']})")
+        return job
+
+    # Execution
+
+    def _run_job(self, job_id: str, queued: _QueuedJob) -> None:
+        with self._lock:
+            token = self._tokens.get(job_id) or CancelToken()
+        try:
+            if token.cancelled:
+                # Cancelled or expired while queued; a cancel already ended the job in the store.
+                scrape_job_store.finish(job_id, token.reason, error=f"{token.reason.capitalize()} before it started")
+                return
+            if not scrape_job_store.mark_running(job_id):
+                # Failed as stale or otherwise finished while queued.
+                return
+            progress = partial(self._report_progress, job_id)
+            try:
+                if queued.task is not None:
+                    result = queued.task(token, progress)
+                else:
+                    result = run_scraper(
+                        max_pages=queued.page_limit,
+                        target_filters=queued.filters or None,
+                        allow_fallback_expansion=True,
+                        progress=progress,
+                        cancel=token,
+                    )
+            except Exception as exc:
+                scrape_job_store.finish(job_id, FAILED, error=str(exc))
+                return
+            if token.cancelled:
+                error = f"{token.reason.capitalize()} after {result.get('pages', 0)} pages; partial results kept"
+                scrape_job_store.finish(job_id, token.reason, result=result, error=error)
+            else:
+                scrape_job_store.finish(job_id, DONE, result=result)
+        finally:
+            with self._lock:
+                self._tokens.pop(job_id, None)
+
+    def _report_progress(self, job_id: str, result: dict[str, int]) -> None:
+        try:
+            scrape_job_store.save_progress(job_id, result)
+        except Exception as e:
+            print(f"[jobs] Failed to save progress for {job_id}: {e}")
+
+    def _ensure_heartbeat(self) -> None:
+        with self._lock:
+            if self._heartbeat_started:
+                return
+            self._heartbeat_started = True
+        Thread(target=self._heartbeat_loop, name="scrape-job-heartbeat", daemon=True).start()
+
+    def _heartbeat_loop(self) -> None:
+        # Keeps this process's pending and running jobs from being failed as stale.
+        interval = max(1, settings.SCRAPE_JOB_HEARTBEAT_SECONDS)
+        while not self._stopped.wait(interval):
+            try:
+                scrape_job_store.heartbeat()
+                self._sync_controls()
+            except Exception as e:
+                print(f"[jobs] Heartbeat failed: {e}")
+
+    def _sync_controls(self) -> None:
+        # Applies cancels and deadline extensions made through other processes.
+        with self._lock:
+            tokens = dict(self._tokens)
+        for job_id, (cancel_requested, deadline_at) in scrape_job_store.control_state(list(tokens)).items():
+            if cancel_requested:
+                tokens[job_id].cancel()
+            else:
+                tokens[job_id].extend(deadline_at)
+
+    def get_job(self, job_id: str) -> dict[str, Any] | None:
+        job = scrape_job_store.get(job_id)
+        if job is not None:
+            job["queue_position"] = self.queue_position(job_id)
+        return job
+
+    def stop(self) -> None:
+        """Stop the workers after their current job; queued jobs are failed as stale by whoever runs next."""
+        self._stopped.set()
+        with self._ready:
+            self._ready.notify_all()
 
 
 scrape_job_manager = ScrapeJobManager()
@@ -0,0 +1,352 @@
+import os
+import socket
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import Any, Optional
+from uuid import uuid4
+
+from sqlalchemy import and_, delete, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import ScrapeJob
+from app.scraper.cancel import CANCELLED, EXPIRED
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+# CANCELLED and EXPIRED (app.scraper.cancel) end jobs stopped on request or at their deadline.
+LIVE_STATUSES = (PENDING, RUNNING)
+
+# Identifies this process as the executor of the jobs it creates. The random part
+# tells a restarted container (same hostname, PID 1 again) from the instance it replaced.
+PROCESS_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+
+# Jobs whose local change counters are kept (see ScrapeJobStore.local_changes).
+_LOCAL_CHANGES_SIZE = 10000
+_NEXT_REVISION = ScrapeJob.revision + 1
+
+
+def _isoformat(value: Optional[datetime]) -> Optional[str]:
+    return value.isoformat() if value is not None else None
+
+
+def job_to_dict(job: ScrapeJob) -> dict[str, Any]:
+    return {
+        "job_id": job.job_id,
+        "status": job.status,
+        "signature": job.signature,
+        "filters": job.filters or {},
+        "source": job.source,
+        "max_pages": job.max_pages,
+        "correlation_id": job.correlation_id,
+        "created_at": _isoformat(job.created_at),
+        "started_at": _isoformat(job.started_at),
+        "finished_at": _isoformat(job.finished_at),
+        "deadline_at": _isoformat(job.deadline_at),
+        "cancel_requested_at": _isoformat(job.cancel_requested_at),
+        "error": job.error,
+        "result": job.result or {},
+        "revision": job.revision or 0,
+    }
+
+
+class ScrapeJobStore:
+    """Scrape jobs persisted in the ``scrape_jobs`` table, shared by all backend processes.
+
+    At most one pending/running job exists per signature: the unique
+    ``running_signature`` column is set while a job is live and cleared when it
+    finishes or a cancel is requested. Live jobs whose owning process stopped
+    heart-beating for ``SCRAPE_JOB_STALE_SECONDS`` are failed so their signature
+    frees up, and finished jobs are deleted after ``SCRAPE_JOB_TTL_SECONDS``.
+
+    Cancel requests and deadlines are recorded here so any process can set them;
+    the owning process applies them to the running scrape on its heartbeat.
+
+    Every change bumps the job's ``revision``. Changes made through this process
+    also bump an in-memory counter (``local_changes``), so waiters here can
+    notice them without querying the database.
+    """
+
+    def __init__(self) -> None:
+        self._local_changes: "OrderedDict[str, int]" = OrderedDict()
+        self._local_changes_lock = Lock()
+
+    def local_changes(self, job_id: str) -> int:
+        """How many times this process changed ``job_id``; grows with every local change."""
+        with self._local_changes_lock:
+            return self._local_changes.get(job_id, 0)
+
+    def _changed(self, job_id: str) -> None:
+        with self._local_changes_lock:
+            self._local_changes[job_id] = self._local_changes.pop(job_id, 0) + 1
+            if len(self._local_changes) > _LOCAL_CHANGES_SIZE:
+                self._local_changes.popitem(last=False)
+
+    def create(
+        self,
+        *,
+        job_id: str,
+        signature: str,
+        filters: dict[str, Any],
+        correlation_id: str,
+        source: str,
+        max_pages: int,
+        deadline_at: Optional[datetime] = None,
+    ) -> tuple[dict[str, Any], bool]:
+        """Insert a pending job, or return the live job for ``signature``. Returns (job, created)."""
+        with SessionLocal() as db:
+            for _ in range(2):
+                existing = db.scalar(select(ScrapeJob).where(ScrapeJob.running_signature == signature))
+                if existing is not None:
+                    if not self._is_stale(existing):
+                        return job_to_dict(existing), False
+                    self._fail_stale_job(db, existing)
+                    continue
+
+                now = datetime.utcnow()
+                job = ScrapeJob(
+                    job_id=job_id,
+                    status=PENDING,
+                    signature=signature,
+                    running_signature=signature,
+                    correlation_id=correlation_id,
+                    filters=filters,
+                    source=source,
+                    max_pages=max_pages,
+                    deadline_at=deadline_at,
+                    owner=PROCESS_ID,
+                    heartbeat_at=now,
+                    created_at=now,
+                )
+                db.add(job)
+                try:
+                    db.commit()
+                except IntegrityError:
+                    # Another process created the live job for this signature first.
+                    db.rollback()
+                    continue
+                return job_to_dict(job), True
+
+            existing = db.scalar(select(ScrapeJob).where(ScrapeJob.running_signature == signature))
+            if existing is None:
+                raise RuntimeError(f"Could not create or find a live scrape job for signature {signature!r}")
+            return job_to_dict(existing), False
+
+    def get(self, job_id: str) -> Optional[dict[str, Any]]:
+        with SessionLocal() as db:
+            job = db.get(ScrapeJob, job_id)
+            return job_to_dict(job) if job is not None else None
+
+    def find_reusable(self, source: str, min_pages: int, fresh_seconds: int) -> list[dict[str, Any]]:
+        """Jobs crawling ``source`` at least ``min_pages`` deep that a new request could reuse.
+
+        Jobs that finished successfully within ``fresh_seconds`` come first, newest
+        first, followed by live jobs, oldest first. Live jobs that are being
+        cancelled or are past their deadline are left out.
+        """
+        now = datetime.utcnow()
+        reusable = [
+            and_(
+                ScrapeJob.status.in_(LIVE_STATUSES),
+                ScrapeJob.cancel_requested_at.is_(None),
+                or_(ScrapeJob.deadline_at.is_(None), ScrapeJob.deadline_at > now),
+            )
+        ]
+        if fresh_seconds > 0:
+            cutoff = now - timedelta(seconds=fresh_seconds)
+            reusable.append(and_(ScrapeJob.status == DONE, ScrapeJob.finished_at >= cutoff))
+        with SessionLocal() as db:
+            jobs = db.scalars(
+                select(ScrapeJob).where(
+                    ScrapeJob.source == source,
+                    ScrapeJob.max_pages >= min_pages,
+                    or_(*reusable),
+                )
+            ).all()
+        done = sorted((job for job in jobs if job.status == DONE), key=lambda job: job.finished_at, reverse=True)
+        live = sorted((job for job in jobs if job.status != DONE), key=lambda job: job.created_at)
+        return [job_to_dict(job) for job in done + live if job.status == DONE or not self._is_stale(job)]
+
+    def find_by_correlation_id(self, correlation_id: str) -> list[dict[str, Any]]:
+        with SessionLocal() as db:
+            jobs = db.scalars(
+                select(ScrapeJob)
+                .where(ScrapeJob.correlation_id == correlation_id)
+                .order_by(ScrapeJob.created_at.desc())
+            )
+            return [job_to_dict(job) for job in jobs]
+
+    def mark_running(self, job_id: str) -> bool:
+        """Move a pending job to running; False if it is no longer pending."""
+        now = datetime.utcnow()
+        return self._update(
+            job_id,
+            {"status": RUNNING, "started_at": now, "heartbeat_at": now},
+            only_statuses=(PENDING,),
+        )
+
+    def save_progress(self, job_id: str, result: dict[str, int]) -> bool:
+        return self._update(
+            job_id,
+            {"result": result, "heartbeat_at": datetime.utcnow()},
+            only_statuses=(RUNNING,),
+        )
+
+    def finish(
+        self,
+        job_id: str,
+        status: str,
+        result: Optional[dict[str, int]] = None,
+        error: Optional[str] = None,
+    ) -> bool:
+        values: dict[str, Any] = {
+            "status": status,
+            "running_signature": None,
+            "error": error,
+            "finished_at": datetime.utcnow(),
+        }
+        if result is not None:
+            values["result"] = result
+        return self._update(job_id, values, only_statuses=LIVE_STATUSES)
+
+    def extend_deadline(self, job_id: str, deadline_at: Optional[datetime]) -> bool:
+        """Push back the deadline of a live job to ``deadline_at`` (None removes it); never brings it forward."""
+        later = ScrapeJob.deadline_at.is_not(None)
+        if deadline_at is not None:
+            later = and_(later, ScrapeJob.deadline_at < deadline_at)
+        with SessionLocal() as db:
+            count = db.execute(
+                update(ScrapeJob)
+                .where(ScrapeJob.job_id == job_id, ScrapeJob.status.in_(LIVE_STATUSES), later)
+                .values(deadline_at=deadline_at, revision=_NEXT_REVISION)
+            ).rowcount
+            db.commit()
+        if count:
+            self._changed(job_id)
+        return bool(count)
+
+    def request_cancel(self, job_id: str) -> Optional[dict[str, Any]]:
+        """Cancel a job: pending jobs end right away, running ones are flagged for their owner to stop.
+
+        Either way the signature is released, so new requests start a fresh job
+        instead of attaching to this one. Returns the job, or None if unknown.
+        """
+        now = datetime.utcnow()
+        released = {"running_signature": None, "cancel_requested_at": now}
+        self._update(
+            job_id,
+            {**released, "status": CANCELLED, "error": "Cancelled before it started", "finished_at": now},
+            only_statuses=(PENDING,),
+        )
+        self._update(job_id, released, only_statuses=(RUNNING,))
+        return self.get(job_id)
+
+    def control_state(self, job_ids: list[str]) -> dict[str, tuple[bool, Optional[datetime]]]:
+        """(cancel requested, deadline) of the given jobs that are still live."""
+        if not job_ids:
+            return {}
+        with SessionLocal() as db:
+            rows = db.execute(
+                select(ScrapeJob.job_id, ScrapeJob.cancel_requested_at, ScrapeJob.deadline_at).where(
+                    ScrapeJob.job_id.in_(job_ids), ScrapeJob.status.in_(LIVE_STATUSES)
+                )
+            ).all()
+        return {row.job_id: (row.cancel_requested_at is not None, row.deadline_at) for row in rows}
+
+    def heartbeat(self) -> int:
+        """Refresh ``heartbeat_at`` of every live job owned by this process."""
+        with SessionLocal() as db:
+            count = db.execute(
+                update(ScrapeJob)
+                .where(ScrapeJob.owner == PROCESS_ID, ScrapeJob.status.in_(LIVE_STATUSES))
+                .values(heartbeat_at=datetime.utcnow())
+            ).rowcount
+            db.commit()
+            return count
+
+    def fail_stale(self) -> int:
+        """Fail live jobs whose owner stopped heart-beating (crashed or restarted process)."""
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.SCRAPE_JOB_STALE_SECONDS)
+        with SessionLocal() as db:
+            stale = db.scalars(
+                select(ScrapeJob).where(ScrapeJob.status.in_(LIVE_STATUSES), ScrapeJob.heartbeat_at < cutoff)
+            ).all()
+            for job in stale:
+                self._fail_stale_job(db, job)
+            if stale:
+                print(f"[jobs] Failed {len(stale)} stale scrape jobs")
+            return len(stale)
+
+    def expire_overdue(self) -> int:
+        """End pending jobs whose deadline passed before any worker picked them up."""
+        now = datetime.utcnow()
+        with SessionLocal() as db:
+            count = db.execute(
+                update(ScrapeJob)
+                .where(ScrapeJob.status == PENDING, ScrapeJob.deadline_at < now)
+                .values(
+                    status=EXPIRED,
+                    running_signature=None,
+                    error="Deadline passed before it started",
+                    finished_at=now,
+                    revision=_NEXT_REVISION,
+                )
+            ).rowcount
+            db.commit()
+        if count:
+            print(f"[jobs] Expired {count} queued scrape jobs past their deadline")
+        return count
+
+    def evict_expired(self) -> int:
+        """Delete finished jobs older than ``SCRAPE_JOB_TTL_SECONDS``."""
+        cutoff = datetime.utcnow() - timedelta(seconds=settings.SCRAPE_JOB_TTL_SECONDS)
+        with SessionLocal() as db:
+            count = db.execute(
+                delete(ScrapeJob).where(
+                    ScrapeJob.status.not_in(LIVE_STATUSES),
+                    ScrapeJob.finished_at < cutoff,
+                )
+            ).rowcount
+            db.commit()
+        if count:
+            print(f"[jobs] Evicted {count} finished scrape jobs")
+        return count
+
+    def _update(self, job_id: str, values: dict[str, Any], only_statuses: tuple[str, ...]) -> bool:
+        with SessionLocal() as db:
+            count = db.execute(
+                update(ScrapeJob)
+                .where(ScrapeJob.job_id == job_id, ScrapeJob.status.in_(only_statuses))
+                .values(**values, revision=_NEXT_REVISION)
+            ).rowcount
+            db.commit()
+        if count:
+            self._changed(job_id)
+        return bool(count)
+
+    @staticmethod
+    def _is_stale(job: ScrapeJob) -> bool:
+        return job.heartbeat_at < datetime.utcnow() - timedelta(seconds=settings.SCRAPE_JOB_STALE_SECONDS)
+
+    @staticmethod
+    def _fail_stale_job(db: Session, job: ScrapeJob) -> None:
+        db.execute(
+            update(ScrapeJob)
+            .where(ScrapeJob.job_id == job.job_id, ScrapeJob.heartbeat_at == job.heartbeat_at)
+            .values(
+                status=FAILED,
+                running_signature=None,
+                error=f"Abandoned: no heartbeat from {job.owner}",
+                finished_at=datetime.utcnow(),
+                revision=_NEXT_REVISION,
+            )
+        )
+        db.commit()
+
+
+scrape_job_store = ScrapeJobStore()
@@ -0,0 +1,46 @@
+"""Check that the lxml parser engine matches the BeautifulSoup one on saved pages.
+
+Usage: python -m app.scraper.parity PAGE.html [PAGE.html ...]
+
+Exits with status 1 if any page parses differently.
+"""
+import sys
+from pathlib import Path
+
+from app.scraper.parser_bs import _ROW_FIELDS, parse_rows
+
+
+def compare_page(html: bytes) -> list[str]:
+    """Return human-readable differences between the two engines for one page."""
+    expected = parse_rows(html, "bs4")
+    actual = parse_rows(html, "lxml")
+    problems = []
+    if len(expected) != len(actual):
+        problems.append(f"bs4 found {len(expected)} listings, lxml found {len(actual)}")
+    for index, (want, got) in enumerate(zip(expected, actual)):
+        for field, want_value, got_value in zip(_ROW_FIELDS, want, got):
+            if want_value != got_value:
+                problems.append(f"listing {index} {field}: bs4={want_value!r} lxml={got_value!r}")
+    return problems
+
+
+def main(paths: list[str]) -> int:
+    if not paths:
+        print(__doc__.strip())
+        return 2
+    mismatched = 0
+    for path in paths:
+        problems = compare_page(Path(path).read_bytes())
+        if problems:
+            mismatched += 1
+            print(f"[parity] {path}: MISMATCH")
+            for problem in problems:
+                print(f"  {problem}")
+        else:
+            print(f"[parity] {path}: ok")
+    print(f"[parity] {len(paths) - mismatched}/{len(paths)} pages match")
+    return 1 if mismatched else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -1,11 +1,24 @@
+import multiprocessing
 import re
-from typing import Optional
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from queue import Full, Queue
+from threading import BoundedSemaphore, Event, Lock
+from typing import Iterator, NamedTuple, Optional
+from urllib.parse import urlsplit
 
 import requests
 from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 
-BASE_URL = "https://www.carsensor.net/usedcar/index{page}.html"
+from app.config import settings
+from app.scraper.cancel import CancelToken
+from app.scraper.http_cache import validator_store
+from app.scraper.throttle import CircuitOpenError, host_throttle
+
+# Overridable so the scraper can run against a local stand-in (benchmarks/fake_site.py).
+SITE_ROOT = settings.SCRAPE_SITE_ROOT.rstrip("/")
+BASE_URL = f"{SITE_ROOT}/usedcar/index{{page}}.html"
 HEADERS = {
     "User-Agent": (
         "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
@@ -15,14 +28,53 @@ HEADERS = {
     "Accept-Language": "ja,en;q=0.9",
 }
 
+_host_slots: dict[str, BoundedSemaphore] = {}
+_host_slots_lock = Lock()
+_session: Optional[requests.Session] = None
+_session_lock = Lock()
+_parse_pool: Optional[ProcessPoolExecutor] = None
+_parse_pool_lock = Lock()
+
+_ROW_FIELDS = ("brand", "model", "year", "price", "color", "url")
+
+
+class _TextCleanup(dict):
+    """``str.translate`` table: ideographic/no-break spaces become spaces and
+    non-printable characters are dropped; entries are computed on first use."""
+
+    def __missing__(self, codepoint: int) -> Optional[str]:
+        char = chr(codepoint)
+        if char in "\u3000\xa0":
+            value = " "
+        elif char.isprintable():
+            value = char
+        else:
+            value = None
+        self[codepoint] = value
+        return value
+
+
+_TEXT_CLEANUP = _TextCleanup()
+
+# Label a spec item puts in front of the color: "色ブラック", "ボディカラー：白".
+_COLOR_LABEL = re.compile(r"(?:カラー|色)[\s：:]*")
+# Shown by listing pages in place of a value that is not stated.
+_PLACEHOLDERS = frozenset({"-", "－", "‐", "―", "—"})
+
+
+class ListingBatch(NamedTuple):
+    """Listings scraped from one page; ``not_modified`` pages carry no rows."""
+
+    page: int
+    cars: list[dict]
+    not_modified: bool = False
+
 
 def normalize_text(text: str, max_len: Optional[int] = None) -> str:
     """Normalize scraped text by collapsing whitespace and stripping control chars."""
     if not text:
         return ""
-    cleaned = text.replace("\u3000", " ").replace("\xa0", " ")
-    cleaned = "".join(ch for ch in cleaned if ch.isprintable())
-    cleaned = " ".join(cleaned.split())
+    cleaned = " ".join(text.translate(_TEXT_CLEANUP).split())
     if max_len is not None:
         cleaned = cleaned[:max_len]
     return cleaned
@@ -44,6 +96,19 @@ def parse_price(text: str) -> Optional[int]:
     return None
 
 
+def parse_color(text: str, labelled: bool = False) -> Optional[str]:
+    """Color from a color element's text, or with ``labelled`` from a spec item like ボディカラー：白."""
+    if labelled:
+        match = _COLOR_LABEL.search(text)
+        if not match:
+            return None
+        text = text[match.end():]
+    color = normalize_text(text, max_len=100)
+    if not color or color in _PLACEHOLDERS:
+        return None
+    return color
+
+
 def parse_year(text: str) -> Optional[int]:
     """Extract year from Japanese date format like 令和5年 or 2023年."""
     if not text:
@@ -61,17 +126,60 @@ def parse_year(text: str) -> Optional[int]:
     return None
 
 
+def get_session() -> requests.Session:
+    """Shared keep-alive session so every page reuses pooled TCP/TLS connections."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            pool_size = max(settings.SCRAPE_CONCURRENCY, settings.SCRAPE_PER_HOST_CONCURRENCY, 1)
+            adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+            session = requests.Session()
+            session.headers.update(HEADERS)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def _host_slot(url: str) -> BoundedSemaphore:
+    """Per-host semaphore capping in-flight requests across all concurrent scrapes."""
+    host = urlsplit(url).netloc.lower()
+    with _host_slots_lock:
+        slot = _host_slots.get(host)
+        if slot is None:
+            slot = BoundedSemaphore(max(1, settings.SCRAPE_PER_HOST_CONCURRENCY))
+            _host_slots[host] = slot
+        return slot
+
+
 @retry(
     stop=stop_after_attempt(3),
     wait=wait_exponential(multiplier=1, min=2, max=10),
     retry=retry_if_exception_type(requests.RequestException),
 )
-def fetch_page(url: str) -> str:
-    response = requests.get(url, headers=HEADERS, timeout=30)
+def fetch_response(url: str, conditional: bool = False) -> Optional[requests.Response]:
+    """GET a page through the shared session.
+
+    With ``conditional`` set, stored validators are sent and ``None`` is returned
+    on 304 Not Modified. Requests are paced by ``host_throttle`` and fail with
+    ``CircuitOpenError`` (not retried) while the host is considered down.
+    """
+    headers = validator_store.conditional_headers(url) if conditional else {}
+    with host_throttle.request(url) as call:
+        # Hold the host slot only for the request itself, not during tenacity backoff.
+        with _host_slot(url):
+            response = get_session().get(url, headers=headers, timeout=30)
+        call.respond(response.status_code, response.elapsed.total_seconds(), response.headers.get("Retry-After"))
+    if response.status_code == 304:
+        return None
     response.raise_for_status()
     # carsensor serves UTF-8; set explicitly to avoid mojibake in parsed fields
     response.encoding = "utf-8"
-    return response.text
+    return response
+
+
+def fetch_page(url: str) -> str:
+    return fetch_response(url).text
 
 
 def _build_page_url(base_url: str, page: int) -> str:
@@ -86,7 +194,62 @@ def _build_page_url(base_url: str, page: int) -> str:
 def scrape_page(page: int = 1, base_url: str = BASE_URL) -> list[dict]:
     """Scrape a single listing page from carsensor.net. Returns list of car dicts."""
     url = _build_page_url(base_url=base_url, page=page)
-    html = fetch_page(url)
+    return parse_listings_html(fetch_page(url))
+
+
+def get_parse_pool() -> Optional[ProcessPoolExecutor]:
+    """Shared process pool for HTML parsing, or ``None`` when parsing runs in-process."""
+    global _parse_pool
+    if settings.SCRAPE_PARSE_WORKERS <= 0:
+        return None
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            # spawn, not fork: the backend process runs scheduler and request threads.
+            _parse_pool = ProcessPoolExecutor(
+                max_workers=settings.SCRAPE_PARSE_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _parse_pool
+
+
+def shutdown_parse_pool() -> None:
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is not None:
+            _parse_pool.shutdown(wait=False, cancel_futures=True)
+            _parse_pool = None
+
+
+def parse_listings_html(html: str) -> list[dict]:
+    """Parse listing cards out of a carsensor listing/catalog page."""
+    return [dict(zip(_ROW_FIELDS, row)) for row in parse_rows(html)]
+
+
+def parse_rows(html: str | bytes, engine: Optional[str] = None) -> list[tuple]:
+    """Parse a page into ``_ROW_FIELDS`` tuples with the configured parser engine.
+
+    ``lxml`` runs precompiled XPath directly on the lxml tree and yields the same
+    rows as the default ``bs4`` engine; ``python -m app.scraper.parity`` checks
+    that on saved pages.
+    """
+    engine = engine or settings.SCRAPE_PARSER_ENGINE
+    if engine == "lxml":
+        from app.scraper.parser_lxml import parse_rows as parse_rows_lxml
+
+        return parse_rows_lxml(html)
+    if engine != "bs4":
+        raise ValueError(f"Unknown parser engine {engine!r}")
+    return _parse_rows(html)
+
+
+def _parse_rows(html: str | bytes) -> list[tuple]:
+    """Parse a page into compact ``_ROW_FIELDS`` tuples.
+
+    Runs inside parse-pool workers, so it takes raw bytes and returns plain tuples
+    to keep pickling cheap.
+    """
+    if isinstance(html, bytes):
+        html = html.decode("utf-8", errors="replace")
     soup = BeautifulSoup(html, "lxml")
     cars = []
 
@@ -108,7 +271,7 @@ def scrape_page(page: int = 1, base_url: str = BASE_URL) -> list[dict]:
             title_text = normalize_text(title_el.get_text(" ", strip=True), max_len=1000)
             link = title_el.get("href", "")
             if link and not link.startswith("http"):
-                link = "https://www.carsensor.net" + link
+                link = SITE_ROOT + link
 
             # Split title into brand and model (typically "Brand Model Trim")
             parts = title_text.split(None, 1)
@@ -137,25 +300,16 @@ def scrape_page(page: int = 1, base_url: str = BASE_URL) -> list[dict]:
             for spec in spec_els:
                 text = spec.get_text(strip=True)
                 if "色" in text or "カラー" in text:
-                    color = normalize_text(text.replace("色", "").replace("カラー", "").strip(), max_len=100)
+                    color = parse_color(text, labelled=True)
                     break
             # Fallback: look for color in data attributes or dedicated elements
             if not color:
-                color_el = item.select_one("[class*='color']")
+                color_el = item.select_one("[class*='color' i]")
                 if color_el:
-                    color = normalize_text(color_el.get_text(" ", strip=True), max_len=100)
+                    color = parse_color(color_el.get_text(" ", strip=True))
 
             if link:
-                cars.append(
-                    {
-                        "brand": brand,
-                        "model": model,
-                        "year": year,
-                        "price": price,
-                        "color": color,
-                        "url": link,
-                    }
-                )
+                cars.append((brand, model, year, price, color, link))
         except Exception as e:
             print(f"[scraper:bs] Error parsing listing: {e}")
             continue
@@ -163,17 +317,123 @@ def scrape_page(page: int = 1, base_url: str = BASE_URL) -> list[dict]:
     return cars
 
 
-def scrape_listings(max_pages: int = 3, base_url: str = BASE_URL) -> list[dict]:
-    """Scrape multiple pages and return all cars."""
-    all_cars = []
-    for page in range(1, max_pages + 1):
+def _fetch_stage(url: str, page: int, conditional: bool, fetched: Queue, stop: Event) -> None:
+    """Download one page and hand it to the parse stage through the bounded queue."""
+    try:
+        item = (page, fetch_response(url, conditional=conditional), None)
+    except Exception as e:
+        item = (page, None, e)
+    # Block while the parse stage is behind, but give up once the consumer has stopped.
+    while not stop.is_set():
         try:
-            cars = scrape_page(page=page, base_url=base_url)
-            all_cars.extend(cars)
-            print(f"[scraper:bs] Page {page}: found {len(cars)} listings")
-            if not cars:
+            fetched.put(item, timeout=0.5)
+            return
+        except Full:
+            continue
+
+
+def _parse_stage(response: Optional[requests.Response]) -> Future:
+    """Schedule parsing of a fetched page; resolves to row tuples, or ``None`` for 304."""
+    future: Future = Future()
+    if response is None:
+        future.set_result(None)
+        return future
+    engine = settings.SCRAPE_PARSER_ENGINE
+    pool = get_parse_pool()
+    if pool is not None:
+        # Pass the engine along: spawned workers may not see runtime settings changes.
+        return pool.submit(parse_rows, response.content, engine)
+    future.set_result(parse_rows(response.text, engine))
+    return future
+
+
+def scrape_listings(
+    max_pages: int = 3,
+    base_url: str = BASE_URL,
+    concurrency: Optional[int] = None,
+    conditional: bool = False,
+    start_page: int = 1,
+    cancel: Optional[CancelToken] = None,
+    raise_on_error: bool = False,
+) -> Iterator[ListingBatch]:
+    """Scrape pages ``start_page..max_pages`` and yield one batch per page, in page order.
+
+    Pages flow through two stages: up to ``concurrency`` fetcher threads download
+    pages into a bounded queue, and the parse stage hands each page to the shared
+    process pool (``SCRAPE_PARSE_WORKERS``), so pages parse while later ones are
+    still downloading. Pagination stops at the first empty or failed page; pages
+    queued past it, or still queued when the consumer closes the generator, are
+    cancelled.
+
+    Unchanged pages (304 on a ``conditional`` run) are yielded as ``not_modified``
+    batches without stopping pagination. Validators are only recorded for
+    non-empty pages yielded here, so an empty tail page or a page discarded
+    after a failure is always re-downloaded.
+
+    Pagination also stops before the next page once ``cancel`` fires. With
+    ``raise_on_error``, a failed page raises its error instead of ending
+    pagination like an empty page would.
+    """
+    workers = max(1, concurrency or settings.SCRAPE_CONCURRENCY)
+    queue_size = max(1, settings.SCRAPE_PARSE_QUEUE_SIZE)
+    window = workers + queue_size
+    fetch_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scraper-bs")
+    fetched: Queue = Queue(maxsize=queue_size)
+    stop = Event()
+    # Pages handed to the fetch stage but not yet consumed, keyed by page number.
+    in_flight: set[int] = set()
+    parsing: dict[int, tuple[Future, Optional[requests.Response], Optional[Exception]]] = {}
+    next_page = start_page
+    try:
+        for page in range(start_page, max_pages + 1):
+            if cancel is not None and cancel.cancelled:
+                print(f"[scraper:bs] Stopping before page {page}: {cancel.reason}")
                 break
-        except Exception as e:
-            print(f"[scraper:bs] Failed to scrape page {page}: {e}")
-            break
-    return all_cars
+            while next_page <= max_pages and len(in_flight) < window:
+                url = _build_page_url(base_url=base_url, page=next_page)
+                fetch_pool.submit(_fetch_stage, url, next_page, conditional, fetched, stop)
+                in_flight.add(next_page)
+                next_page += 1
+
+            while page not in parsing:
+                fetched_page, response, error = fetched.get()
+                parse_future = None if error else _parse_stage(response)
+                parsing[fetched_page] = (parse_future, response, error)
+
+            parse_future, response, error = parsing.pop(page)
+            in_flight.discard(page)
+            try:
+                if error:
+                    raise error
+                rows = parse_future.result()
+            except CircuitOpenError as e:
+                # The whole run is pointless while the site is down; let the caller fail it.
+                print(f"[scraper:bs] Stopping at page {page}: {e}")
+                raise
+            except Exception as e:
+                print(f"[scraper:bs] Failed to scrape page {page}: {e}")
+                if raise_on_error:
+                    raise
+                break
+
+            if rows is None:
+                print(f"[scraper:bs] Page {page}: not modified")
+                yield ListingBatch(page=page, cars=[], not_modified=True)
+                continue
+
+            print(f"[scraper:bs] Page {page}: found {len(rows)} listings")
+            if not rows:
+                break
+            yield ListingBatch(page=page, cars=[dict(zip(_ROW_FIELDS, row)) for row in rows])
+            # Resumed only after the consumer has processed the batch, so validators
+            # never get ahead of what actually reached the database.
+            if conditional:
+                validator_store.remember(_build_page_url(base_url=base_url, page=page), response)
+    finally:
+        # Drop queued pages and release fetchers blocked on the queue; parse jobs
+        # already submitted finish in the pool and are discarded.
+        stop.set()
+        fetch_pool.shutdown(wait=False, cancel_futures=True)
+        for parse_future, _, _ in parsing.values():
+            if parse_future is not None:
+                parse_future.cancel()
@@ -0,0 +1,109 @@
+"""lxml/XPath listing parser, a faster drop-in for ``parser_bs._parse_rows``.
+
+Every XPath mirrors one CSS selector list of the BeautifulSoup parser,
+including soupsieve's scoping rule that combinator ancestors may sit outside
+the element ``select`` was called on. Text extraction mirrors
+``Tag.get_text(strip=True)``: comments and strings inside script, style,
+template, rt and rp are ignored. ``python -m app.scraper.parity`` checks both
+engines produce identical rows.
+"""
+from lxml import etree
+
+from app.scraper.parser_bs import SITE_ROOT, normalize_text, parse_color, parse_price, parse_year
+
+
+def _has_class(name: str) -> str:
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+# div.casetPanel, div.cas_detail, article.listView
+_LISTINGS = etree.XPath(
+    f"//div[{_has_class('casetPanel')} or {_has_class('cas_detail')}]"
+    f" | //article[{_has_class('listView')}]"
+)
+# [class*='cassetteWrap'], [class*='cassette']  (the first implies the second)
+_LISTINGS_FALLBACK = etree.XPath("//*[contains(@class, 'cassette')]")
+# h3 a, .cas_detail_ttl a, .casetPanel_head a, a[class*='title']
+_TITLE = etree.XPath(
+    ".//a[ancestor::h3"
+    f" or ancestor::*[{_has_class('cas_detail_ttl')} or {_has_class('casetPanel_head')}]"
+    " or contains(@class, 'title')]"
+)
+# .cas_detail_price, .casetPanel_price, [class*='price']  (the classes imply the substring)
+_PRICE = etree.XPath(".//*[contains(@class, 'price')]")
+# .cas_detail_year, .casetPanel_spec, [class*='year']
+_YEAR = etree.XPath(f".//*[{_has_class('casetPanel_spec')} or contains(@class, 'year')]")
+# .cas_detail_spec li, .casetPanel_specList li, [class*='spec'] li
+_SPEC_ITEMS = etree.XPath(".//li[ancestor::*[contains(@class, 'spec')]]")
+# [class*='color' i]
+_COLOR = etree.XPath(".//*[contains(translate(@class, 'COLR', 'colr'), 'color')]")
+_TEXT_NODES = etree.XPath(
+    "descendant::text()[not(ancestor::script or ancestor::style or ancestor::template"
+    " or ancestor::rt or ancestor::rp)]"
+)
+
+_HTML_PARSER = etree.HTMLParser(encoding="utf-8")
+
+
+def _text(element, separator: str = "") -> str:
+    """Equivalent of BeautifulSoup's ``get_text(separator, strip=True)``."""
+    return separator.join(stripped for stripped in (s.strip() for s in _TEXT_NODES(element)) if stripped)
+
+
+def _first(xpath: etree.XPath, element):
+    matches = xpath(element)
+    return matches[0] if matches else None
+
+
+def parse_rows(html: str | bytes) -> list[tuple]:
+    """Parse a page into ``(brand, model, year, price, color, url)`` tuples."""
+    if isinstance(html, bytes):
+        html = html.decode("utf-8", errors="replace")
+    root = etree.fromstring(html.encode("utf-8"), _HTML_PARSER) if html else None
+    if root is None:
+        return []
+
+    cars = []
+    listings = _LISTINGS(root)
+    if not listings:
+        listings = _LISTINGS_FALLBACK(root)
+
+    for item in listings:
+        try:
+            title_el = _first(_TITLE, item)
+            if title_el is None:
+                continue
+
+            title_text = normalize_text(_text(title_el, " "), max_len=1000)
+            link = title_el.get("href", "")
+            if link and not link.startswith("http"):
+                link = SITE_ROOT + link
+
+            parts = title_text.split(None, 1)
+            brand = normalize_text(parts[0] if parts else title_text, max_len=100)
+            model = normalize_text(parts[1] if len(parts) > 1 else "", max_len=2000)
+
+            price_el = _first(_PRICE, item)
+            price = parse_price(normalize_text(_text(price_el, " ") if price_el is not None else ""))
+
+            year_el = _first(_YEAR, item)
+            year = parse_year(normalize_text(_text(year_el, " ") if year_el is not None else ""))
+
+            color = None
+            for spec in _SPEC_ITEMS(item):
+                text = _text(spec)
+                if "色" in text or "カラー" in text:
+                    color = parse_color(text, labelled=True)
+                    break
+            if not color:
+                color_el = _first(_COLOR, item)
+                if color_el is not None:
+                    color = parse_color(_text(color_el, " "))
+
+            if link:
+                cars.append((brand, model, year, price, color, link))
+        except Exception as e:
+            print(f"[scraper:lxml] Error parsing listing: {e}")
+            continue
+
+    return cars
@@ -1,109 +1,192 @@
-import re
-from typing import Optional
+import asyncio
+import time
+from typing import AsyncIterator, Optional
+
+from app.config import settings
+from app.scraper.browser_service import browser_service
+from app.scraper.cancel import CancelToken
+from app.scraper.parser_bs import BASE_URL, SITE_ROOT, ListingBatch, _build_page_url, parse_color, parse_price, parse_year
+from app.scraper.throttle import CircuitOpenError, Reservation, host_throttle
+
+LISTING_SELECTOR = (
+    'div.casetPanel, div.cas_detail, article.listView, [class*="cassetteWrap"], [class*="cassette"]'
+)
+
+EXTRACT_LISTINGS_JS = """
+    ([selector, siteRoot]) => {
+        const results = [];
+        const listings = document.querySelectorAll(selector);
+        listings.forEach(item => {
+            try {
+                const titleEl = item.querySelector(
+                    'h3 a, .cas_detail_ttl a, .casetPanel_head a, a[class*="title"]'
+                );
+                if (!titleEl) return;
+
+                const title = titleEl.textContent.trim();
+                let link = titleEl.getAttribute('href') || '';
+                if (link && !link.startsWith('http')) {
+                    link = siteRoot + link;
+                }
+
+                const parts = title.split(/\s+/);
+                const brand = parts[0] || title;
+                const model = parts.slice(1).join(' ') || '';
+
+                const priceEl = item.querySelector(
+                    '.cas_detail_price, .casetPanel_price, [class*="price"]'
+                );
+                const priceText = priceEl ? priceEl.textContent.trim() : '';
+
+                const yearEl = item.querySelector(
+                    '.cas_detail_year, .casetPanel_spec, [class*="year"]'
+                );
+                const yearText = yearEl ? yearEl.textContent.trim() : '';
+
+                const specEls = item.querySelectorAll(
+                    '.cas_detail_spec li, .casetPanel_specList li, [class*="spec"] li'
+                );
+                const colorSpec = Array.from(specEls)
+                    .map(spec => spec.textContent.trim())
+                    .find(text => text.includes('色') || text.includes('カラー')) || '';
+                const colorEl = item.querySelector('[class*="color" i]');
+                const colorText = colorEl ? colorEl.textContent.trim() : '';
+
+                if (link) {
+                    results.push({
+                        brand, model, priceText, yearText, colorSpec, colorText, url: link
+                    });
+                }
+            } catch (e) {}
+        });
+        return results;
+    }
+"""
+
+
+async def _reserve(url: str) -> Reservation:
+    """``host_throttle.reserve`` off the browser loop, as it blocks while a trial request is in flight.
+
+    If the caller is cancelled meanwhile, the reservation is released as soon
+    as it comes through, so a trial slot is never left hanging.
+    """
+    pending = asyncio.ensure_future(asyncio.to_thread(host_throttle.reserve, url))
+    try:
+        return await asyncio.shield(pending)
+    except asyncio.CancelledError:
+
+        def give_back(done: asyncio.Future) -> None:
+            if not done.cancelled() and done.exception() is None:
+                host_throttle.release(url, done.result())
+
+        pending.add_done_callback(give_back)
+        raise
+
 
-from app.scraper.parser_bs import _build_page_url, parse_price, parse_year
+async def _scrape_page(tab, url: str) -> list[dict]:
+    """Load one listing page in ``tab`` and extract its cars.
 
-BASE_URL = "https://www.carsensor.net/usedcar/index{page}.html"
+    Waits for the listing selector instead of a fixed delay; a page that never
+    renders a listing is treated as empty. The navigation is paced and checked
+    by ``host_throttle`` like any other request.
+    """
+    from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 
+    reservation = await _reserve(url)
+    started = time.monotonic()
+    try:
+        if reservation.delay:
+            await asyncio.sleep(reservation.delay)
+            host_throttle.check(url)
+        started = time.monotonic()
+        response = await tab.goto(url, wait_until="domcontentloaded")
+    except (asyncio.CancelledError, CircuitOpenError):
+        # Tabs still loading when the run stops are cancelled; that says nothing about the host.
+        host_throttle.release(url, reservation)
+        raise
+    except Exception:
+        host_throttle.record(url, time.monotonic() - started, error=True)
+        raise
+    if response is not None:
+        host_throttle.record(
+            url, time.monotonic() - started, status=response.status, retry_after=response.headers.get("retry-after")
+        )
+    else:
+        host_throttle.record(url, time.monotonic() - started, status=200)
+    try:
+        await tab.wait_for_selector(
+            LISTING_SELECTOR,
+            state="attached",
+            timeout=settings.SCRAPE_PW_SELECTOR_TIMEOUT_MS,
+        )
+    except PlaywrightTimeoutError:
+        return []
 
-async def scrape_listings_playwright(max_pages: int = 3, base_url: str = BASE_URL) -> list[dict]:
-    """Fallback scraper using Playwright for JS-heavy pages."""
+    cars = await tab.evaluate(EXTRACT_LISTINGS_JS, [LISTING_SELECTOR, SITE_ROOT])
+    return [
+        {
+            "brand": car["brand"],
+            "model": car["model"],
+            "year": parse_year(car.get("yearText", "")),
+            "price": parse_price(car.get("priceText", "")),
+            "color": parse_color(car.get("colorSpec", ""), labelled=True) or parse_color(car.get("colorText", "")),
+            "url": car["url"],
+        }
+        for car in cars
+    ]
+
+
+async def scrape_listings_playwright(
+    max_pages: int = 3,
+    base_url: str = BASE_URL,
+    concurrency: int | None = None,
+    cancel: Optional[CancelToken] = None,
+) -> AsyncIterator[ListingBatch]:
+    """Fallback scraper using Playwright for JS-heavy pages. Yields one batch per page.
+
+    Must run on the ``browser_service`` loop (see ``BrowserService.iterate``).
+    Up to ``concurrency`` pages load at once on warm pages borrowed from the
+    shared context pool. Batches are yielded in page order and pagination stops
+    at the first empty or failed page, or before the next page once ``cancel``
+    fires.
+    """
     try:
-        from playwright.async_api import async_playwright
+        import playwright.async_api  # noqa: F401
     except ImportError:
         print("[scraper:pw] Playwright not installed, skipping fallback.")
-        return []
+        return
 
-    all_cars = []
+    workers = max(1, concurrency or settings.SCRAPE_PW_CONCURRENCY)
 
-    async with async_playwright() as p:
-        browser = await p.chromium.launch(headless=True)
-        page = await browser.new_page()
-        page.set_default_timeout(30000)
+    async def load(page_num: int) -> list[dict]:
+        async with browser_service.tab() as tab:
+            return await _scrape_page(tab, _build_page_url(base_url=base_url, page=page_num))
 
+    pending: dict[int, asyncio.Task] = {}
+    next_page = 1
+    try:
         for page_num in range(1, max_pages + 1):
-            try:
-                url = _build_page_url(base_url=base_url, page=page_num)
-                await page.goto(url, wait_until="domcontentloaded")
-                await page.wait_for_timeout(3000)
-
-                cars = await page.evaluate("""
-                    () => {
-                        const results = [];
-                        const listings = document.querySelectorAll(
-                            'div.casetPanel, div.cas_detail, article.listView, [class*="cassetteWrap"], [class*="cassette"]'
-                        );
-                        listings.forEach(item => {
-                            try {
-                                const titleEl = item.querySelector(
-                                    'h3 a, .cas_detail_ttl a, .casetPanel_head a, a[class*="title"]'
-                                );
-                                if (!titleEl) return;
-
-                                const title = titleEl.textContent.trim();
-                                let link = titleEl.getAttribute('href') || '';
-                                if (link && !link.startsWith('http')) {
-                                    link = 'https://www.carsensor.net' + link;
-                                }
-
-                                const parts = title.split(/\s+/);
-                                const brand = parts[0] || title;
-                                const model = parts.slice(1).join(' ') || '';
-
-                                const priceEl = item.querySelector(
-                                    '.cas_detail_price, .casetPanel_price, [class*="price"]'
-                                );
-                                const priceText = priceEl ? priceEl.textContent.trim() : '';
-
-                                const yearEl = item.querySelector(
-                                    '.cas_detail_year, .casetPanel_spec, [class*="year"]'
-                                );
-                                const yearText = yearEl ? yearEl.textContent.trim() : '';
-
-                                let color = null;
-                                const specEls = item.querySelectorAll(
-                                    '.cas_detail_spec li, .casetPanel_specList li, [class*="spec"] li'
-                                );
-                                specEls.forEach(spec => {
-                                    const text = spec.textContent.trim();
-                                    if (text.includes('色') || text.includes('カラー')) {
-                                        color = text.replace('色', '').replace('カラー', '').trim();
-                                    }
-                                });
-                                if (!color) {
-                                    const colorEl = item.querySelector('[class*="color"]');
-                                    if (colorEl) color = colorEl.textContent.trim();
-                                }
-
-                                if (link) {
-                                    results.push({
-                                        brand, model, priceText, yearText, color, url: link
-                                    });
-                                }
-                            } catch (e) {}
-                        });
-                        return results;
-                    }
-                """)
-
-                for car in cars:
-                    all_cars.append({
-                        "brand": car["brand"],
-                        "model": car["model"],
-                        "year": parse_year(car.get("yearText", "")),
-                        "price": parse_price(car.get("priceText", "")),
-                        "color": car.get("color"),
-                        "url": car["url"],
-                    })
-
-                print(f"[scraper:pw] Page {page_num}: found {len(cars)} listings")
-                if not cars:
-                    break
+            if cancel is not None and cancel.cancelled:
+                print(f"[scraper:pw] Stopping before page {page_num}: {cancel.reason}")
+                break
+            while next_page <= max_pages and len(pending) < workers:
+                pending[next_page] = asyncio.create_task(load(next_page))
+                next_page += 1
 
+            try:
+                batch = await pending.pop(page_num)
+            except CircuitOpenError as e:
+                print(f"[scraper:pw] Stopping at page {page_num}: {e}")
+                raise
             except Exception as e:
                 print(f"[scraper:pw] Failed page {page_num}: {e}")
                 break
 
-        await browser.close()
-
-    return all_cars
+            print(f"[scraper:pw] Page {page_num}: found {len(batch)} listings")
+            if not batch:
+                break
+            yield ListingBatch(page=page_num, cars=batch)
+    finally:
+        for task in pending.values():
+            task.cancel()
+        await asyncio.gather(*pending.values(), return_exceptions=True)
@@ -0,0 +1,340 @@
+import hashlib
+import math
+from datetime import datetime, timedelta
+from functools import partial
+from typing import Any, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.config import settings
+from app.database import SessionLocal
+from app.models import RefreshBand, RefreshBudget
+from app.scraper.fingerprints import fingerprint
+from app.scraper.cancel import CancelToken
+from app.scraper.job_manager import scrape_job_manager
+from app.scraper.parser_bs import ListingBatch
+from app.scraper.scraper import ProgressCallback, crawl_sources, run_page_range
+
+# Weight of the newest observation in a band's churn EWMA.
+_EWMA_ALPHA = 0.3
+# Observed change fractions are capped below 1 so the rate estimate stays finite.
+_MAX_CHANGE_FRACTION = 0.95
+_BUDGET_ROW_ID = 1
+# correlation_id of the jobs the scheduler queues.
+_CORRELATION_ID = "scheduled-refresh"
+
+
+def listing_digest(car: dict[str, Any]) -> str:
+    """Short digest of a listing's URL and content; changes when the listing is replaced or edited."""
+    return hashlib.blake2b(car["url"].encode("utf-8") + fingerprint(car), digest_size=8).hexdigest()
+
+
+def change_fraction(previous: list[str], current: list[str]) -> float:
+    """Share of a page's listings that are new, updated or gone since the previous snapshot."""
+    before, after = set(previous), set(current)
+    size = max(len(before), len(after))
+    if not size:
+        return 0.0
+    return max(len(after - before), len(before - after)) / size
+
+
+def band_layout() -> list[tuple[str, str, int, int]]:
+    """``(source, base_url, start_page, end_page)`` of every refresh band.
+
+    The global listing is covered ``SCRAPE_MAX_PAGES`` deep and each brand
+    catalog ``SCRAPE_TARGET_MAX_PAGES`` deep, in bands of
+    ``SCRAPE_REFRESH_BAND_PAGES`` pages.
+    """
+    size = max(1, settings.SCRAPE_REFRESH_BAND_PAGES)
+    bands = []
+    for base_url, source in crawl_sources():
+        depth = settings.SCRAPE_MAX_PAGES if source == "usedcar:global" else settings.SCRAPE_TARGET_MAX_PAGES
+        for start in range(1, depth + 1, size):
+            bands.append((source, base_url, start, min(start + size - 1, depth)))
+    return bands
+
+
+class RefreshScheduler:
+    """Refreshes listing sources page band by page band, each at a cadence that follows its churn.
+
+    Every band (a window of pages of the global listing or a brand catalog)
+    keeps an EWMA of its change rate, estimated from how many listings were new,
+    updated or gone between two refreshes. A band is due once the expected share
+    of changed listings reaches ``SCRAPE_REFRESH_TARGET_CHANGE``, but never sooner
+    than ``SCRAPE_REFRESH_MIN_INTERVAL_MINUTES`` and never later than
+    ``SCRAPE_FULL_SWEEP_INTERVAL_MINUTES``; bands without data yet are due every
+    ``SCRAPE_INTERVAL_MINUTES``. Due bands, most overdue first, are paid for from
+    a token bucket of page requests refilled at ``SCRAPE_REFRESH_PAGES_PER_HOUR``
+    (by default, all bands' pages every ``SCRAPE_INTERVAL_MINUTES``).
+
+    Band state and the bucket live in the database; the bucket row is updated
+    with a version check, so with several backend processes each tick is planned
+    by one of them and the budget holds globally.
+
+    Each band is refreshed by a job of the ``scheduled`` priority class in
+    ``scrape_job_manager``, so interactive scrapes go first and
+    ``MAX_CONCURRENT_SCRAPES`` bounds background scraping too. Bands are fetched
+    with BeautifulSoup only; the Playwright fallback is left to on-demand
+    scrapes. With ``SCRAPE_ENRICH_ENABLED``, a tick that queued bands also queues
+    a job filling missing listing fields from detail pages, as scrape jobs do.
+    """
+
+    @staticmethod
+    def pages_per_hour() -> float:
+        if settings.SCRAPE_REFRESH_PAGES_PER_HOUR > 0:
+            return float(settings.SCRAPE_REFRESH_PAGES_PER_HOUR)
+        # Enough to refresh every band each SCRAPE_INTERVAL_MINUTES, the cadence of bands without churn data.
+        pages = sum(end - start + 1 for _, _, start, end in band_layout())
+        return pages * 60 / max(1, settings.SCRAPE_INTERVAL_MINUTES)
+
+    @staticmethod
+    def refresh_interval(churn_rate: Optional[float]) -> timedelta:
+        """How long a band with ``churn_rate`` (per hour) may go between refreshes."""
+        low = timedelta(minutes=settings.SCRAPE_REFRESH_MIN_INTERVAL_MINUTES)
+        high = max(low, timedelta(minutes=settings.SCRAPE_FULL_SWEEP_INTERVAL_MINUTES))
+        if churn_rate is None:
+            interval = timedelta(minutes=settings.SCRAPE_INTERVAL_MINUTES)
+        elif churn_rate <= 0:
+            interval = high
+        else:
+            target = min(max(settings.SCRAPE_REFRESH_TARGET_CHANGE, 0.01), _MAX_CHANGE_FRACTION)
+            interval = timedelta(hours=-math.log(1 - target) / churn_rate)
+        return min(max(interval, low), high)
+
+    def tick(self) -> int:
+        """Queue refresh jobs for the bands that are due and fit the budget. Returns the number queued."""
+        now = datetime.utcnow()
+        with SessionLocal() as db:
+            bands = self._sync_bands(db)
+            due = []
+            for band in bands:
+                interval = self.refresh_interval(band.churn_rate)
+                if band.scheduled_at is None:
+                    due.append((math.inf, band))
+                elif now - band.scheduled_at >= interval:
+                    due.append(((now - band.scheduled_at) / interval, band))
+            if not due:
+                return 0
+            # Ties (bands never refreshed) go global listing first, front pages first.
+            due.sort(key=lambda item: (-item[0], item[1].source != "usedcar:global", item[1].start_page))
+            chosen = self._spend(db, [band for _, band in due], now)
+            # Plain tuples: the rows are refreshed by jobs after this session closes.
+            plan = [(band.source, band.base_url, band.start_page, band.end_page) for band in chosen]
+
+        if len(plan) < len(due):
+            print(f"[scraper:refresh] {len(due)} bands due, {len(plan)} fit the page budget")
+        queued = 0
+        for source, base_url, start_page, end_page in plan:
+            # None while the band's previous refresh is still queued or running.
+            job = scrape_job_manager.submit_task(
+                signature=f"refresh:{source}:{start_page}-{end_page}",
+                source=source,
+                correlation_id=_CORRELATION_ID,
+                task=partial(self._refresh, source, base_url, start_page, end_page),
+            )
+            queued += job is not None
+        if plan and settings.SCRAPE_ENRICH_ENABLED:
+            scrape_job_manager.submit_task(
+                signature="refresh:enrich", source="enrich", correlation_id=_CORRELATION_ID, task=self._enrich
+            )
+        return queued
+
+    def status(self) -> dict[str, Any]:
+        """Budget and per-band churn, cadence and next refresh time."""
+        with SessionLocal() as db:
+            bands = db.scalars(select(RefreshBand).order_by(RefreshBand.source, RefreshBand.start_page)).all()
+            budget = db.get(RefreshBudget, _BUDGET_ROW_ID)
+            tokens = self._refilled_tokens(budget, datetime.utcnow())
+        rows = []
+        for band in bands:
+            interval = self.refresh_interval(band.churn_rate)
+            rows.append(
+                {
+                    "source": band.source,
+                    "start_page": band.start_page,
+                    "end_page": band.end_page,
+                    "churn_rate": band.churn_rate,
+                    "observations": band.observations,
+                    "observed_at": band.observed_at.isoformat() if band.observed_at else None,
+                    "refresh_interval_minutes": round(interval.total_seconds() / 60, 1),
+                    "next_refresh_at": (band.scheduled_at + interval).isoformat() if band.scheduled_at else None,
+                }
+            )
+        return {"pages_per_hour": self.pages_per_hour(), "budget_tokens": round(tokens, 2), "bands": rows}
+
+    # Planning
+
+    def _sync_bands(self, db: Session) -> list[RefreshBand]:
+        """Bring the band rows in line with the configured layout; returns them."""
+        layout = {(source, start): (base_url, end) for source, base_url, start, end in band_layout()}
+        bands = {(band.source, band.start_page): band for band in db.scalars(select(RefreshBand)).all()}
+        changed = False
+        for key in bands.keys() - layout.keys():
+            db.delete(bands.pop(key))
+            changed = True
+        for key, (base_url, end) in layout.items():
+            band = bands.get(key)
+            if band is None:
+                band = RefreshBand(source=key[0], start_page=key[1], end_page=end, base_url=base_url, observations=0)
+                db.add(band)
+                bands[key] = band
+                changed = True
+            elif (band.end_page, band.base_url) != (end, base_url):
+                band.end_page, band.base_url, band.snapshot = end, base_url, None
+                changed = True
+        if changed:
+            try:
+                db.commit()
+            except IntegrityError:
+                # Another process inserted the same bands first.
+                db.rollback()
+                return list(db.scalars(select(RefreshBand)).all())
+        return list(bands.values())
+
+    def _capacity(self) -> float:
+        return max(self.pages_per_hour(), float(settings.SCRAPE_REFRESH_BAND_PAGES))
+
+    def _refilled_tokens(self, budget: Optional[RefreshBudget], now: datetime) -> float:
+        if budget is None:
+            return self._capacity()
+        hours = max(0.0, (now - budget.refilled_at).total_seconds() / 3600)
+        return min(self._capacity(), budget.tokens + hours * self.pages_per_hour())
+
+    def _spend(self, db: Session, due: list[RefreshBand], now: datetime) -> list[RefreshBand]:
+        """Take the pages of the most overdue bands that fit from the bucket and mark those bands scheduled."""
+        budget = db.get(RefreshBudget, _BUDGET_ROW_ID)
+        if budget is None:
+            db.add(RefreshBudget(id=_BUDGET_ROW_ID, tokens=self._capacity(), refilled_at=now, version=0))
+            try:
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+            budget = db.get(RefreshBudget, _BUDGET_ROW_ID)
+
+        tokens = self._refilled_tokens(budget, now)
+        chosen = []
+        for band in due:
+            pages = band.end_page - band.start_page + 1
+            if pages > tokens:
+                # Strictly most overdue first, so large bands are not starved by small ones.
+                break
+            tokens -= pages
+            chosen.append(band)
+        if not chosen:
+            return []
+
+        claimed = db.execute(
+            update(RefreshBudget)
+            .where(RefreshBudget.id == _BUDGET_ROW_ID, RefreshBudget.version == budget.version)
+            .values(tokens=tokens, refilled_at=now, version=budget.version + 1)
+        ).rowcount
+        if not claimed:
+            # Another process planned this tick.
+            db.rollback()
+            return []
+        for band in chosen:
+            band.scheduled_at = now
+        db.commit()
+        return chosen
+
+    # Refreshing
+
+    def _refresh(
+        self,
+        source: str,
+        base_url: str,
+        start_page: int,
+        end_page: int,
+        cancel: CancelToken,
+        progress: ProgressCallback,
+    ) -> dict[str, int]:
+        started = datetime.utcnow()
+        seen: dict[str, list[str]] = {}
+        unchanged: set[str] = set()
+
+        def record(batch: ListingBatch) -> None:
+            if batch.not_modified:
+                unchanged.add(str(batch.page))
+            else:
+                seen[str(batch.page)] = [listing_digest(car) for car in batch.cars]
+
+        try:
+            result = run_page_range(
+                base_url, start_page, end_page, cancel=cancel, progress=progress, conditional=True, on_batch=record
+            )
+        except Exception as e:
+            print(f"[scraper:refresh] Refresh of {source} pages {start_page}-{end_page} failed: {e}")
+            raise
+        if cancel.cancelled:
+            # Pages after the stop were not looked at; judging churn on the rest is still fine.
+            print(f"[scraper:refresh] Refresh of {source} pages {start_page}-{end_page} {cancel.reason}")
+        try:
+            self._observe(source, start_page, started, seen, unchanged, result)
+        except Exception as e:
+            print(f"[scraper:refresh] Failed to record churn of {source} pages {start_page}-{end_page}: {e}")
+        return result
+
+    @staticmethod
+    def _enrich(cancel: CancelToken, progress: ProgressCallback) -> dict[str, int]:
+        from app.scraper.enrich import enrich_missing
+
+        try:
+            with SessionLocal() as db:
+                return enrich_missing(db)
+        except Exception as e:
+            print(f"[scraper:refresh] Detail enrichment failed: {e}")
+            raise
+
+    def _observe(
+        self,
+        source: str,
+        start_page: int,
+        started: datetime,
+        seen: dict[str, list[str]],
+        unchanged: set[str],
+        result: dict[str, int],
+    ) -> None:
+        with SessionLocal() as db:
+            band = db.get(RefreshBand, (source, start_page))
+            if band is None:
+                return
+            previous = band.snapshot or {}
+            snapshot = dict(previous)
+            fractions = []
+            for page in range(band.start_page, band.end_page + 1):
+                key = str(page)
+                if key in unchanged:
+                    fractions.append(0.0)
+                elif key in seen:
+                    if key in previous:
+                        fractions.append(change_fraction(previous[key], seen[key]))
+                    snapshot[key] = seen[key]
+                # Pages not reached (past the end or after a failed page) keep their old snapshot.
+
+            if fractions and band.observed_at is not None:
+                hours = max((started - band.observed_at).total_seconds() / 3600, 1 / 60)
+                fraction = min(sum(fractions) / len(fractions), _MAX_CHANGE_FRACTION)
+                rate = -math.log(1 - fraction) / hours
+                if band.churn_rate is not None:
+                    rate = _EWMA_ALPHA * rate + (1 - _EWMA_ALPHA) * band.churn_rate
+                band.churn_rate = rate
+                band.observations += 1
+                print(
+                    f"[scraper:refresh] {source} pages {band.start_page}-{band.end_page}: "
+                    f"{fraction:.0%} changed in {hours:.1f}h, churn {band.churn_rate:.3f}/h, "
+                    f"next in {self.refresh_interval(band.churn_rate).total_seconds() / 60:.0f} min "
+                    f"({result['inserted']} inserted, {result['updated']} updated)"
+                )
+            else:
+                print(
+                    f"[scraper:refresh] {source} pages {band.start_page}-{band.end_page}: "
+                    f"first snapshot of {len(seen)} pages ({result['inserted']} inserted)"
+                )
+            band.snapshot = snapshot
+            band.observed_at = started
+            db.commit()
+
+
+refresh_scheduler = RefreshScheduler()
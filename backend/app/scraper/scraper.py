@@ -1,11 +1,24 @@
-import asyncio
-from typing import Any, Optional
+from contextlib import closing
+from datetime import datetime, timedelta
+from threading import Lock
+from typing import Any, Callable, Iterator, Optional
+
+from sqlalchemy.orm import Session
 
 from app.config import settings
 from app.database import SessionLocal
-from app.scraper.parser_bs import scrape_listings
+from app.scraper.cancel import CancelToken
+from app.scraper.http_cache import validator_store
+from app.scraper.parser_bs import BASE_URL, SITE_ROOT, ListingBatch, scrape_listings
+from app.scraper.throttle import CircuitOpenError, host_throttle
 from app.scraper.upsert import upsert_cars
 
+ProgressCallback = Callable[[dict[str, int]], None]
+
+# Last completed full-depth sweep per source, used to pace incremental runs.
+_last_full_sweep: dict[str, datetime] = {}
+_last_full_sweep_lock = Lock()
+
 
 _BRAND_CATALOG_SLUGS = {
     "bmw": "bmw",
@@ -49,7 +62,30 @@ def _resolve_catalog_base_url(target_filters: Optional[dict[str, Any]]) -> tuple
     slug = _BRAND_CATALOG_SLUGS.get(brand_raw)
     if not slug:
         return None, None
-    return f"https://www.carsensor.net/catalog/{slug}/", slug
+    return f"{SITE_ROOT}/catalog/{slug}/", slug
+
+
+def resolve_source(target_filters: Optional[dict[str, Any]]) -> tuple[Optional[str], str, dict[str, Any]]:
+    """Where a scrape for ``target_filters`` reads listings from.
+
+    Returns ``(base_url, source_label, effective_filters)``: ``base_url`` is the
+    brand catalog URL or ``None`` for the global listing, and
+    ``effective_filters`` are the filters still applied to scraped rows.
+    """
+    source_base_url, brand_slug = _resolve_catalog_base_url(target_filters)
+    source_label = f"catalog:{brand_slug}" if brand_slug else "usedcar:global"
+    effective_filters = dict(target_filters or {})
+    if brand_slug:
+        # Source already scoped by brand URL; avoid brittle text matching on mixed-language brand names.
+        effective_filters.pop("brand", None)
+    return source_base_url, source_label, effective_filters
+
+
+def crawl_sources(catalog_slugs: Optional[list[str]] = None) -> list[tuple[str, str]]:
+    """``(base_url, source_label)`` of the global listing plus the given brand catalogs (all if None)."""
+    known = sorted(set(_BRAND_CATALOG_SLUGS.values()))
+    slugs = known if catalog_slugs is None else [slug for slug in known if slug in catalog_slugs]
+    return [(BASE_URL, "usedcar:global")] + [(f"{SITE_ROOT}/catalog/{slug}/", f"catalog:{slug}") for slug in slugs]
 
 
 def _matches_target(car: dict[str, Any], target_filters: dict[str, Any]) -> bool:
@@ -67,115 +103,331 @@ def _matches_target(car: dict[str, Any], target_filters: dict[str, Any]) -> bool
     return True
 
 
+def filters_cover(broad: dict[str, Any], narrow: dict[str, Any]) -> bool:
+    """Whether every row ``_matches_target`` keeps for ``narrow`` is also kept for ``broad``."""
+    for key in ("brand", "model"):
+        broad_value = str(broad.get(key) or "").strip().lower()
+        if broad_value and broad_value not in str(narrow.get(key) or "").strip().lower():
+            return False
+    return True
+
+
+def empty_result() -> dict[str, int]:
+    return {
+        "fetched": 0,
+        "inserted": 0,
+        "updated": 0,
+        "skipped": 0,
+        "failed": 0,
+        "unchanged": 0,
+        "expanded": 0,
+        "not_modified": 0,
+        "pages": 0,
+        "committed": 0,
+        "stopped_at_page": 0,
+        "enriched": 0,
+    }
+
+
+class _BatchSink:
+    """Upserts scraped page batches as they arrive and keeps running totals."""
+
+    def __init__(
+        self,
+        db: Session,
+        target_filters: dict[str, Any],
+        progress: Optional[ProgressCallback],
+        stop_after_known_pages: Optional[int] = None,
+        on_batch: Optional[Callable[[ListingBatch], None]] = None,
+    ) -> None:
+        self.db = db
+        self.target_filters = target_filters
+        self.progress = progress
+        self.on_batch = on_batch
+        self.stop_after_known_pages = stop_after_known_pages
+        self.result = empty_result()
+        self.listings_seen = 0
+        self.target_matches = 0
+        # Consecutive pages with nothing new, changed or failed.
+        self.known_streak = 0
+
+    @property
+    def stop_requested(self) -> bool:
+        return bool(self.stop_after_known_pages) and self.known_streak >= self.stop_after_known_pages
+
+    def consume(self, batch: ListingBatch) -> None:
+        self.result["pages"] += 1
+        if self.on_batch is not None:
+            self.on_batch(batch)
+        if batch.not_modified:
+            self.result["not_modified"] += 1
+            self.known_streak += 1
+            self._finish_page(batch)
+            return
+
+        cars = batch.cars
+        self.listings_seen += len(cars)
+        if self.target_filters:
+            cars = [car for car in cars if _matches_target(car, self.target_filters)]
+            self.target_matches += len(cars)
+        writes_before = self._writes()
+        if cars:
+            self._upsert(cars)
+        if cars and self._writes() == writes_before:
+            self.known_streak += 1
+        else:
+            self.known_streak = 0
+        self._finish_page(batch)
+
+    def _writes(self) -> int:
+        return self.result["inserted"] + self.result["updated"] + self.result["failed"]
+
+    def _finish_page(self, batch: ListingBatch) -> None:
+        if self.stop_requested:
+            self.result["stopped_at_page"] = batch.page
+        self.report()
+
+    def _upsert(self, cars: list[dict]) -> None:
+        self.result["fetched"] += len(cars)
+        try:
+            inserted, updated, skipped, failed, unchanged = upsert_cars(self.db, cars)
+        except Exception as e:
+            print(f"[scraper] DB upsert error: {e}")
+            self.db.rollback()
+            # Rows from pages fetched this run never landed; force full downloads next time.
+            validator_store.clear()
+            self.result["failed"] += len(cars)
+            return
+        self.result["inserted"] += inserted
+        self.result["updated"] += updated
+        self.result["skipped"] += skipped
+        self.result["failed"] += failed
+        self.result["unchanged"] += unchanged
+        self.result["committed"] += inserted + updated
+
+    def report(self) -> None:
+        if self.progress is not None:
+            try:
+                self.progress(dict(self.result))
+            except Exception as e:
+                print(f"[scraper] Progress callback failed: {e}")
+
+
+def _consume_sync(batches: Iterator[ListingBatch], sink: _BatchSink, cancel: Optional[CancelToken] = None) -> None:
+    # closing() cancels queued page fetches as soon as the sink asks to stop or the run is cancelled.
+    with closing(batches):
+        for batch in batches:
+            sink.consume(batch)
+            if sink.stop_requested or (cancel is not None and cancel.cancelled):
+                break
+
+
+def run_page_range(
+    base_url: str,
+    start_page: int,
+    end_page: int,
+    cancel: Optional[CancelToken] = None,
+    progress: Optional[ProgressCallback] = None,
+    conditional: bool = False,
+    on_batch: Optional[Callable[[ListingBatch], None]] = None,
+) -> dict[str, int]:
+    """Scrape pages ``start_page..end_page`` of one listing source and upsert them.
+
+    Used for crawl shards and refresh bands. Pagination stops at the first empty
+    page or once ``cancel`` fires; there is no Playwright fallback. A page that
+    fails to download or parse raises, so the range is not mistaken for one
+    that ran past the last page. Crawl shards
+    leave ``conditional`` off, as the validator store is per process and shards
+    of one source run in different ones. ``on_batch`` sees every page batch
+    before it is upserted. Raises ``CircuitOpenError`` while the site is down, so
+    the range is retried later instead of counted as done.
+    """
+    host_throttle.check(base_url)
+    db = SessionLocal()
+    try:
+        sink = _BatchSink(db, {}, progress, on_batch=on_batch)
+        _consume_sync(
+            scrape_listings(
+                max_pages=end_page,
+                base_url=base_url,
+                start_page=start_page,
+                conditional=conditional,
+                cancel=cancel,
+                raise_on_error=True,
+            ),
+            sink,
+            cancel,
+        )
+        return sink.result
+    finally:
+        db.close()
+
+
+def _full_sweep_due(source_label: str) -> bool:
+    with _last_full_sweep_lock:
+        last = _last_full_sweep.get(source_label)
+    return last is None or datetime.utcnow() - last >= timedelta(minutes=settings.SCRAPE_FULL_SWEEP_INTERVAL_MINUTES)
+
+
 def run_scraper(
     max_pages: Optional[int] = None,
     target_filters: Optional[dict[str, Any]] = None,
     allow_fallback_expansion: bool = True,
+    progress: Optional[ProgressCallback] = None,
+    incremental: bool = False,
+    cancel: Optional[CancelToken] = None,
 ) -> dict[str, int]:
-    """Main scraper entry point. Tries BeautifulSoup first, falls back to Playwright."""
+    """Main scraper entry point. Tries BeautifulSoup first, falls back to Playwright.
+
+    Each scraped page is upserted and committed as soon as it arrives, and
+    ``progress`` (if given) receives the running totals after every page. With
+    ``SCRAPE_ENRICH_ENABLED``, listings still missing color/year/price are then
+    filled in from their detail pages (see ``app.scraper.enrich``).
+
+    ``incremental`` unfiltered runs stop paginating after
+    ``SCRAPE_INCREMENTAL_STOP_PAGES`` consecutive pages of only known, unchanged
+    listings, except when the source is due its full-depth sweep
+    (``SCRAPE_FULL_SWEEP_INTERVAL_MINUTES``).
+
+    Once ``cancel`` fires (explicit cancel or deadline), the run stops before the
+    next page, skips the Playwright fallback, expansion and enrichment, and
+    returns the totals of what it already committed.
+
+    While the site's circuit is open (see ``app.scraper.throttle``) the run
+    raises ``CircuitOpenError`` right away, or as soon as the circuit opens
+    mid-run; rows committed up to then are kept.
+    """
     page_limit = max_pages or settings.SCRAPE_MAX_PAGES
-    source_base_url, brand_slug = _resolve_catalog_base_url(target_filters)
-    source_label = f"catalog:{brand_slug}" if brand_slug else "usedcar:global"
-    effective_filters = dict(target_filters or {})
-    if brand_slug:
-        # Source already scoped by brand URL; avoid brittle text matching on mixed-language brand names.
-        effective_filters.pop("brand", None)
+    source_base_url, source_label, effective_filters = resolve_source(target_filters)
+    host_throttle.check(source_base_url or BASE_URL)
 
-    print(f"[scraper] Starting scrape job (pages={page_limit}, source={source_label})...")
+    # Unfiltered runs upsert every row they see, so they can safely skip pages
+    # that answer 304 or stop early on known pages; targeted runs need the full
+    # page to match against.
+    conditional = not effective_filters
+    full_sweep = not (incremental and conditional) or _full_sweep_due(source_label)
+    source_kwargs = {"base_url": source_base_url} if source_base_url else {}
 
-    cars = []
+    mode = "full" if full_sweep else "incremental"
+    print(f"[scraper] Starting scrape job (pages={page_limit}, source={source_label}, mode={mode})...")
 
-    # Try BeautifulSoup first
+    def cancelled() -> bool:
+        return cancel is not None and cancel.cancelled
+
+    db = SessionLocal()
     try:
-        scrape_kwargs = {"max_pages": page_limit}
-        if source_base_url:
-            scrape_kwargs["base_url"] = source_base_url
-        cars = scrape_listings(**scrape_kwargs)
-        print(f"[scraper] BS4 found {len(cars)} listings")
-    except Exception as e:
-        print(f"[scraper] BS4 scraper failed: {e}")
-
-    # Fallback to Playwright if BS4 found nothing
-    if not cars:
-        print("[scraper] Falling back to Playwright...")
+        sink = _BatchSink(
+            db,
+            effective_filters,
+            progress,
+            stop_after_known_pages=None if full_sweep else max(1, settings.SCRAPE_INCREMENTAL_STOP_PAGES),
+        )
+
+        # Try BeautifulSoup first
         try:
-            from app.scraper.parser_pw import scrape_listings_playwright
-
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            pw_kwargs = {"max_pages": page_limit}
-            if source_base_url:
-                pw_kwargs["base_url"] = source_base_url
-            cars = loop.run_until_complete(scrape_listings_playwright(**pw_kwargs))
-            loop.close()
-            print(f"[scraper] Playwright found {len(cars)} listings")
+            _consume_sync(
+                scrape_listings(max_pages=page_limit, conditional=conditional, cancel=cancel, **source_kwargs),
+                sink,
+                cancel,
+            )
+            print(f"[scraper] BS4 found {sink.listings_seen} listings")
+        except CircuitOpenError:
+            raise
         except Exception as e:
-            print(f"[scraper] Playwright scraper also failed: {e}")
-
-    used_fallback_expansion = False
-    if effective_filters and cars:
-        filtered = [car for car in cars if _matches_target(car, effective_filters)]
-        print(
-            f"[scraper] Target filter match: {len(filtered)} of {len(cars)} rows "
-            f"for filters={effective_filters}"
-        )
-        if not filtered and allow_fallback_expansion and page_limit < settings.SCRAPE_FALLBACK_MAX_PAGES:
-            fallback_pages = settings.SCRAPE_FALLBACK_MAX_PAGES
+            print(f"[scraper] BS4 scraper failed: {e}")
+
+        not_modified = sink.result["not_modified"]
+        if not_modified:
+            print(f"[scraper] {not_modified} pages unchanged since last run")
+
+        # Fallback to Playwright if BS4 found nothing
+        if not sink.listings_seen and not not_modified and not cancelled():
+            print("[scraper] Falling back to Playwright...")
+            try:
+                from app.scraper.browser_service import browser_service
+                from app.scraper.parser_pw import scrape_listings_playwright
+
+                _consume_sync(
+                    browser_service.iterate(
+                        scrape_listings_playwright(max_pages=page_limit, cancel=cancel, **source_kwargs)
+                    ),
+                    sink,
+                    cancel,
+                )
+                print(f"[scraper] Playwright found {sink.listings_seen} listings")
+            except CircuitOpenError:
+                raise
+            except Exception as e:
+                print(f"[scraper] Playwright scraper also failed: {e}")
+
+        if effective_filters and sink.listings_seen:
+            print(
+                f"[scraper] Target filter match: {sink.target_matches} of {sink.listings_seen} rows "
+                f"for filters={effective_filters}"
+            )
+            if (
+                not sink.target_matches
+                and allow_fallback_expansion
+                and not cancelled()
+                and page_limit < settings.SCRAPE_FALLBACK_MAX_PAGES
+            ):
+                fallback_pages = settings.SCRAPE_FALLBACK_MAX_PAGES
+                print(
+                    "[scraper] No target matches in initial pass; "
+                    f"expanding scrape to {fallback_pages} pages from source={source_label}"
+                )
+                sink.result["expanded"] = 1
+                seen_before = sink.listings_seen
+                try:
+                    # Pages up to page_limit were already matched above; continue past them.
+                    _consume_sync(
+                        scrape_listings(
+                            max_pages=fallback_pages, start_page=page_limit + 1, cancel=cancel, **source_kwargs
+                        ),
+                        sink,
+                        cancel,
+                    )
+                    print(f"[scraper] Expanded BS4 found {sink.listings_seen - seen_before} listings")
+                except CircuitOpenError:
+                    raise
+                except Exception as e:
+                    print(f"[scraper] Expanded BS4 scrape failed: {e}")
+
+        result = sink.result
+        if cancelled():
             print(
-                "[scraper] No target matches in initial pass; "
-                f"expanding scrape to {fallback_pages} pages from source={source_label}"
+                f"[scraper] Scrape {cancel.reason} after {result['pages']} pages; "
+                f"keeping {result['committed']} committed rows"
             )
-            used_fallback_expansion = True
+        elif settings.SCRAPE_ENRICH_ENABLED:
             try:
-                expanded_kwargs = {"max_pages": fallback_pages}
-                if source_base_url:
-                    expanded_kwargs["base_url"] = source_base_url
-                cars = scrape_listings(**expanded_kwargs)
-                print(f"[scraper] Expanded BS4 found {len(cars)} listings")
-                cars = [car for car in cars if _matches_target(car, effective_filters)]
+                from app.scraper.enrich import enrich_missing
+
+                result["enriched"] = enrich_missing(db)["enriched"]
+                sink.report()
             except Exception as e:
-                print(f"[scraper] Expanded BS4 scrape failed: {e}")
+                db.rollback()
+                print(f"[scraper] Detail enrichment failed: {e}")
+
+        if result["stopped_at_page"]:
+            print(
+                f"[scraper] Incremental run stopped at page {result['stopped_at_page']}: "
+                f"{sink.known_streak} consecutive pages already up to date"
+            )
+        if full_sweep and conditional and not cancelled() and (sink.listings_seen or result["not_modified"]):
+            with _last_full_sweep_lock:
+                _last_full_sweep[source_label] = datetime.utcnow()
+
+        if not result["fetched"]:
+            if not result["not_modified"]:
+                print("[scraper] No listings found from any source.")
         else:
-            cars = filtered
-
-    if not cars:
-        print("[scraper] No listings found from any source.")
-        return {
-            "fetched": 0,
-            "inserted": 0,
-            "updated": 0,
-            "skipped": 0,
-            "failed": 0,
-            "expanded": 1 if used_fallback_expansion else 0,
-        }
-
-    # Upsert into database
-    db = SessionLocal()
-    try:
-        inserted, updated, skipped, failed = upsert_cars(db, cars)
-        print(
-            "[scraper] Done: "
-            f"{inserted} inserted, {updated} updated, "
-            f"{skipped} skipped, {failed} failed"
-        )
-        return {
-            "fetched": len(cars),
-            "inserted": inserted,
-            "updated": updated,
-            "skipped": skipped,
-            "failed": failed,
-            "expanded": 1 if used_fallback_expansion else 0,
-        }
-    except Exception as e:
-        print(f"[scraper] DB upsert error: {e}")
-        db.rollback()
-        return {
-            "fetched": len(cars),
-            "inserted": 0,
-            "updated": 0,
-            "skipped": 0,
-            "failed": len(cars),
-            "expanded": 1 if used_fallback_expansion else 0,
-        }
+            print(
+                "[scraper] Done: "
+                f"{result['inserted']} inserted, {result['updated']} updated, "
+                f"{result['skipped']} skipped, {result['failed']} failed, "
+                f"{result['unchanged']} unchanged"
+            )
+        return result
     finally:
         db.close()
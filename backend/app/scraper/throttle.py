@@ -0,0 +1,321 @@
+import math
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from threading import Condition, Lock
+from typing import Any, Iterator, NamedTuple, Optional
+from urllib.parse import urlsplit
+
+from app.config import settings
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Outcomes per host the circuit breaker judges the failure ratio on.
+_OUTCOME_WINDOW = 20
+# AIMD: requests/second added per healthy response, factor applied on trouble.
+_INCREASE_STEP = 0.1
+_DECREASE_FACTOR = 0.5
+# Failures of requests already in flight when the rate was cut do not cut it again.
+_DECREASE_HOLD_SECONDS = 2.0
+_LATENCY_EWMA_ALPHA = 0.2
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of sending a request to a host that is currently considered unhealthy."""
+
+    def __init__(self, host: str, retry_in: float) -> None:
+        super().__init__(f"{host} is failing; requests are suspended for another {math.ceil(retry_in)}s")
+        self.host = host
+        self.retry_in = retry_in
+
+
+def host_of(url: str) -> str:
+    return urlsplit(url).netloc.lower()
+
+
+def _retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """Seconds from a Retry-After header (delta-seconds or HTTP date); None if absent or unparsable."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class Reservation(NamedTuple):
+    """A request slot taken with ``HostThrottle.reserve``."""
+
+    # Seconds to wait before sending the request.
+    delay: float
+    # Whether this request is the trial that decides on a half-open circuit.
+    trial: bool
+
+
+class _HostState:
+    def __init__(self, now: float) -> None:
+        self.rate = HostThrottle.max_rate()
+        self.tokens = HostThrottle.burst()
+        self.refilled_at = now
+        self.paused_until = 0.0
+        self.decreased_at = -math.inf
+        self.outcomes: deque[bool] = deque(maxlen=_OUTCOME_WINDOW)
+        self.circuit = CLOSED
+        self.opened_at = 0.0
+        self.probe_started: Optional[float] = None
+        self.requests = 0
+        self.failures = 0
+        self.throttled = 0
+        self.latency: Optional[float] = None
+
+
+class _Call:
+    """Outcome of one throttled request, filled in by the caller."""
+
+    def __init__(self) -> None:
+        self.status: Optional[int] = None
+        self.elapsed = 0.0
+        self.retry_after: Optional[str] = None
+
+    def respond(self, status: int, elapsed: float, retry_after: Optional[str] = None) -> None:
+        self.status, self.elapsed, self.retry_after = status, elapsed, retry_after
+
+
+class HostThrottle:
+    """Process-wide request pacing and circuit breaking per host, shared by every scrape.
+
+    Each host gets a token bucket (``SCRAPE_PER_HOST_CONCURRENCY`` tokens deep)
+    whose rate adapts AIMD-style: it grows by a small step with every healthy
+    response up to ``SCRAPE_HOST_RATE_PER_SECOND`` and halves, down to
+    ``SCRAPE_HOST_MIN_RATE_PER_SECOND``, on a 429, a 5xx, a network error or a
+    response slower than ``SCRAPE_SLOW_RESPONSE_SECONDS``. A Retry-After header
+    pauses the host for that long.
+
+    Once at least ``SCRAPE_CIRCUIT_MIN_REQUESTS`` of the last requests were seen
+    and ``SCRAPE_CIRCUIT_FAILURE_RATIO`` of them failed, the host's circuit opens:
+    requests fail immediately with ``CircuitOpenError`` for
+    ``SCRAPE_CIRCUIT_COOLDOWN_SECONDS``. After that a single trial request goes
+    out while other requests to the host wait for its outcome: success closes
+    the circuit, failure keeps it open for another cooldown.
+    """
+
+    def __init__(self) -> None:
+        self._hosts: dict[str, _HostState] = {}
+        self._lock = Lock()
+        # Wakes requests waiting on a trial request.
+        self._circuit_changed = Condition(self._lock)
+
+    @staticmethod
+    def max_rate() -> float:
+        return settings.SCRAPE_HOST_RATE_PER_SECOND
+
+    @staticmethod
+    def min_rate() -> float:
+        return max(0.01, min(settings.SCRAPE_HOST_MIN_RATE_PER_SECOND, HostThrottle.max_rate()))
+
+    @staticmethod
+    def burst() -> float:
+        return float(max(1, settings.SCRAPE_PER_HOST_CONCURRENCY))
+
+    def check(self, url: str) -> None:
+        """Raise ``CircuitOpenError`` if requests to the host of ``url`` are suspended."""
+        host = host_of(url)
+        now = time.monotonic()
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is not None and state.circuit == OPEN:
+                remaining = state.opened_at + settings.SCRAPE_CIRCUIT_COOLDOWN_SECONDS - now
+                if remaining > 0:
+                    raise CircuitOpenError(host, remaining)
+
+    def reserve(self, url: str) -> Reservation:
+        """Take a request slot for ``url``, to be sent after the reservation's ``delay``.
+
+        Raises ``CircuitOpenError`` while the host's circuit is open and blocks
+        while a trial request is in flight. Every reservation must be followed
+        by ``record`` once the request was sent, or by ``release`` if it never
+        was. Callers that wait should ``check`` again before sending, as the
+        circuit may open meanwhile.
+        """
+        host = host_of(url)
+        with self._circuit_changed:
+            while True:
+                now = time.monotonic()
+                state = self._state(host, now)
+                trial = self._admit(host, state, now)
+                if trial is not None:
+                    break
+                self._circuit_changed.wait(settings.SCRAPE_CIRCUIT_COOLDOWN_SECONDS)
+            state.requests += 1
+            delay = max(0.0, state.paused_until - now)
+            if self.max_rate() > 0:
+                state.tokens = min(self.burst(), state.tokens + (now - state.refilled_at) * state.rate)
+                state.refilled_at = now
+                # Tokens go negative for requests queued behind the bucket.
+                state.tokens -= 1
+                if state.tokens < 0:
+                    delay = max(delay, -state.tokens / state.rate)
+            return Reservation(delay, trial)
+
+    def release(self, url: str, reservation: Reservation) -> None:
+        """Give back a reservation whose request was never sent (cancelled or stopped), without an outcome."""
+        host = host_of(url)
+        with self._circuit_changed:
+            state = self._state(host, time.monotonic())
+            state.tokens = min(self.burst(), state.tokens + 1)
+            if reservation.trial and state.circuit == HALF_OPEN:
+                # Let the next waiting request be the trial instead.
+                state.probe_started = None
+                self._circuit_changed.notify_all()
+
+    def record(
+        self,
+        url: str,
+        elapsed: float,
+        status: Optional[int] = None,
+        retry_after: Optional[str] = None,
+        error: bool = False,
+    ) -> None:
+        """Feed back the outcome of a reserved request: its HTTP ``status``, or ``error`` if none came."""
+        host = host_of(url)
+        now = time.monotonic()
+        failed = error or status is None or status == 429 or status >= 500
+        slow = elapsed >= settings.SCRAPE_SLOW_RESPONSE_SECONDS
+        with self._lock:
+            state = self._state(host, now)
+            if not error:
+                state.latency = (
+                    elapsed
+                    if state.latency is None
+                    else _LATENCY_EWMA_ALPHA * elapsed + (1 - _LATENCY_EWMA_ALPHA) * state.latency
+                )
+            if failed:
+                state.failures += 1
+            if status == 429:
+                state.throttled += 1
+            if status == 429 or (status is not None and status >= 500):
+                pause = _retry_after_seconds(retry_after)
+                if pause:
+                    pause = min(pause, settings.SCRAPE_CIRCUIT_COOLDOWN_SECONDS)
+                    state.paused_until = max(state.paused_until, now + pause)
+
+            if failed or slow:
+                if now - state.decreased_at >= _DECREASE_HOLD_SECONDS:
+                    state.rate = max(self.min_rate(), state.rate * _DECREASE_FACTOR)
+                    state.decreased_at = now
+            elif self.max_rate() > 0:
+                state.rate = min(self.max_rate(), state.rate + _INCREASE_STEP)
+
+            if state.circuit == HALF_OPEN:
+                state.probe_started = None
+                self._circuit_changed.notify_all()
+                if failed:
+                    self._open(host, state, now, "trial request failed")
+                else:
+                    state.circuit = CLOSED
+                    state.outcomes.clear()
+                    print(f"[scraper:throttle] {host} recovered; resuming at {state.rate:.2f} req/s")
+            elif state.circuit == CLOSED:
+                state.outcomes.append(failed)
+                failures = sum(state.outcomes)
+                if (
+                    len(state.outcomes) >= max(1, settings.SCRAPE_CIRCUIT_MIN_REQUESTS)
+                    and failures / len(state.outcomes) >= settings.SCRAPE_CIRCUIT_FAILURE_RATIO
+                ):
+                    self._open(host, state, now, f"{failures} of the last {len(state.outcomes)} requests failed")
+
+    @contextmanager
+    def request(self, url: str) -> Iterator[_Call]:
+        """Wait for a slot, run the request in the ``with`` block and record its outcome.
+
+        The block reports the response through ``call.respond``; an exception
+        raised in it counts as a failed request.
+        """
+        reservation = self.reserve(url)
+        if reservation.delay:
+            time.sleep(reservation.delay)
+            try:
+                self.check(url)
+            except CircuitOpenError:
+                self.release(url, reservation)
+                raise
+        call = _Call()
+        try:
+            yield call
+        except Exception:
+            self.record(url, call.elapsed, error=True)
+            raise
+        self.record(url, call.elapsed, status=call.status, retry_after=call.retry_after, error=call.status is None)
+
+    def status(self) -> list[dict[str, Any]]:
+        """Limiter and circuit state of every host seen so far."""
+        now = time.monotonic()
+        rows = []
+        with self._lock:
+            for host, state in sorted(self._hosts.items()):
+                tokens = min(self.burst(), state.tokens + (now - state.refilled_at) * state.rate)
+                retry_in = state.opened_at + settings.SCRAPE_CIRCUIT_COOLDOWN_SECONDS - now
+                rows.append(
+                    {
+                        "host": host,
+                        "circuit": HALF_OPEN if state.circuit == OPEN and retry_in <= 0 else state.circuit,
+                        "rate_per_second": round(state.rate, 3) if self.max_rate() > 0 else None,
+                        "tokens": round(tokens, 2) if self.max_rate() > 0 else None,
+                        "paused_for_seconds": round(max(0.0, state.paused_until - now), 1),
+                        "circuit_retry_in_seconds": round(retry_in, 1) if state.circuit == OPEN and retry_in > 0 else None,
+                        "recent_failure_ratio": (
+                            round(sum(state.outcomes) / len(state.outcomes), 3) if state.outcomes else None
+                        ),
+                        "avg_latency_ms": round(state.latency * 1000) if state.latency is not None else None,
+                        "requests": state.requests,
+                        "failures": state.failures,
+                        "throttled": state.throttled,
+                    }
+                )
+        return rows
+
+    def _state(self, host: str, now: float) -> _HostState:
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _HostState(now)
+        return state
+
+    @staticmethod
+    def _admit(host: str, state: _HostState, now: float) -> Optional[bool]:
+        """None while another request is the trial; otherwise whether this request becomes the trial."""
+        cooldown = settings.SCRAPE_CIRCUIT_COOLDOWN_SECONDS
+        if state.circuit == OPEN:
+            remaining = state.opened_at + cooldown - now
+            if remaining > 0:
+                raise CircuitOpenError(host, remaining)
+            state.circuit = HALF_OPEN
+        if state.circuit == HALF_OPEN:
+            # A trial that never reported back (its caller died) is given up after a cooldown.
+            if state.probe_started is not None and now - state.probe_started < cooldown:
+                return None
+            state.probe_started = now
+            return True
+        return False
+
+    @staticmethod
+    def _open(host: str, state: _HostState, now: float, reason: str) -> None:
+        state.circuit = OPEN
+        state.opened_at = now
+        state.probe_started = None
+        print(
+            f"[scraper:throttle] Suspending requests to {host} for "
+            f"{settings.SCRAPE_CIRCUIT_COOLDOWN_SECONDS}s: {reason}"
+        )
+
+
+host_throttle = HostThrottle()
@@ -1,59 +1,185 @@
 from datetime import datetime
+from typing import Any, Iterator
 
+from sqlalchemy import select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 
-from app.models import Car
+from app.config import settings
+from app.data_versions import CARS, bump_version
+from app.models import Car, hash_url
+from app.scraper.fingerprints import fingerprint
 
+_UPDATABLE_FIELDS = ("brand", "model", "year", "price", "color")
+# Columns overwritten when a multi-row insert hits an existing url_hash.
+_WRITE_FIELDS = _UPDATABLE_FIELDS + ("fingerprint", "updated_at")
 
-def upsert_cars(db: Session, cars_data: list[dict]) -> tuple[int, int, int, int]:
+# Write kinds: a new listing, a changed listing, or an unchanged listing whose
+# stored fingerprint is missing or stale and only needs refreshing.
+_INSERT = "insert"
+_UPDATE = "update"
+_REFRESH = "refresh"
+
+
+def upsert_cars(db: Session, cars_data: list[dict]) -> tuple[int, int, int, int, int]:
     """Upsert car listings into the database.
-    Returns (inserted_count, updated_count, skipped_count, failed_count).
+
+    Listings are written in set-based batches: one SELECT loads the stored rows
+    and fingerprints for a batch, listings whose content fingerprint matches are
+    left alone, and one multi-row INSERT ... ON DUPLICATE KEY UPDATE (ON
+    CONFLICT on SQLite) writes the new and changed ones. The comparison is
+    always against the database, as other processes (API workers, crawl
+    workers) write the same rows. A batch that fails is bisected until the bad
+    rows are isolated.
+    Returns (inserted_count, updated_count, skipped_count, failed_count, unchanged_count).
     """
-    inserted = 0
-    updated = 0
     skipped = 0
-    failed = 0
-
+    rows_by_url: dict[str, dict] = {}
     for data in cars_data:
         url = data.get("url")
         if not url:
             skipped += 1
             continue
+        previous = rows_by_url.get(url)
+        if previous is None:
+            rows_by_url[url] = dict(data)
+        else:
+            # Same listing twice in one call: later non-null values win, as with sequential upserts.
+            previous.update({field: data[field] for field in _UPDATABLE_FIELDS if data.get(field) is not None})
 
-        try:
-            with db.begin_nested():
-                existing = db.query(Car).filter(Car.url == url).first()
-                if existing:
-                    changed = False
-                    for field in ("brand", "model", "year", "price", "color"):
-                        new_val = data.get(field)
-                        if new_val is not None and getattr(existing, field) != new_val:
-                            setattr(existing, field, new_val)
-                            changed = True
-                    if changed:
-                        existing.updated_at = datetime.utcnow()
-                        updated += 1
-                else:
-                    car = Car(
-                        brand=data.get("brand", ""),
-                        model=data.get("model", ""),
-                        year=data.get("year"),
-                        price=data.get("price"),
-                        color=data.get("color"),
-                        url=url,
-                    )
-                    db.add(car)
-                    inserted += 1
-
-                # Force SQL execution inside nested transaction to catch bad rows early.
-                db.flush()
-        except Exception as e:
-            failed += 1
-            model_len = len(data.get("model") or "")
-            print(
-                f"[upsert] Skipping row url={url} model_len={model_len}: {e}"
+    candidates = list(rows_by_url.values())
+    for data in candidates:
+        data["url_hash"] = hash_url(data["url"])
+        data["fingerprint"] = fingerprint(data)
+
+    inserted = 0
+    updated = 0
+    failed = 0
+    unchanged = 0
+    for batch in _chunks(candidates, max(1, settings.SCRAPE_UPSERT_BATCH_SIZE)):
+        writes, batch_unchanged = _plan_batch(db, batch)
+        unchanged += len(batch_unchanged)
+
+        written, batch_failed = _write_rows(db, writes)
+        failed += batch_failed
+        for values, kind in written:
+            if kind == _INSERT:
+                inserted += 1
+            elif kind == _UPDATE:
+                updated += 1
+            else:
+                unchanged += 1
+
+    if inserted or updated:
+        # Invalidates cached listing counts together with the rows that change them.
+        bump_version(db, CARS)
+    db.commit()
+    return inserted, updated, skipped, failed, unchanged
+
+
+def _chunks(rows: list[dict], size: int) -> Iterator[list[dict]]:
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def _plan_batch(db: Session, batch: list[dict]) -> tuple[list[tuple[dict[str, Any], str]], list[dict]]:
+    """Split ``batch`` into ``(row_values, kind)`` writes and rows that are already up to date."""
+    columns = [
+        Car.url_hash,
+        Car.fingerprint,
+        Car.updated_at,
+        *(getattr(Car, field) for field in _UPDATABLE_FIELDS),
+    ]
+    existing = {
+        row.url_hash: row
+        for row in db.execute(select(*columns).where(Car.url_hash.in_([data["url_hash"] for data in batch])))
+    }
+
+    now = datetime.utcnow()
+    writes = []
+    unchanged = []
+    for data in batch:
+        current = existing.get(data["url_hash"])
+        if current is None:
+            writes.append(
+                (
+                    {
+                        "brand": data.get("brand", ""),
+                        "model": data.get("model", ""),
+                        "year": data.get("year"),
+                        "price": data.get("price"),
+                        "color": data.get("color"),
+                        "url": data["url"],
+                        "url_hash": data["url_hash"],
+                        "fingerprint": data["fingerprint"],
+                        "created_at": now,
+                        "updated_at": now,
+                    },
+                    _INSERT,
+                )
             )
             continue
 
-    db.commit()
-    return inserted, updated, skipped, failed
+        # Null scraped values never overwrite stored ones.
+        values = {field: getattr(current, field) for field in _UPDATABLE_FIELDS}
+        changed = False
+        for field in _UPDATABLE_FIELDS:
+            new_val = data.get(field)
+            if new_val is not None and values[field] != new_val:
+                values[field] = new_val
+                changed = True
+
+        if not changed and current.fingerprint == data["fingerprint"]:
+            unchanged.append(data)
+            continue
+
+        values.update(
+            url=data["url"],
+            url_hash=data["url_hash"],
+            fingerprint=data["fingerprint"],
+            created_at=now,
+            updated_at=now if changed else current.updated_at,
+        )
+        writes.append((values, _UPDATE if changed else _REFRESH))
+    return writes, unchanged
+
+
+def _write_rows(
+    db: Session,
+    writes: list[tuple[dict[str, Any], str]],
+) -> tuple[list[tuple[dict[str, Any], str]], int]:
+    """Write rows in one statement, bisecting on failure. Returns (written_rows, failed_count)."""
+    if not writes:
+        return [], 0
+    try:
+        with db.begin_nested():
+            db.execute(_upsert_statement(db, [values for values, _ in writes]))
+    except Exception as e:
+        if len(writes) == 1:
+            values = writes[0][0]
+            model_len = len(values.get("model") or "")
+            print(
+                f"[upsert] Skipping row url={values['url']} model_len={model_len}: {e}"
+            )
+            return [], 1
+        middle = len(writes) // 2
+        left_written, left_failed = _write_rows(db, writes[:middle])
+        right_written, right_failed = _write_rows(db, writes[middle:])
+        return left_written + right_written, left_failed + right_failed
+
+    return writes, 0
+
+
+def _upsert_statement(db: Session, rows: list[dict[str, Any]]):
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        stmt = mysql_insert(Car).values(rows)
+        return stmt.on_duplicate_key_update({field: stmt.inserted[field] for field in _WRITE_FIELDS})
+    if dialect == "sqlite":
+        stmt = sqlite_insert(Car).values(rows)
+        return stmt.on_conflict_do_update(
+            index_elements=[Car.url_hash],
+            set_={field: stmt.excluded[field] for field in _WRITE_FIELDS},
+        )
+    raise RuntimeError(f"Bulk upsert supports MySQL and SQLite only, not {dialect!r}")
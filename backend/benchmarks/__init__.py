@@ -0,0 +1 @@
+"""Offline scraper benchmarks. Run from ``backend/``, e.g. ``python -m benchmarks.parsers``."""
@@ -0,0 +1,87 @@
+"""Checked-in carsensor page corpus used by the offline benchmarks.
+
+Every ``fixtures/<name>.html`` has a ``fixtures/<name>.json`` holding the rows
+the parser is expected to extract from it. Those rows are checked against the
+page by hand and then frozen: the parser is tested against them, so they must
+not simply be regenerated from it.
+
+    python -m benchmarks.corpus record [--pages N] [--catalog SLUG ...]
+        Save live listing/catalog pages as new fixtures (needs network), with
+        draft expected rows from the current bs4 parser to review by hand.
+    python -m benchmarks.corpus expect [--overwrite] [NAME ...]
+        Write draft expected rows for fixtures that have none yet; with
+        --overwrite, also replace reviewed rows (review the diff).
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import NamedTuple
+
+from app.scraper.parser_bs import BASE_URL, SITE_ROOT, _build_page_url, fetch_response, parse_listings_html
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+
+class Fixture(NamedTuple):
+    name: str
+    html: bytes
+    expected: list[dict]
+
+
+def load_corpus(names: list[str] | None = None) -> list[Fixture]:
+    fixtures = []
+    for path in sorted(FIXTURES_DIR.glob("*.html")):
+        if names and path.stem not in names:
+            continue
+        expected_path = path.with_suffix(".json")
+        expected = json.loads(expected_path.read_text(encoding="utf-8")) if expected_path.exists() else []
+        fixtures.append(Fixture(path.stem, path.read_bytes(), expected))
+    return fixtures
+
+
+def write_expected(name: str) -> int:
+    """Write draft expected rows for fixture ``name`` from the current bs4 parser."""
+    html = (FIXTURES_DIR / f"{name}.html").read_text(encoding="utf-8")
+    rows = parse_listings_html(html)
+    (FIXTURES_DIR / f"{name}.json").write_text(
+        json.dumps(rows, ensure_ascii=False, indent=1) + "\n", encoding="utf-8"
+    )
+    return len(rows)
+
+
+def record(pages: int, catalogs: list[str]) -> None:
+    targets = [(f"live_usedcar_index{page}", _build_page_url(BASE_URL, page)) for page in range(1, pages + 1)]
+    targets += [
+        (f"live_catalog_{slug}", f"{SITE_ROOT}/catalog/{slug}/") for slug in catalogs
+    ]
+    for name, url in targets:
+        response = fetch_response(url)
+        (FIXTURES_DIR / f"{name}.html").write_bytes(response.content)
+        print(f"[corpus] {name}: {len(response.content)} bytes, {write_expected(name)} draft listings ({url})")
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.corpus")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record_cmd = commands.add_parser("record", help="save live pages as fixtures")
+    record_cmd.add_argument("--pages", type=int, default=2)
+    record_cmd.add_argument("--catalog", action="append", default=[], metavar="SLUG")
+    expect_cmd = commands.add_parser("expect", help="write draft expected rows")
+    expect_cmd.add_argument("--overwrite", action="store_true", help="also replace reviewed expected rows")
+    expect_cmd.add_argument("names", nargs="*")
+    args = parser.parse_args(argv)
+
+    if args.command == "record":
+        record(args.pages, args.catalog)
+    else:
+        for fixture in load_corpus(args.names):
+            if (FIXTURES_DIR / f"{fixture.name}.json").exists() and not args.overwrite:
+                print(f"[corpus] {fixture.name}: keeping reviewed rows (--overwrite to replace)")
+                continue
+            print(f"[corpus] {fixture.name}: {write_expected(fixture.name)} draft listings, review before committing")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
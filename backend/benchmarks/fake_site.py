@@ -0,0 +1,294 @@
+"""Local stand-in for carsensor.net, for end-to-end scraper load tests.
+
+Serves generated listing pages in the site's casetPanel markup:
+
+    /usedcar/index{N}.html         global listing, pages 1..pages
+    /catalog/{slug}/index{N}.html  per-brand catalog, pages 1..catalog_pages
+    /usedcar/detail/{id}/index.html  detail page (for enrichment)
+
+Pages past the last one render the site's "no results" page. Listing content
+is deterministic per seed; ``advance()`` (or ``POST /_advance``) starts a new
+generation in which a ``churn`` fraction of listings change price. Responses
+carry an ETag and honour If-None-Match. Latency, 500 errors and 429s are
+injected at the configured rates; ``GET /_stats`` returns request counters.
+
+    python -m benchmarks.fake_site --port 8765 --pages 20 --latency-ms 80 --error-rate 0.02
+
+Point the backend at it with ``SCRAPE_SITE_ROOT=http://127.0.0.1:8765``.
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import sys
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from typing import Optional
+
+BRANDS = {
+    "toyota": ("トヨタ", ["プリウス S ツーリングセレクション", "アクア G", "ハリアー 2.0 Z", "ヤリス 1.5 ハイブリッド Z"]),
+    "honda": ("ホンダ", ["フィット 1.5 e:HEV ホーム", "N-BOX カスタム L ターボ", "ヴェゼル 1.5 e:HEV Z"]),
+    "nissan": ("日産", ["ノート 1.2 e-POWER X", "セレナ 2.0 ハイウェイスター V"]),
+    "mazda": ("マツダ", ["CX-5 2.2 XD プロアクティブ", "MAZDA3ファストバック 1.5 15S"]),
+    "subaru": ("スバル", ["フォレスター 2.0 アドバンス 4WD", "レヴォーグ 1.8 GT-H EX 4WD"]),
+    "bmw": ("BMW", ["3シリーズ 320i Mスポーツ", "X3 xDrive20d Mスポーツ 4WD"]),
+    "mercedes": ("メルセデス・ベンツ", ["Cクラス C200 アバンギャルド", "GLC 220d 4マチック"]),
+    "lexus": ("レクサス", ["RX 450h バージョンL", "NX 300 Fスポーツ"]),
+    "audi": ("アウディ", ["A4 35 TFSI アドバンスト", "Q5 40 TDI クワトロ"]),
+}
+COLORS = ["パールホワイト", "ブラック", "シルバーM", "ソウルレッドクリスタルM", "ダークブルー", "グレーM"]
+
+_LISTING_PATH = re.compile(r"^/(?:usedcar|catalog/(?P<slug>[a-z]+))/(?:index(?P<page>\d*)\.html)?$")
+_DETAIL_PATH = re.compile(r"^/usedcar/detail/(?P<id>[A-Z0-9]+)/index\.html$")
+
+_PAGE = """<!DOCTYPE html>
+<html lang="ja"><head><meta charset="UTF-8"><title>{title}｜中古車なら【カーセンサーnet】</title>
+<script>window.dataLayer=window.dataLayer||[];</script></head>
+<body><header class="header"><a class="header_logo" href="/">カーセンサー</a></header>
+<main class="main"><h1 class="resultTitle">{title}</h1>
+<div class="resultList">
+{body}</div></main>
+<footer class="footer"><p class="footer_copy">&copy; Recruit Co., Ltd.</p></footer></body></html>
+"""
+_NO_RESULTS = '<p class="noResult">該当する物件がありません。</p>\n'
+
+
+class FakeSite:
+    def __init__(
+        self,
+        pages: int = 20,
+        catalog_pages: int = 5,
+        per_page: int = 30,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        throttle_rate: float = 0.0,
+        missing_color_rate: float = 0.15,
+        churn: float = 0.05,
+        seed: int = 0,
+    ) -> None:
+        self.pages = pages
+        self.catalog_pages = catalog_pages
+        self.per_page = per_page
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.throttle_rate = throttle_rate
+        self.missing_color_rate = missing_color_rate
+        self.churn = churn
+        self.seed = seed
+        self.generation = 0
+        self._random = random.Random(seed)
+        self._lock = Lock()
+        self._counters: Counter = Counter()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[Thread] = None
+
+    @property
+    def root(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Serve from a background thread; port 0 picks a free one. Returns the site root."""
+        site = self
+
+        class Handler(_Handler):
+            pass
+
+        Handler.site = site
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = Thread(target=self._server.serve_forever, name="fake-site", daemon=True)
+        self._thread.start()
+        return self.root
+
+    def stop(self) -> None:
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def advance(self) -> int:
+        """Start a new generation: ``churn`` of the listings get a new price."""
+        with self._lock:
+            self.generation += 1
+            return self.generation
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return dict(self._counters)
+
+    def count(self, key: str) -> None:
+        with self._lock:
+            self._counters[key] += 1
+
+    def roll(self) -> float:
+        with self._lock:
+            return self._random.random()
+
+    # Content
+
+    def _listing(self, slug: Optional[str], page: int, index: int) -> dict:
+        key = f"{self.seed}:{slug or 'usedcar'}:{page}:{index}"
+        rng = random.Random(key)
+        brand_slug = slug or rng.choice(sorted(BRANDS))
+        maker, models = BRANDS[brand_slug]
+        listing_id = "AU" + str(int(hashlib.sha1(key.encode()).hexdigest(), 16) % 10**10).zfill(10)
+        price = round(rng.uniform(30, 900), 1)
+        # Changes in a listing's price are drawn per generation, independently of its base content.
+        for generation in range(1, self.generation + 1):
+            if random.Random(f"{key}:{generation}").random() < self.churn:
+                price = round(price * random.Random(f"{key}:{generation}:p").uniform(0.9, 0.99), 1)
+        return {
+            "id": listing_id,
+            "maker": maker,
+            "model": rng.choice(models),
+            "year": rng.randint(2010, 2025),
+            "price": price,
+            "color": None if rng.random() < self.missing_color_rate else rng.choice(COLORS),
+            "mileage": rng.randint(1, 150),
+        }
+
+    def listing_page(self, slug: Optional[str], page: int) -> str:
+        last_page = self.catalog_pages if slug else self.pages
+        title = f"{BRANDS[slug][0]}の中古車" if slug else "中古車一覧"
+        if page > last_page:
+            return _PAGE.format(title=title, body=_NO_RESULTS)
+        body = "".join(_panel(self._listing(slug, page, index)) for index in range(self.per_page))
+        return _PAGE.format(title=title, body=body)
+
+    def detail_page(self, listing_id: str) -> str:
+        rng = random.Random(f"{self.seed}:detail:{listing_id}")
+        maker, models = BRANDS[rng.choice(sorted(BRANDS))]
+        rows = [("年式", f"{rng.randint(2010, 2025)}年"), ("ボディカラー", rng.choice(COLORS)), ("修復歴", "なし")]
+        table = "".join(f"<tr><th>{label}</th><td>{value}</td></tr>" for label, value in rows)
+        body = f'<h1>{maker} {rng.choice(models)}</h1><table class="specWrap">{table}</table>\n'
+        return _PAGE.format(title="物件詳細", body=body)
+
+
+def _panel(car: dict) -> str:
+    spec_color = f"<li>色<span>{car['color']}</span></li>" if car["color"] else ""
+    return f"""<div class="casetPanel" data-id="{car['id']}">
+  <div class="casetPanel_head"><h3 class="casetPanel_title"><a href="/usedcar/detail/{car['id']}/index.html">{car['maker']}　{car['model']}</a></h3></div>
+  <div class="casetPanel_price"><span class="basePrice">{car['price']}</span><span class="unit">万円</span></div>
+  <dl class="casetPanel_spec"><dt>年式</dt><dd>{car['year']}年</dd><dt>走行距離</dt><dd>{car['mileage']}千km</dd></dl>
+  <ul class="casetPanel_specList">{spec_color}<li>修復歴<span>なし</span></li></ul>
+</div>
+"""
+
+
+class _Handler(BaseHTTPRequestHandler):
+    site: FakeSite
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        site = self.site
+        path = self.path.split("?", 1)[0]
+        if path == "/_stats":
+            self._send(200, json.dumps(site.stats()).encode(), "application/json")
+            return
+
+        delay = site.latency_ms + (site.roll() * site.jitter_ms if site.jitter_ms else 0.0)
+        if delay:
+            time.sleep(delay / 1000)
+        if site.throttle_rate and site.roll() < site.throttle_rate:
+            site.count("429")
+            self._send(429, b"Too Many Requests", "text/plain", {"Retry-After": "1"})
+            return
+        if site.error_rate and site.roll() < site.error_rate:
+            site.count("500")
+            self._send(500, b"Internal Server Error", "text/plain")
+            return
+
+        listing = _LISTING_PATH.match(path)
+        detail = _DETAIL_PATH.match(path)
+        if listing and (listing["slug"] is None or listing["slug"] in BRANDS):
+            html = site.listing_page(listing["slug"], int(listing["page"] or 1))
+            site.count("listing")
+        elif detail:
+            html = site.detail_page(detail["id"])
+            site.count("detail")
+        else:
+            site.count("404")
+            self._send(404, b"Not Found", "text/plain")
+            return
+
+        body = html.encode("utf-8")
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        if self.headers.get("If-None-Match") == etag:
+            site.count("304")
+            self._send(304, b"", None, {"ETag": etag})
+            return
+        site.count("200")
+        self._send(200, body, "text/html; charset=utf-8", {"ETag": etag})
+
+    def do_POST(self) -> None:
+        if self.path == "/_advance":
+            self._send(200, json.dumps({"generation": self.site.advance()}).encode(), "application/json")
+        else:
+            self._send(404, b"Not Found", "text/plain")
+
+    def _send(self, status: int, body: bytes, content_type: Optional[str], headers: Optional[dict] = None) -> None:
+        self.send_response(status)
+        if content_type:
+            self.send_header("Content-Type", content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if body:
+            self.wfile.write(body)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def add_site_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--pages", type=int, default=20, help="global listing pages")
+    parser.add_argument("--catalog-pages", type=int, default=5, help="pages per brand catalog")
+    parser.add_argument("--per-page", type=int, default=30)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered 500")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of requests answered 429")
+    parser.add_argument("--churn", type=float, default=0.05, help="fraction of listings repriced per generation")
+    parser.add_argument("--seed", type=int, default=0)
+
+
+def site_from_args(args: argparse.Namespace) -> FakeSite:
+    return FakeSite(
+        pages=args.pages,
+        catalog_pages=args.catalog_pages,
+        per_page=args.per_page,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        throttle_rate=args.throttle_rate,
+        churn=args.churn,
+        seed=args.seed,
+    )
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.fake_site")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_site_arguments(parser)
+    args = parser.parse_args(argv)
+
+    site = site_from_args(args)
+    print(f"[fake-site] Serving on {site.start(args.host, args.port)} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        site.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
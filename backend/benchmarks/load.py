@@ -0,0 +1,177 @@
+"""End-to-end scraper load test against the local fake carsensor site.
+
+    python -m benchmarks.load [--mode manager|direct|sharded] [--jobs N] [fake site options]
+
+``direct`` calls ``run_scraper`` ``--jobs`` times in a row, advancing the site
+one generation between runs. ``manager`` submits ``--jobs`` jobs with a mix of
+global and targeted filters to a ``ScrapeJobManager`` ``--burst`` at a time and
+waits for them. Both report jobs/sec and rows/sec (listings fetched, and
+listings inserted or updated), plus the request counters of the site.
+``sharded`` plans one crawl of the global listing and all catalogs
+(``app.scraper.crawl``) and runs it with ``--workers`` worker processes sharing
+the database, counting each shard as a job.
+
+Unless ``--database-url`` is given, a throwaway SQLite database is used; pass a
+MySQL URL to measure the production write path. ``--site-root`` targets an
+already running fake site instead of starting one in-process.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from benchmarks.fake_site import add_site_arguments, site_from_args
+
+FILTER_MIX = [
+    {},
+    {"brand": "toyota"},
+    {"brand": "honda", "model": "フィット"},
+    {"brand": "bmw"},
+    {"model": "プリウス"},
+    {"brand": "mazda", "model": "cx-5"},
+]
+
+
+def _totals(results: list[dict]) -> dict[str, int]:
+    totals: dict[str, int] = {}
+    for result in results:
+        for key, value in result.items():
+            totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+def _report(label: str, jobs: int, elapsed: float, results: list[dict], site_stats: dict) -> None:
+    totals = _totals(results)
+    written = totals.get("inserted", 0) + totals.get("updated", 0)
+    print(
+        f"[load] {label}: {jobs} jobs in {elapsed:.2f}s = {jobs / elapsed:.2f} jobs/s, "
+        f"{totals.get('fetched', 0) / elapsed:.0f} rows/s fetched, {written / elapsed:.0f} rows/s written"
+    )
+    print(f"[load] totals: {totals}")
+    print(f"[load] site requests: {site_stats}")
+
+
+def run_direct(args, advance) -> None:
+    from app.scraper.scraper import run_scraper
+
+    for run in range(1, args.jobs + 1):
+        started = time.perf_counter()
+        result = run_scraper(max_pages=args.pages, incremental=args.incremental)
+        _report(f"run {run}", 1, time.perf_counter() - started, [result], args.site_stats())
+        advance()
+
+
+def run_manager(args, advance) -> None:
+    from app.scraper.job_manager import ScrapeJobManager
+
+    manager = ScrapeJobManager()
+    # Final job per job id over the whole run; a later burst may reuse a job that already finished.
+    seen: dict[str, dict] = {}
+    reused = 0
+    started = time.perf_counter()
+    submitted = 0
+    while submitted < args.jobs:
+        burst = min(args.burst, args.jobs - submitted)
+        job_ids = set()
+        for offset in range(burst):
+            filters = FILTER_MIX[(submitted + offset) % len(FILTER_MIX)]
+            job = manager.submit_job(filters=dict(filters), correlation_id=f"load-{submitted + offset}")
+            reused += int(job["reused"])
+            if job["job_id"] not in seen:
+                job_ids.add(job["job_id"])
+        submitted += burst
+
+        while job_ids:
+            time.sleep(0.05)
+            for job_id in list(job_ids):
+                job = manager.get_job(job_id)
+                if job["status"] in ("done", "failed", "cancelled", "expired"):
+                    job_ids.discard(job_id)
+                    seen[job_id] = job
+        advance()
+    elapsed = time.perf_counter() - started
+    failed = sum(1 for job in seen.values() if job["status"] == "failed")
+    results = [job["result"] for job in seen.values()]
+    _report(f"{len(seen)} distinct jobs ({reused} reused, {failed} failed)", args.jobs, elapsed, results, args.site_stats())
+
+
+def run_sharded(args, advance) -> None:
+    from app.scraper.crawl import plan_crawl
+    from app.scraper.crawl_store import crawl_shard_store
+
+    crawl_id = plan_crawl(max_pages=args.pages, shard_pages=args.shard_pages)
+    command = [sys.executable, "-m", "app.scraper.crawl", "worker", "--crawl", crawl_id, "--exit-when-idle"]
+    backend_dir = Path(__file__).resolve().parents[1]
+    started = time.perf_counter()
+    workers = [subprocess.Popen(command, cwd=backend_dir) for _ in range(args.workers)]
+    failed = sum(1 for worker in workers if worker.wait() != 0)
+    elapsed = time.perf_counter() - started
+
+    progress = crawl_shard_store.progress(crawl_id)
+    shards = sum(progress["shards"].values())
+    print(f"[load] {args.workers} workers ({failed} exited with errors), shards by status: {progress['shards']}")
+    _report(f"crawl {crawl_id}", shards, elapsed, [progress["result"]], args.site_stats())
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load")
+    parser.add_argument("--mode", choices=("manager", "direct", "sharded"), default="manager")
+    parser.add_argument("--jobs", type=int, default=12)
+    parser.add_argument("--burst", type=int, default=6, help="jobs submitted together (manager mode)")
+    parser.add_argument("--incremental", action="store_true", help="direct mode: incremental runs")
+    parser.add_argument("--workers", type=int, default=4, help="worker processes (sharded mode)")
+    parser.add_argument("--shard-pages", type=int, default=5, help="pages per shard (sharded mode)")
+    parser.add_argument("--database-url")
+    parser.add_argument("--site-root", help="use a fake site that is already running")
+    add_site_arguments(parser)
+    args = parser.parse_args(argv)
+
+    workdir = Path(tempfile.mkdtemp(prefix="scrape-load-"))
+    site = None
+    if args.site_root:
+        site_root = args.site_root.rstrip("/")
+        args.site_stats = lambda: {}
+        advance = lambda: None  # noqa: E731
+    else:
+        site = site_from_args(args)
+        site_root = site.start()
+        args.site_stats = site.stats
+        advance = site.advance
+
+    # Settings are read at import time, so configure the backend before importing it.
+    os.environ["SCRAPE_SITE_ROOT"] = site_root
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{workdir / 'load.db'}"
+    os.environ["SCRAPE_VALIDATOR_STORE_PATH"] = str(workdir / "validators.json")
+    os.environ.setdefault("SCRAPE_MAX_PAGES", str(args.pages))
+    os.environ.setdefault("SCRAPE_TARGET_MAX_PAGES", str(max(1, args.catalog_pages)))
+    os.environ.setdefault("SCRAPE_FALLBACK_MAX_PAGES", str(args.pages))
+
+    from app.data_versions import seed_versions
+    from app.database import SessionLocal, engine
+    from app.models import Base
+    from app.scraper.parser_bs import shutdown_parse_pool
+
+    if not args.database_url:
+        Base.metadata.create_all(bind=engine)
+        with SessionLocal() as db:
+            seed_versions(db)
+    print(f"[load] site={site_root} db={engine.url.render_as_string(hide_password=True)}")
+    try:
+        if args.mode == "direct":
+            run_direct(args, advance)
+        elif args.mode == "sharded":
+            run_sharded(args, advance)
+        else:
+            run_manager(args, advance)
+    finally:
+        shutdown_parse_pool()
+        if site is not None:
+            site.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
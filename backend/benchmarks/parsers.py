@@ -0,0 +1,182 @@
+"""Parser benchmark over the checked-in page corpus; runs fully offline.
+
+    python -m benchmarks.parsers [--engine bs4 --engine lxml] [--rounds N] [--playwright]
+
+For every engine the extracted rows are first checked against the expected
+rows of each fixture, then timed. Reports pages/sec, listings/sec and the peak
+Python heap while parsing one page (tracemalloc; memory held by libxml2 itself
+is not counted). ``--playwright`` also times ``EXTRACT_LISTINGS_JS`` in a local
+Chromium via ``set_content``. Exits with status 1 if any check fails.
+"""
+import argparse
+import sys
+import time
+import tracemalloc
+from typing import Optional
+
+from app.scraper.parser_bs import _ROW_FIELDS, SITE_ROOT, parse_color, parse_price, parse_rows, parse_year
+from benchmarks.corpus import Fixture, load_corpus
+
+ENGINES = ("bs4", "lxml")
+
+PRICE_CASES = [
+    ("849.8 万円", 8498000),
+    ("1,234万円", 12340000),
+    ("支払総額 95 万円", 950000),
+    ("1980000", 1980000),
+    ("応談", None),
+    ("", None),
+]
+YEAR_CASES = [
+    ("2019(R01)年", 2019),
+    ("2015(H27)年", 2015),
+    ("2021年式", 2021),
+    ("令和5年", 2023),
+    ("平成31年", 2019),
+    ("年式不明", None),
+]
+COLOR_CASES = [
+    ("色ブラック", True, "ブラック"),
+    ("ボディカラー：シルバーM", True, "シルバーM"),
+    ("外装色: パールホワイト", True, "パールホワイト"),
+    ("色黄色", True, "黄色"),
+    ("ボディカラー：-", True, None),
+    ("グレーM", False, "グレーM"),
+    ("－", False, None),
+]
+
+
+def check_helpers() -> list[str]:
+    problems = []
+    for text, want in PRICE_CASES:
+        got = parse_price(text)
+        if got != want:
+            problems.append(f"parse_price({text!r}) = {got!r}, expected {want!r}")
+    for text, want in YEAR_CASES:
+        got = parse_year(text)
+        if got != want:
+            problems.append(f"parse_year({text!r}) = {got!r}, expected {want!r}")
+    for text, labelled, want in COLOR_CASES:
+        got = parse_color(text, labelled=labelled)
+        if got != want:
+            problems.append(f"parse_color({text!r}, labelled={labelled}) = {got!r}, expected {want!r}")
+    return problems
+
+
+def check_engine(engine: str, corpus: list[Fixture]) -> list[str]:
+    problems = []
+    for fixture in corpus:
+        rows = [dict(zip(_ROW_FIELDS, row)) for row in parse_rows(fixture.html, engine)]
+        if len(rows) != len(fixture.expected):
+            problems.append(f"{engine} {fixture.name}: {len(rows)} listings, expected {len(fixture.expected)}")
+            continue
+        for index, (got, want) in enumerate(zip(rows, fixture.expected)):
+            if got != want:
+                fields = [field for field in _ROW_FIELDS if got.get(field) != want.get(field)]
+                problems.append(f"{engine} {fixture.name} listing {index}: {', '.join(fields)} differ")
+    return problems
+
+
+def bench_engine(engine: str, corpus: list[Fixture], rounds: int) -> dict[str, float]:
+    parse_rows(corpus[0].html, engine)  # warm-up: imports, compiled selectors
+    listings = 0
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for fixture in corpus:
+            listings += len(parse_rows(fixture.html, engine))
+    elapsed = time.perf_counter() - started
+
+    peak = 0
+    for fixture in corpus:
+        tracemalloc.start()
+        parse_rows(fixture.html, engine)
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    pages = rounds * len(corpus)
+    return {
+        "pages_per_sec": pages / elapsed,
+        "listings_per_sec": listings / elapsed,
+        "peak_kib": peak / 1024,
+    }
+
+
+def bench_playwright(corpus: list[Fixture], rounds: int) -> tuple[Optional[dict[str, float]], list[str]]:
+    """Time the in-browser extraction script; checks listing URLs only, as its text handling differs."""
+    try:
+        from playwright.sync_api import sync_playwright
+    except ImportError:
+        return None, ["playwright is not installed"]
+
+    from app.scraper.parser_pw import EXTRACT_LISTINGS_JS, LISTING_SELECTOR
+
+    problems = []
+    with sync_playwright() as playwright:
+        try:
+            browser = playwright.chromium.launch(headless=True)
+        except Exception as e:
+            return None, [f"cannot launch Chromium: {str(e).splitlines()[0]}"]
+        try:
+            tab = browser.new_page()
+            listings = 0
+            elapsed = 0.0
+            for round_number in range(rounds):
+                for fixture in corpus:
+                    tab.set_content(fixture.html.decode("utf-8"))
+                    started = time.perf_counter()
+                    rows = tab.evaluate(EXTRACT_LISTINGS_JS, [LISTING_SELECTOR, SITE_ROOT])
+                    elapsed += time.perf_counter() - started
+                    listings += len(rows)
+                    if round_number == 0:
+                        urls = [row["url"] for row in rows]
+                        if urls != [row["url"] for row in fixture.expected]:
+                            problems.append(f"playwright {fixture.name}: listing URLs differ from expected")
+        finally:
+            browser.close()
+    pages = rounds * len(corpus)
+    return {"pages_per_sec": pages / elapsed, "listings_per_sec": listings / elapsed}, problems
+
+
+def main(argv: list[str]) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.parsers")
+    parser.add_argument("--engine", action="append", choices=ENGINES, help="default: all engines")
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--playwright", action="store_true", help="also time the Playwright extraction script")
+    args = parser.parse_args(argv)
+
+    corpus = load_corpus()
+    if not corpus:
+        print("[bench] No fixtures found")
+        return 1
+    total_bytes = sum(len(fixture.html) for fixture in corpus)
+    print(f"[bench] {len(corpus)} fixtures, {total_bytes // 1024} KiB, {args.rounds} rounds")
+
+    problems = check_helpers()
+    print(f"{'engine':<12}{'pages/s':>10}{'listings/s':>12}{'peak KiB':>10}")
+    for engine in args.engine or ENGINES:
+        engine_problems = check_engine(engine, corpus)
+        problems += engine_problems
+        if engine_problems:
+            print(f"{engine:<12}{'skipped: wrong rows':>32}")
+            continue
+        stats = bench_engine(engine, corpus, args.rounds)
+        print(
+            f"{engine:<12}{stats['pages_per_sec']:>10.1f}{stats['listings_per_sec']:>12.1f}"
+            f"{stats['peak_kib']:>10.0f}"
+        )
+
+    if args.playwright:
+        stats, pw_problems = bench_playwright(corpus, max(1, args.rounds // 4))
+        if stats is None:
+            print(f"{'playwright':<12}  unavailable: {pw_problems[0]}")
+        else:
+            problems += pw_problems
+            print(f"{'playwright':<12}{stats['pages_per_sec']:>10.1f}{stats['listings_per_sec']:>12.1f}{'n/a':>10}")
+
+    for problem in problems:
+        print(f"[bench] FAIL {problem}")
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -18,4 +18,4 @@ until alembic upgrade head; do
 done
 
 echo "[entrypoint] Starting FastAPI server..."
-exec uvicorn app.main:app --host 0.0.0.0 --port 8000
+exec uvicorn app.main:app --host 0.0.0.0 --port 8000 --workers "${UVICORN_WORKERS:-1}"
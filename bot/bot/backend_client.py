@@ -3,16 +3,24 @@ from __future__ import annotations
 import asyncio
 import json
 from typing import Any
-from urllib import error, request
+from urllib import error, parse, request
 
 from bot.config import settings
 
+# Longest hold the backend accepts for a status long-poll.
+_MAX_STATUS_WAIT_SECONDS = 60
+
 
 def _join_url(path: str) -> str:
     return f"{settings.BACKEND_API_BASE_URL.rstrip('/')}{path}"
 
 
-def _http_json(method: str, path: str, payload: dict[str, Any] | None = None) -> dict[str, Any]:
+def _http_json(
+    method: str,
+    path: str,
+    payload: dict[str, Any] | None = None,
+    timeout: float = 20,
+) -> dict[str, Any]:
     body: bytes | None = None
     headers = {"Content-Type": "application/json"}
 
@@ -27,7 +35,7 @@ def _http_json(method: str, path: str, payload: dict[str, Any] | None = None) ->
     )
 
     try:
-        with request.urlopen(req, timeout=20) as resp:
+        with request.urlopen(req, timeout=timeout) as resp:
             raw = resp.read().decode("utf-8")
             return json.loads(raw)
     except error.HTTPError as exc:
@@ -37,13 +45,30 @@ def _http_json(method: str, path: str, payload: dict[str, Any] | None = None) ->
         raise RuntimeError(str(exc)) from exc
 
 
-async def trigger_on_demand_scrape(filters: dict[str, Any], correlation_id: str) -> dict[str, Any]:
+async def trigger_on_demand_scrape(
+    filters: dict[str, Any],
+    correlation_id: str,
+    deadline_seconds: int | None = None,
+) -> dict[str, Any]:
     payload = {
         "filters": filters,
         "correlation_id": correlation_id,
     }
+    if deadline_seconds is not None:
+        payload["deadline_seconds"] = deadline_seconds
     return await asyncio.to_thread(_http_json, "POST", "/api/scrape/trigger", payload)
 
 
-async def get_scrape_status(job_id: str) -> dict[str, Any]:
-    return await asyncio.to_thread(_http_json, "GET", f"/api/scrape/status/{job_id}")
+async def get_scrape_status(job_id: str, wait: int = 0, revision: int | None = None) -> dict[str, Any]:
+    """Current job status; with ``wait``, the backend holds the request until the job changes past ``revision``."""
+    wait = min(wait, _MAX_STATUS_WAIT_SECONDS)
+    query: dict[str, Any] = {}
+    if wait:
+        query["wait"] = wait
+        if revision is not None:
+            query["revision"] = revision
+    path = f"/api/scrape/status/{job_id}"
+    if query:
+        path += f"?{parse.urlencode(query)}"
+    # Leave room for the held request on top of the usual timeout.
+    return await asyncio.to_thread(_http_json, "GET", path, None, 20 + wait)
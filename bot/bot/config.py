@@ -8,6 +8,8 @@ class Settings(BaseSettings):
     BACKEND_API_BASE_URL: str = "http://backend:8000"
     BOT_FRESH_WAIT_SECONDS: int = 180
     BOT_STATUS_POLL_INTERVAL_SECONDS: int = 5
+    BOT_STATUS_WAIT_SECONDS: int = 25
+    BOT_PROGRESS_UPDATE_SECONDS: int = 5
 
     class Config:
         env_file = ".env"
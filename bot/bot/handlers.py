@@ -61,23 +61,46 @@ def build_relaxed_filters(filters: dict) -> dict:
     return relaxed
 
 
-async def wait_for_scrape_completion(job_id: str) -> tuple[dict, bool]:
-    """Poll backend scrape status until completion or timeout."""
-    remaining = max(1, settings.BOT_FRESH_WAIT_SECONDS)
-    interval = max(1, settings.BOT_STATUS_POLL_INTERVAL_SECONDS)
+async def wait_for_scrape_completion(job_id: str, on_progress=None, revision: int = 0) -> tuple[dict, bool]:
+    """Long-poll backend scrape status until completion or timeout.
+
+    Each request is held by the backend until the job changes past ``revision``
+    (as returned by the trigger), so the result is seen as soon as the job
+    finishes. ``on_progress`` (if given) is awaited with every intermediate status.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max(1, settings.BOT_FRESH_WAIT_SECONDS)
     last_status: dict = {"status": "pending"}
 
-    while remaining > 0:
-        status = await get_scrape_status(job_id)
+    while (remaining := deadline - loop.time()) > 0:
+        wait = max(1, min(settings.BOT_STATUS_WAIT_SECONDS, int(remaining)))
+        try:
+            status = await get_scrape_status(job_id, wait=wait, revision=revision)
+        except Exception as exc:
+            print(f"[bot] Scrape status request failed: {exc}")
+            await asyncio.sleep(min(max(1, settings.BOT_STATUS_POLL_INTERVAL_SECONDS), remaining))
+            continue
         last_status = status
-        if status.get("status") in {"done", "failed"}:
+        if status.get("status") in {"done", "failed", "cancelled", "expired"}:
             return status, True
-        await asyncio.sleep(interval)
-        remaining -= interval
+        revision = status.get("revision", revision)
+        if on_progress is not None:
+            await on_progress(status)
 
     return last_status, False
 
 
+def format_progress(status: dict) -> str:
+    result = status.get("result") or {}
+    if status.get("status") == "pending":
+        position = status.get("queue_position")
+        return "Waiting for a free scraper" + (f" (position {position})..." if position else "...")
+    return (
+        "Updating database with fresh listings... "
+        f"{result.get('pages', 0)} pages, {result.get('committed', 0)} listings saved"
+    )
+
+
 @router.message()
 async def handle_message(message: types.Message):
     """Handle any incoming text message."""
@@ -97,16 +120,40 @@ async def handle_message(message: types.Message):
 
         try:
             await status_message.edit_text("Searching source listings...")
-            trigger_result = await trigger_on_demand_scrape(filters, correlation_id)
+            # The scrape is only worth running while we wait for it.
+            trigger_result = await trigger_on_demand_scrape(
+                filters,
+                correlation_id,
+                deadline_seconds=max(1, settings.BOT_FRESH_WAIT_SECONDS),
+            )
             job_id = trigger_result.get("job_id")
             print(f"[bot] Scrape trigger result: {trigger_result}")
 
             if job_id:
                 await status_message.edit_text("Updating database with fresh listings...")
-                scrape_status, completed_in_wait = await wait_for_scrape_completion(job_id)
+                shown = {"text": "", "at": 0.0}
+
+                async def show_progress(status: dict) -> None:
+                    # Telegram rate-limits edits; skip updates that come too soon or change nothing.
+                    text = format_progress(status)
+                    now = asyncio.get_running_loop().time()
+                    if text == shown["text"] or now - shown["at"] < settings.BOT_PROGRESS_UPDATE_SECONDS:
+                        return
+                    try:
+                        await status_message.edit_text(text)
+                    except Exception as exc:
+                        print(f"[bot] Failed to show scrape progress: {exc}")
+                    shown.update(text=text, at=now)
+
+                scrape_status, completed_in_wait = await wait_for_scrape_completion(
+                    job_id, show_progress, revision=trigger_result.get("revision", 0)
+                )
                 print(f"[bot] Scrape status: {scrape_status} completed={completed_in_wait}")
 
-                if completed_in_wait and scrape_status.get("status") == "done":
+                age_seconds = trigger_result.get("age_seconds")
+                if completed_in_wait and scrape_status.get("status") == "done" and age_seconds is not None:
+                    freshness_note = f"Data refreshed {max(1, round(age_seconds / 60))} min ago."
+                elif completed_in_wait and scrape_status.get("status") == "done":
                     result = scrape_status.get("result") or {}
                     freshness_note = (
                         "Data refreshed just now "
@@ -114,6 +161,8 @@ async def handle_message(message: types.Message):
                     )
                 elif completed_in_wait and scrape_status.get("status") == "failed":
                     freshness_note = "Live refresh failed; showing latest stored results."
+                elif completed_in_wait:
+                    freshness_note = "Live refresh was cut short; showing what it stored so far."
                 else:
                     freshness_note = "Live refresh is still running; showing latest currently available results."
         except Exception as scrape_exc: